@@ -1,9 +1,12 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Prefetch
 from django.urls import reverse
 from django.utils.html import format_html
 
-from chain.models import Contact, Product, TradeUnit
-from chain.serializers import ProductSerializer
+from chain.models import Contact, DebtReset, Product, TradeUnit, TradeUnitChange
+from chain.pagination import ApproximateCountPaginator
+from chain.search import search_filter
+from chain.tasks import start_debt_reset
 
 
 # ----------------------------------------------------------------
@@ -16,18 +19,28 @@ class RetailAdmin(admin.ModelAdmin):
     Attrs:
         - list_display: defines collection of fields to display
         - list_filter: defines collection of fields to filter
+        - list_select_related: defines relations joined to changelist query
+        - search_fields: defines fields to search (searched by index-backed search of units)
+        - paginator: defines paginator with approximate count of large table
+        - show_full_result_count: disables second full count in changelist
         - actions: defines custom admin action
         - readonly_fields: defines collection with fields forbidden for editing
         - fieldsets: defines custom subsections
+        - reset_debt_max_units: defines maximal number of selected units stored in debt reset
     """
     list_display = ('title', 'contact', 'products_', 'provider_', 'debt', 'unit_type', 'level')
     list_filter = ('contact__country', 'contact__city')
+    list_select_related = ('contact', 'provider')
+    search_fields = ('title', 'contact__email', 'contact__country', 'contact__city', 'products__title')
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
     actions = ['reset_debt']
-    readonly_fields = ('level',)
+    readonly_fields = ('level', 'network_debt')
+    reset_debt_max_units: int = DebtReset.max_units
 
     fieldsets = (
         ('Info', {
-            'fields': ('title', 'unit_type', 'debt', 'level')
+            'fields': ('title', 'unit_type', 'debt', 'network_debt', 'level')
         }),
         ('Contact info', {
             'fields': ('contact',)
@@ -41,19 +54,47 @@ class RetailAdmin(admin.ModelAdmin):
     )
 
     def reset_debt(self, request, queryset) -> None:
-        """Method to reset debt"""
-        queryset.update(debt=0)
+        """Method to reset debt in background chunk by chunk (progress is shown in debt resets)"""
+        units = list(queryset.order_by('pk').values_list('pk', flat=True)[:self.reset_debt_max_units + 1])
+        if len(units) > self.reset_debt_max_units:
+            self.message_user(
+                request,
+                f'At most {self.reset_debt_max_units} units can be selected, '
+                f'reset debts of downstream network of a supplier in debt resets instead',
+                level=messages.ERROR
+            )
+            return
+        job = DebtReset.objects.create(units=units)
+        start_debt_reset(job)
+        url = reverse('admin:chain_debtreset_change', args=[job.pk])
+        self.message_user(request, format_html('Debt reset is started: <a href="{}">{}</a>', url, job))
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Redefined method to search units by title, contact and products with index-backed
+        lookups combined by keys (no duplicates, so no DISTINCT is needed)
+        """
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(search_filter(search_term.strip())), False
+
+    def get_queryset(self, request):
+        """
+        Redefined method to load products of the whole changelist page in one query
+        """
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('products', queryset=Product.objects.only('id', 'title'))
+        )
 
     @staticmethod
     def products_(obj):
         """
         Method to represent entity as a link
         """
-        products = ProductSerializer(obj.products, many=True).data
         product_list = []
-        for i, product in enumerate(products):
-            product_url = reverse('admin:chain_product_change', args=[product['id']])
-            product_link = format_html('<a href="{}">{}</a>', product_url, product['title'])
+        for i, product in enumerate(obj.products.all()):
+            product_url = reverse('admin:chain_product_change', args=[product.id])
+            product_link = format_html('<a href="{}">{}</a>', product_url, product.title)
             product_list.append(f"{i + 1}. {product_link}")
         return format_html("<br>".join(product_list))
 
@@ -79,10 +120,16 @@ class ContactAdmin(admin.ModelAdmin):
     Attrs:
         - list_display: defines collection of fields to display
         - list_filter: defines collection of fields to filter
+        - search_fields: defines collection of fields to search
+        - paginator: defines paginator with approximate count of large table
+        - show_full_result_count: disables second full count in changelist
         - fieldsets: defines custom subsections
     """
     list_display = ('email', 'country', 'city', 'street', 'number')
     list_filter = ('country', 'city')
+    search_fields = ('email', 'country', 'city')
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         ('Info', {
@@ -104,10 +151,12 @@ class ProductAdmin(admin.ModelAdmin):
     Attrs:
         - list_display: defines collection of fields to display
         - list_filter: defines collection of fields to filter
+        - search_fields: defines collection of fields to search
         - fieldsets: defines custom subsections
     """
     list_display = ('title', 'model', 'release', 'price')
     list_filter = ('model',)
+    search_fields = ('title', 'model')
 
     fieldsets = (
         ('Info', {
@@ -121,3 +170,68 @@ class ProductAdmin(admin.ModelAdmin):
         })
     )
 
+
+# ----------------------------------------------------------------
+# debt reset admin model
+@admin.register(DebtReset)
+class DebtResetAdmin(admin.ModelAdmin):
+    """
+    Model representing debt reset admin panel
+
+    Attrs:
+        - list_display: defines collection of fields to display
+        - list_filter: defines collection of fields to filter
+        - raw_id_fields: defines fields chosen by id (no select with every unit is rendered)
+        - readonly_fields: defines collection with fields forbidden for editing
+        - fieldsets: defines custom subsections
+    """
+    list_display = ('id', 'supplier', 'status', 'processed', 'total', 'created', 'finished')
+    list_filter = ('status',)
+    raw_id_fields = ('supplier',)
+    readonly_fields = ('status', 'total', 'processed', 'last_pk', 'error', 'created', 'finished')
+
+    fieldsets = (
+        ('Scope', {
+            'fields': ('supplier', 'units', 'chunk_size')
+        }),
+        ('Progress', {
+            'fields': ('status', 'total', 'processed', 'last_pk', 'error', 'created', 'finished')
+        }),
+    )
+
+    def save_model(self, request, obj, form, change) -> None:
+        """
+        Redefined method to start debt reset in background once it is created
+        """
+        super().save_model(request, obj, form, change)
+        if not change:
+            start_debt_reset(obj)
+
+
+# ----------------------------------------------------------------
+# trade unit change admin model
+@admin.register(TradeUnitChange)
+class TradeUnitChangeAdmin(admin.ModelAdmin):
+    """
+    Model representing read-only change log admin panel
+
+    Attrs:
+        - list_display: defines collection of fields to display
+        - list_filter: defines collection of fields to filter
+        - search_fields: defines collection of fields to search
+        - paginator: defines paginator without exact count of the log
+    """
+    list_display = ('id', 'unit_id', 'action', 'created')
+    list_filter = ('action',)
+    search_fields = ('=unit_id',)
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+    def has_delete_permission(self, request, obj=None) -> bool:
+        return False
@@ -0,0 +1,258 @@
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from itertools import islice
+from operator import or_
+from typing import Any, Iterable, Iterator
+
+from django.db import transaction
+from django.db.models import Q
+
+from chain.changes import units_changed
+from chain.models import Contact, Product, TradeUnit, TradeUnitChange, path_ids
+from chain.serializers import RetailImportSerializer
+
+
+# ----------------------------------------------------------------
+class TradeUnitBulkImporter:
+    """
+    Bulk importer of trade units with their contacts and products
+
+    Every batch is validated at once (a fixed number of queries for providers, products and contacts)
+    and written in one short transaction with bulk inserts, so the number of queries depends
+    on the number of batches instead of the number of rows (rolled-up debts of providers are shifted
+    once per batch by the difference of debts of written units and moved subtrees summed by path)
+
+    Attrs:
+        - batch_size: defines number of rows validated and written together
+        - upsert: defines whether rows with an existing contact email update the unit of that contact
+    """
+    def __init__(self, batch_size: int = 1000, upsert: bool = False) -> None:
+        self.batch_size = batch_size
+        self.upsert = upsert
+
+    def run(self, rows: Iterable[dict]) -> Iterator[dict]:
+        """
+        Method to import rows batch by batch
+
+        Params:
+            - rows: iterable with dictionaries in format of RetailImportSerializer
+
+        Returns:
+            - iterator with result of every row: {'row': n, 'id': pk, 'status': 'created' | 'updated'}
+              or {'row': n, 'errors': {...}}
+        """
+        numbered = enumerate(rows, start=1)
+        while batch := list(islice(numbered, self.batch_size)):
+            yield from self.import_batch(batch)
+
+    def import_batch(self, batch: list[tuple[int, Any]]) -> list[dict]:
+        """
+        Method to validate and write one batch of numbered rows
+
+        Returns:
+            - list with results ordered by row number
+        """
+        results, valid = {}, []
+        for number, row in batch:
+            serializer = RetailImportSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((number, serializer.validated_data))
+            else:
+                results[number] = {'row': number, 'errors': serializer.errors}
+
+        providers = {
+            pk: (path, unit_type) for pk, path, unit_type in TradeUnit.objects.filter(
+                pk__in={data['provider'] for _, data in valid if data['provider']}
+            ).values_list('pk', 'path', 'unit_type')
+        }
+        prices = dict(Product.objects.filter(
+            pk__in={pk for _, data in valid for pk in data['products']}
+        ).values_list('pk', 'price'))
+        contacts = {contact.email: contact for contact in Contact.objects.filter(
+            email__in=[data['contact']['email'] for _, data in valid]
+        )}
+        units = {unit.contact_id: unit for unit in TradeUnit.objects.filter(contact__in=contacts.values())}
+
+        accepted, emails = [], set()
+        for number, data in valid:
+            email = data['contact']['email']
+            unit = units.get(contacts[email].pk) if email in contacts else None
+            errors = self.check_row(data, providers, prices, unit)
+            if email in emails or (email in contacts and not self.upsert):
+                errors['contact'] = {'email': ['Contact with this Email address already exists.']}
+            emails.add(email)
+            if errors:
+                results[number] = {'row': number, 'errors': errors}
+            else:
+                accepted.append((number, data))
+
+        with transaction.atomic():
+            results.update(self.write(accepted, providers, prices, contacts, units))
+        return [results[number] for number in sorted(results)]
+
+    @staticmethod
+    def check_row(data: dict, providers: dict, prices: dict, unit: TradeUnit | None) -> dict:
+        """
+        Method to check references of one validated row against data loaded for the whole batch
+        (provider changes of existing units are checked on write against current paths)
+
+        Returns:
+            - dictionary with errors (empty if row is correct)
+        """
+        errors = {}
+        provider_id = data['provider']
+        if data['unit_type'] == TradeUnit.UnitType.manufacture:
+            if provider_id:
+                errors['provider'] = ['Manufacture should not have provider']
+        elif not provider_id:
+            errors['provider'] = ['This field is required.']
+        elif provider_id not in providers:
+            errors['provider'] = [f'Invalid pk "{provider_id}" - object does not exist.']
+        elif unit is None and (error := TradeUnit().provider_error(provider_id, providers[provider_id][0])):
+            errors['provider'] = [error]
+        missing = [pk for pk in data['products'] if pk not in prices]
+        if missing:
+            errors['products'] = [f'Invalid pk "{pk}" - object does not exist.' for pk in missing]
+        return errors
+
+    @staticmethod
+    def write(accepted: list, providers: dict, prices: dict, contacts: dict, units: dict) -> dict:
+        """
+        Method to write accepted rows with bulk inserts and updates: provider changes of existing units
+        are checked and applied first, one row at a time against current paths (so rows depending
+        on each other can not make a cycle), then providers of new units are checked against paths
+        after these moves
+
+        Returns:
+            - dictionary with results of written rows (and of rows rejected by current paths) by row number
+        """
+        rows = []
+        for number, data in accepted:
+            contact = contacts.get(data['contact']['email'])
+            rows.append((number, data, units.get(contact.pk) if contact else None))
+        moving = [(number, data, unit) for number, data, unit in rows if unit and unit.provider_id != data['provider']]
+        changed_ids = {unit.pk for _, _, unit in rows if unit}
+        previous_totals = TradeUnitBulkImporter.network_totals(
+            changed_ids, {unit.pk: unit.subtree_path for _, _, unit in moving}
+        )
+        results = TradeUnitBulkImporter.move_units(moving)
+        if moving:
+            providers.update(
+                (pk, (path, providers[pk][1]))
+                for pk, path in TradeUnit.objects.filter(pk__in=providers).values_list('pk', 'path')
+            )
+            for number, data, unit in rows:
+                if unit is None and (error := TradeUnit().provider_error(
+                    data['provider'], providers[data['provider']][0] if data['provider'] else ''
+                )):
+                    results[number] = {'row': number, 'errors': {'provider': [error]}}
+        rows = [row for row in rows if row[0] not in results]
+
+        created_contacts = Contact.objects.bulk_create(
+            [Contact(**data['contact']) for _, data, _ in rows if data['contact']['email'] not in contacts]
+        )
+        created_emails = {contact.email for contact in created_contacts}
+        contacts.update((contact.email, contact) for contact in created_contacts)
+        updated_contacts, new_units, changed_units, links = [], [], [], []
+        for number, data, unit in rows:
+            contact = contacts[data['contact']['email']]
+            if contact.email not in created_emails:
+                for field, value in data['contact'].items():
+                    setattr(contact, field, value)
+                updated_contacts.append(contact)
+            fields = {
+                'title': data['title'],
+                'unit_type': data['unit_type'],
+                'debt': sum((prices[pk] or Decimal(0) for pk in data['products']), Decimal(0)),
+            }
+            if unit is None:
+                provider_id = data['provider']
+                path = f'{providers[provider_id][0]}{provider_id}/' if provider_id else ''
+                unit = TradeUnit(contact=contact, provider_id=provider_id, path=path, level=path.count('/'), **fields)
+                new_units.append(unit)
+            else:
+                for field, value in fields.items():
+                    setattr(unit, field, value)
+                changed_units.append(unit)
+            links.append((number, unit, data['products']))
+
+        Contact.objects.bulk_update(updated_contacts, ['country', 'city', 'street', 'number'])
+        TradeUnit.objects.bulk_create(new_units)
+        TradeUnit.objects.bulk_update(changed_units, ['title', 'unit_type', 'debt'])
+        through = TradeUnit.products.through
+        through.objects.filter(tradeunit__in=changed_units).delete()
+        through.objects.bulk_create([
+            through(tradeunit_id=unit.pk, product_id=product_id)
+            for _, unit, product_ids in links for product_id in product_ids
+        ])
+        moved_paths = dict(
+            TradeUnit.objects.filter(pk__in=[unit.pk for _, _, unit in moving]).values_list('pk', 'path')
+        )
+        totals = TradeUnitBulkImporter.network_totals(
+            changed_ids | {unit.pk for unit in new_units}, {pk: f'{path}{pk}/' for pk, path in moved_paths.items()}
+        )
+        TradeUnit.objects.add_network_debts({
+            pk: totals[pk] - previous_totals[pk] for pk in totals.keys() | previous_totals.keys()
+        })
+        updated_ids = {unit.pk for unit in changed_units}
+        units_changed(updated_ids)
+        units_changed([unit.pk for unit in new_units], TradeUnitChange.Action.created)
+        results.update(
+            (number, {'row': number, 'id': unit.pk, 'status': 'updated' if unit.pk in updated_ids else 'created'})
+            for number, unit, _ in links
+        )
+        return results
+
+    @staticmethod
+    def move_units(moving: list) -> dict:
+        """
+        Method to check and apply provider changes of existing units one row at a time: paths
+        of the unit and of its new provider are read after moves of previous rows, so the check
+        of cycles and depth of chain sees the network as it is
+
+        Params:
+            - moving: list with row number, validated data and unit of rows changing provider
+
+        Returns:
+            - dictionary with results of rejected rows by row number
+        """
+        rejected = {}
+        for number, data, unit in moving:
+            provider_id = data['provider']
+            paths = dict(TradeUnit.objects.filter(pk__in=[unit.pk, provider_id]).values_list('pk', 'path'))
+            unit.path = paths[unit.pk]
+            provider_path = paths.get(provider_id, '')
+            if error := unit.provider_error(provider_id, provider_path, unit.path):
+                rejected[number] = {'row': number, 'errors': {'provider': [error]}}
+                continue
+            old_prefix = unit.subtree_path
+            unit.provider_id, unit.path = provider_id, f'{provider_path}{provider_id}/' if provider_id else ''
+            unit.level = len(unit.ancestor_ids)
+            TradeUnit.objects.filter(pk=unit.pk).update(provider_id=provider_id, path=unit.path, level=unit.level)
+            TradeUnit.objects.move_subtree(old_prefix, unit.subtree_path)
+        return rejected
+
+    @staticmethod
+    def network_totals(ids: set[int], prefixes: dict[int, str], batch_size: int = 100) -> defaultdict:
+        """
+        Method to sum debts of units and of downstream networks of moved units for every provider
+        from their paths (every unit is counted once: subtrees are matched by the topmost prefixes only)
+
+        Params:
+            - ids: defines ids of written units
+            - prefixes: defines path prefixes of downstream networks by id of moved unit
+            - batch_size: defines number of path prefixes matched by one query
+
+        Returns:
+            - dictionary with total debt by id of provider
+        """
+        totals = TradeUnit.objects.filter(pk__in=ids).path_totals()
+        topmost = [prefix for prefix in prefixes.values() if prefixes.keys().isdisjoint(path_ids(prefix)[:-1])]
+        for start in range(0, len(topmost), batch_size):
+            subtrees = TradeUnit.objects.filter(
+                reduce(or_, (Q(path__startswith=prefix) for prefix in topmost[start:start + batch_size]))
+            ).exclude(pk__in=ids)
+            for pk, total in subtrees.path_totals().items():
+                totals[pk] += total
+        return totals
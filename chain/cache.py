@@ -0,0 +1,133 @@
+import hashlib
+import uuid
+from typing import Any, NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+# ----------------------------------------------------------------
+class CachedUnit(NamedTuple):
+    """
+    Result of cache lookup of one unit
+
+    Attrs:
+        - data: defines cached serialized unit (None in case of miss)
+        - key: defines key to store the unit
+    """
+    data: Any
+    key: str
+
+
+# ----------------------------------------------------------------
+class RetailCache:
+    """
+    Cache of serialized retail responses
+
+    Serialized unit is stored under a key built from its version read from the database (increased
+    on change of the unit and of any provider in its path), so a cached unit never outlives its version
+    in any process sharing the cache. Lists are stored under a key built from a generation token renewed
+    on any change and from query parameters, so processes serving requests have to share the cache backend
+    to see renewed tokens. Every key also includes a token shared by all responses, so they are cleared
+    at once without touching other entries of the cache alias
+
+    Attrs:
+        - alias: defines alias of cache in CACHES setting
+        - timeout: defines lifetime of cached responses in seconds
+    """
+    def __init__(self, alias: str = 'retail', timeout: int | None = None) -> None:
+        self.alias = alias
+        self.timeout = timeout if timeout is not None else getattr(settings, 'RETAIL_CACHE_TIMEOUT', 300)
+
+    @property
+    def cache(self) -> Any:
+        return caches[self.alias]
+
+    def get_unit(self, pk: Any, version: int, variant: str = '') -> CachedUnit:
+        """
+        Method to look up serialized unit by its version
+
+        Params:
+            - version: defines version of unit read from the database before its row
+            - variant: defines shape of response (e.g. query parameters selecting fields)
+        """
+        digest = hashlib.md5(f'{self.versions([])["all"]}:{variant}'.encode()).hexdigest()
+        key = f'unit:{pk}:{version}:{digest}'
+        return self.count(CachedUnit(self.cache.get(key), key))
+
+    def set_unit(self, lookup: CachedUnit, data: Any) -> None:
+        """
+        Method to store serialized unit under key of its lookup
+        """
+        self.cache.set(lookup.key, data, self.timeout)
+
+    def get_list(self, params: str) -> tuple[Any, str]:
+        """
+        Method to look up serialized list page by query parameters and current generation
+
+        Returns:
+            - tuple with cached data (None in case of miss) and key to store the page
+        """
+        generation = '-'.join(self.versions(['list']).values())
+        key = f'list:{generation}:{hashlib.md5(params.encode()).hexdigest()}'
+        data = self.cache.get(key)
+        self.count(CachedUnit(data, key))
+        return data, key
+
+    def set_list(self, key: str, data: Any) -> None:
+        """
+        Method to store serialized list page
+        """
+        self.cache.set(key, data, self.timeout)
+
+    def invalidate(self) -> None:
+        """
+        Method to renew generation of lists after commit of current transaction
+        (cached units are evicted by increased versions)
+        """
+        token = uuid.uuid4().hex
+        transaction.on_commit(lambda: self.cache.set('version:list', token, None))
+
+    def clear(self) -> None:
+        """
+        Method to evict all cached responses by renewing the shared token and to reset numbers of hits and misses
+        """
+        self.cache.set('version:all', uuid.uuid4().hex, None)
+        self.cache.delete_many(['stats:hits', 'stats:misses'])
+
+    def versions(self, pks: list) -> dict:
+        """
+        Method to read version tokens with the shared token (missing tokens are created, so an evicted
+        version never matches responses stored before)
+        """
+        keys = [f'version:{pk}' for pk in ('all', *pks)]
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                self.cache.add(key, uuid.uuid4().hex, None)
+                versions[key] = self.cache.get(key)
+        return {key[len('version:'):]: versions[key] for key in keys}
+
+    def count(self, lookup: CachedUnit) -> CachedUnit:
+        """
+        Method to count hit or miss of lookup
+        """
+        key = 'stats:hits' if lookup.data is not None else 'stats:misses'
+        if not self.cache.add(key, 1, None):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, 1, None)
+        return lookup
+
+    def stats(self) -> dict:
+        """
+        Method to get numbers of hits and misses
+        """
+        stats = self.cache.get_many(['stats:hits', 'stats:misses'])
+        hits, misses = stats.get('stats:hits', 0), stats.get('stats:misses', 0)
+        return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None}
+
+
+retail_cache = RetailCache()
@@ -0,0 +1,73 @@
+from typing import Iterable
+from weakref import WeakSet
+
+from django.db import transaction
+from django.db.models import QuerySet
+
+from chain.cache import retail_cache
+from chain.models import TradeUnit, TradeUnitChange
+
+
+# ----------------------------------------------------------------
+class RegisteredChanges:
+    """
+    Marker of changes of units registered by one call inside of a transaction. Its only strong reference
+    is its callback passed to transaction.on_commit, so the marker is dropped together with callbacks
+    of a rolled back transaction or savepoint (and with increased versions and records of change log
+    of the marker); a live marker which is not committed means that its changes belong to current transaction
+
+    Attrs:
+        - precedence: defines actions from the weakest one (a unit keeps the strongest of its actions)
+        - actions: defines action by id of changed unit
+        - committed: defines whether transaction of changes is committed already
+    """
+    precedence: tuple = (TradeUnitChange.Action.updated, TradeUnitChange.Action.created, TradeUnitChange.Action.deleted)
+
+    def __init__(self, actions: dict) -> None:
+        self.actions = actions
+        self.committed = False
+
+    def commit(self) -> None:
+        """
+        Method to mark changes as committed, so later transactions register the units again
+        """
+        self.committed = True
+
+
+# ----------------------------------------------------------------
+def units_changed(pks: Iterable[int] | QuerySet, action: str = TradeUnitChange.Action.updated) -> None:
+    """
+    Function to register change of units inside of the writing transaction: versions of units and of their
+    downstream networks are increased and changes are appended to change log at once, cached lists are evicted
+    after commit (a unit changed by several signals of one transaction gets one increase of version and one record
+    of change log, unless its later action is stronger)
+
+    Params:
+        - pks: ids of changed units (list or queryset of ids)
+        - action: defines kind of change. Choose by class TradeUnitChange.Action
+    """
+    connection = transaction.get_connection()
+    markers = getattr(connection, 'unit_changes', None)
+    if markers is None:
+        markers = connection.unit_changes = WeakSet()
+    current = [marker for marker in markers if not marker.committed]
+    if isinstance(pks, QuerySet):
+        actions = {}
+    else:
+        strength = RegisteredChanges.precedence.index
+        registered = {}
+        for marker in current:
+            for pk, unit_action in marker.actions.items():
+                if pk not in registered or strength(registered[pk]) < strength(unit_action):
+                    registered[pk] = unit_action
+        actions = {pk: action for pk in pks if pk not in registered or strength(registered[pk]) < strength(action)}
+        if not actions:
+            return
+    with transaction.atomic():
+        TradeUnit.objects.bump_versions(pks if isinstance(pks, QuerySet) else list(actions))
+        TradeUnitChange.objects.record(pks if isinstance(pks, QuerySet) else list(actions), action)
+        if not current:
+            retail_cache.invalidate()
+        marker = RegisteredChanges(actions)
+        markers.add(marker)
+        transaction.on_commit(marker.commit)
@@ -0,0 +1,159 @@
+from functools import cache
+from typing import Any, Iterable
+
+from rest_framework.exceptions import ValidationError
+
+from chain.models import Contact, Product, TradeUnit, path_ids
+from chain.serializers import RetailSerializer
+from trading_network.instrumentation import serialization_span
+
+
+# ----------------------------------------------------------------
+@cache
+def retail_fields() -> dict:
+    """
+    Function to get bound fields of RetailSerializer (formatting of scalar values is taken from them)
+    """
+    return dict(RetailSerializer().fields)
+
+
+# ----------------------------------------------------------------
+class CompactRetailSerializer:
+    """
+    Fast serializer of units for list and retrieve actions
+
+    Output is built from values() rows without model instances and nested serializers: scalar values
+    are formatted by fields of RetailSerializer, so the default shape is byte-identical to it. Providers,
+    contacts and products of the whole page are fetched with one query each, and every provider is
+    serialized once and shared by all its consumers
+
+    Attrs:
+        - nested: defines names of fields built from related rows
+        - fields: defines names of selected fields in order of RetailSerializer
+        - flat: defines whether provider is returned as provider_id instead of nested chain
+    """
+    nested: tuple = ('provider', 'contact', 'products', 'unit_type')
+
+    def __init__(self, fields: Iterable[str] | None = None, flat: bool = False) -> None:
+        available = retail_fields()
+        if fields is None:
+            self.fields = list(available)
+        else:
+            selected = {'provider' if name == 'provider_id' else name for name in fields}
+            unknown = selected - available.keys()
+            if unknown:
+                raise ValidationError({'fields': [f'Unknown fields: {", ".join(sorted(unknown))}']})
+            self.fields = [name for name in available if name in selected]
+        self.flat = flat
+        self.scalars = {name: available[name] for name in self.fields if name not in self.nested}
+        self.contact_fields = list(available['contact'].fields.items())
+        self.product_fields = list(available['products'].child.fields.items())
+        self.unit_types = dict(TradeUnit._meta.get_field('unit_type').flatchoices)
+
+    @classmethod
+    def from_params(cls, params: Any, flat: bool = False) -> 'CompactRetailSerializer':
+        """
+        Method to build serializer from query parameters ?fields=<comma separated names>&flat=true
+
+        Params:
+            - flat: defines mode used when flat parameter is omitted
+        """
+        fields = params.get('fields')
+        return cls(
+            fields=[name.strip() for name in fields.split(',') if name.strip()] if fields else None,
+            flat=params.get('flat') in ('true', '1') if 'flat' in params else flat
+        )
+
+    @property
+    def columns(self) -> list[str]:
+        """
+        Names of unit columns to fetch with values()
+        """
+        return list(dict.fromkeys([
+            'id', 'path', 'level', 'provider_id', 'contact_id', 'unit_type', *(field.source for field in self.scalars.values())
+        ]))
+
+    def serialize(self, rows: Iterable[dict]) -> list[dict]:
+        """
+        Method to serialize unit rows (fetched with values(*columns))
+
+        Returns:
+            - list with serialized units
+        """
+        rows = list(rows)
+        units = {row['id']: row for row in rows}
+        if 'provider' in self.fields and not self.flat:
+            ancestor_ids = {pk for row in rows for pk in path_ids(row['path'])}
+            ancestor_ids.update(row['provider_id'] for row in rows if row['provider_id'] is not None)
+            ancestor_ids -= units.keys()
+            if ancestor_ids:
+                ancestors = TradeUnit.objects.filter(pk__in=ancestor_ids).values(*self.columns)
+                units.update((row['id'], row) for row in ancestors)
+        contacts = self.contacts(units.values()) if 'contact' in self.fields else {}
+        products = self.products(units) if 'products' in self.fields else {}
+        serialized, building = {}, set()
+
+        def build(pk: int) -> dict:
+            if pk in serialized:
+                return serialized[pk]
+            if pk in building:
+                raise ValueError(f'Provider chain of unit {pk} is a cycle')
+            building.add(pk)
+            row, data = units[pk], {}
+            for name in self.fields:
+                if name == 'provider':
+                    if self.flat:
+                        data['provider_id'] = row['provider_id']
+                    else:
+                        data[name] = build(row['provider_id']) if row['provider_id'] in units else None
+                elif name == 'contact':
+                    data[name] = contacts.get(row['contact_id'])
+                elif name == 'products':
+                    data[name] = products.get(pk, [])
+                elif name == 'unit_type':
+                    data[name] = self.unit_types.get(row['unit_type'], row['unit_type'])
+                else:
+                    field = self.scalars[name]
+                    value = row[field.source]
+                    data[name] = None if value is None else field.to_representation(value)
+            serialized[pk] = data
+            return data
+
+        with serialization_span():
+            return [build(row['id']) for row in rows]
+
+    def contacts(self, units: Iterable[dict]) -> dict[int, dict]:
+        """
+        Method to fetch and serialize contacts of units with one query
+        """
+        ids = {unit['contact_id'] for unit in units if unit['contact_id'] is not None}
+        if not ids:
+            return {}
+        rows = Contact.objects.filter(pk__in=ids).values(
+            *(field.source for _, field in self.contact_fields)
+        )
+        return {row['id']: self.format(row, self.contact_fields) for row in rows}
+
+    def products(self, units: dict[int, dict]) -> dict[int, list[dict]]:
+        """
+        Method to fetch and serialize products of units with one query (every product is formatted once)
+        """
+        result, formatted = {}, {}
+        rows = Product.objects.filter(units__in=list(units)).values(
+            'units', *(field.source for _, field in self.product_fields)
+        )
+        for row in rows:
+            if row['id'] not in formatted:
+                formatted[row['id']] = self.format(row, self.product_fields)
+            result.setdefault(row['units'], []).append(formatted[row['id']])
+        return result
+
+    @staticmethod
+    def format(row: dict, fields: list) -> dict:
+        """
+        Method to format values of row by serializer fields
+        """
+        return {
+            name: None if row[field.source] is None else field.to_representation(row[field.source])
+            for name, field in fields
+        }
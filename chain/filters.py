@@ -1,5 +1,6 @@
 from typing import Type
 
+from django.db.models import QuerySet
 from django_filters import rest_framework as filters
 
 from chain.models import TradeUnit
@@ -9,10 +10,64 @@ from chain.models import TradeUnit
 # custom filterset class
 class RetailCountryFilter(filters.FilterSet):
     """
-    Filterset class defining filter field
+    Filterset class defining filter fields
+
+    Every filter is a lookup served by an index (country and city by indexes of contact, ranges of level
+    and debt by (level, id) and (debt, id), supplier by materialized path prefix, product by index
+    of the through table), so filters can be combined with any ordering of keyset pagination
+
+    Attrs:
+        - city: defines filter by city of contact
+        - country: defines filter by country of contact
+        - unit_type: defines filter by type of unit
+        - level_min, level_max: define bounds of level
+        - debt_min, debt_max: define bounds of debt
+        - provider: defines filter by id of the nearest provider
+        - supplier: defines filter by id of any provider up the chain (whole downstream network)
+        - product: defines filter by id of product
+        - subtree_paths: defines path prefixes of downstream networks by id of supplier (None for unknown
+          supplier), read by aload_subtree_paths in asynchronous views
     """
     city = filters.CharFilter(field_name='contact__city')
+    country = filters.CharFilter(field_name='contact__country')
+    unit_type = filters.ChoiceFilter(choices=TradeUnit.UnitType.choices)
+    level_min = filters.NumberFilter(field_name='level', lookup_expr='gte')
+    level_max = filters.NumberFilter(field_name='level', lookup_expr='lte')
+    debt_min = filters.NumberFilter(field_name='debt', lookup_expr='gte')
+    debt_max = filters.NumberFilter(field_name='debt', lookup_expr='lte')
+    provider = filters.NumberFilter(field_name='provider_id')
+    supplier = filters.NumberFilter(method='filter_supplier')
+    product = filters.NumberFilter(field_name='products')
 
     class Meta:
         model: Type[TradeUnit] = TradeUnit
-        fields: list = ['city']
+        fields: list = [
+            'city', 'country', 'unit_type', 'level_min', 'level_max', 'debt_min', 'debt_max',
+            'provider', 'supplier', 'product'
+        ]
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.subtree_paths = {}
+
+    def filter_supplier(self, queryset: QuerySet, name: str, value: int) -> QuerySet:
+        """
+        Method to filter downstream network of supplier by prefix of materialized path read beforehand
+        (constant prefix is served by index of path, unknown supplier gives empty result)
+        """
+        if int(value) not in self.subtree_paths:
+            supplier = TradeUnit.objects.filter(pk=int(value)).only('path').first()
+            self.subtree_paths[int(value)] = supplier.subtree_path if supplier else None
+        if self.subtree_paths[int(value)] is None:
+            return queryset.none()
+        return queryset.filter(path__startswith=self.subtree_paths[int(value)])
+
+    async def aload_subtree_paths(self) -> None:
+        """
+        Method to read path prefix of supplier with asynchronous ORM, so qs is built without synchronous queries
+        (to be called after is_valid)
+        """
+        value = self.form.cleaned_data.get('supplier')
+        if value is not None:
+            supplier = await TradeUnit.objects.filter(pk=int(value)).only('path').afirst()
+            self.subtree_paths[int(value)] = supplier.subtree_path if supplier else None
@@ -0,0 +1,159 @@
+import statistics
+import time
+from typing import Any, Callable, NamedTuple
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from chain.models import Contact, Product, TradeUnit
+from chain.search import search_units
+from chain.synthetic import NetworkGenerator
+
+
+# ----------------------------------------------------------------
+class Probe(NamedTuple):
+    """
+    Query of an access path with expected index and latency budget
+
+    Attrs:
+        - name: defines name of access path
+        - build: defines function building queryset from sample values
+        - index: defines substring of index name expected in query plan (None if not checked)
+        - budget_ms: defines allowed median latency in milliseconds
+        - vendors: defines database vendors where index usage is checked
+    """
+    name: str
+    build: Callable[[dict], QuerySet]
+    index: str | None
+    budget_ms: float
+    vendors: tuple = ('postgresql', 'sqlite')
+
+
+PROBES: list[Probe] = [
+    Probe(
+        'retail list by city (API filter)',
+        lambda s: TradeUnit.objects.filter(contact__city=s['city']).order_by('pk')[:100],
+        'contact_city_idx', 50
+    ),
+    Probe(
+        'retail list by country (admin filter)',
+        lambda s: TradeUnit.objects.filter(contact__country=s['country']).order_by('-pk')[:100],
+        'contact_country_city_idx', 50
+    ),
+    Probe(
+        'retail list by country and city (admin filter)',
+        lambda s: TradeUnit.objects.filter(contact__country=s['country'], contact__city=s['city']).order_by('-pk')[:100],
+        'contact_country_city_idx', 50
+    ),
+    Probe(
+        'contacts by country (admin filter)',
+        lambda s: Contact.objects.filter(country=s['country']).order_by('-pk')[:100],
+        'contact_country_city_idx', 50
+    ),
+    Probe(
+        'products by model (admin filter)',
+        lambda s: Product.objects.filter(model=s['model']).order_by('-pk')[:100],
+        'product_model_idx', 50
+    ),
+    Probe(
+        'consumers of provider',
+        lambda s: TradeUnit.objects.filter(provider_id=s['provider']),
+        'chain_tradeunit_provider_id_', 50
+    ),
+    Probe(
+        'downstream network of unit',
+        lambda s: TradeUnit.objects.filter(path__startswith=s['subtree_path'])[:100],
+        'chain_tradeunit_path_', 50, ('postgresql',)
+    ),
+    Probe(
+        'units linked to product',
+        lambda s: TradeUnit.objects.filter(products=s['product']),
+        'chain_tradeunit_products_product_id_', 50
+    ),
+    Probe(
+        'search of units (API search, admin search)',
+        lambda s: search_units(TradeUnit.objects.all(), s['city'])[:20],
+        '_trgm_idx', 50, ('postgresql',)
+    ),
+]
+
+
+# ----------------------------------------------------------------
+class Command(BaseCommand):
+    """
+    Command to check that filters of API and admin use indexes and stay within latency budgets
+    (EXPLAIN of every access path is checked against expected index)
+    """
+    help = 'Audit query plans and latency of chain access paths'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Number of synthetic units created for the audit and rolled back afterwards'
+        )
+        parser.add_argument('--runs', type=int, default=20, help='Number of runs to measure median latency')
+        parser.add_argument('--budget-scale', type=float, default=1.0, help='Multiplier of latency budgets')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print query plans')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        with transaction.atomic():
+            if options['seed']:
+                NetworkGenerator(options['seed']).generate()
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            sample = self.sample()
+            failures = [
+                failure for probe in PROBES
+                if (failure := self.audit(probe, sample, options))
+            ]
+            transaction.set_rollback(True)
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'All {len(PROBES)} access paths passed'))
+
+    def audit(self, probe: Probe, sample: dict, options: dict) -> str | None:
+        """
+        Method to check query plan and median latency of one access path
+
+        Returns:
+            - description of failure or None
+        """
+        queryset = probe.build(sample)
+        plan = queryset.explain()
+        if options['verbose_plans']:
+            self.stdout.write(f'{probe.name}:\n{plan}')
+        timings = []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        median = statistics.median(timings)
+        budget = probe.budget_ms * options['budget_scale']
+        self.stdout.write(f'{probe.name}: {median:.2f} ms (budget {budget:.0f} ms)')
+        if probe.index and connection.vendor in probe.vendors and probe.index not in plan:
+            return f'{probe.name}: index {probe.index} is not used\n{plan}'
+        if median > budget:
+            return f'{probe.name}: median latency {median:.2f} ms exceeds budget {budget:.0f} ms'
+        return None
+
+    @staticmethod
+    def sample() -> dict:
+        """
+        Method to pick existing values used as filter parameters
+
+        Raises:
+            - CommandError (in case of database has no units to audit)
+        """
+        unit = TradeUnit.objects.filter(contact__isnull=False, provider__isnull=False).select_related('contact').last()
+        product = Product.objects.last()
+        if unit is None or product is None:
+            raise CommandError('No data to audit, use --seed')
+        return {
+            'city': unit.contact.city,
+            'country': unit.contact.country,
+            'model': product.model,
+            'product': product.pk,
+            'provider': unit.provider_id,
+            'subtree_path': f'{unit.path[:unit.path.index("/") + 1]}',
+        }
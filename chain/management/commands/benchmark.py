@@ -0,0 +1,251 @@
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_databases, teardown_databases
+
+from chain.cache import retail_cache
+from chain.models import Product, TradeUnit
+from chain.synthetic import NetworkGenerator
+from core.models import User
+
+
+# ----------------------------------------------------------------
+class Command(BaseCommand):
+    """
+    Command to benchmark API and admin endpoints on a synthetic network (throttling is disabled as one
+    client sends all requests). The network is created in a throwaway test database (destroyed afterwards,
+    so the configured database is never touched) and committed, every request runs in its own transactions
+    as in production (so work done after commit is measured). Retail responses are cached in a separate
+    local memory cache
+
+    Every scenario is measured by number of queries, latency percentiles and peak of traced memory
+    and compared with stored baseline: queries must not grow, memory must not exceed baseline by more
+    than threshold, latency (p95) relative to a fixed calibration workload measured on the same machine
+    must not exceed the relative latency of baseline by more than threshold (so a baseline stored
+    on another machine is still comparable)
+
+    Attrs:
+        - calibration_payload: defines data serialized by calibration workload
+    """
+    help = 'Benchmark API and admin endpoints against stored baseline'
+    calibration_payload: list = [{'id': number, 'title': f'Unit {number}', 'debt': '10.00'} for number in range(2000)]
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--size', type=int, default=10_000, help='Number of synthetic units')
+        parser.add_argument('--depth', type=int, default=3, help='Level of the deepest units')
+        parser.add_argument('--fanout', type=int, default=10, help='Number of consumers of every provider')
+        parser.add_argument('--iterations', type=int, default=30, help='Number of requests per scenario')
+        parser.add_argument(
+            '--baseline', type=Path, default=Path(settings.BASE_DIR) / 'benchmark_baseline.json',
+            help='Path to JSON file with baseline'
+        )
+        parser.add_argument('--save-baseline', action='store_true', help='Store results as new baseline')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Allowed relative growth of latency and memory over baseline'
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        caches = {**settings.CACHES, 'retail': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark',
+        }}
+        with override_settings(THROTTLE_ENABLED=False, CACHES=caches):
+            old_config = setup_databases(verbosity=0, interactive=False, aliases={connection.alias})
+            try:
+                with transaction.atomic():
+                    network = NetworkGenerator(
+                        options['size'], depth=options['depth'], fanout=options['fanout']
+                    ).generate()
+                client = self.client()
+                results = {
+                    name: self.measure(scenario, options['iterations'])
+                    for name, scenario in self.scenarios(client, network).items()
+                }
+            finally:
+                teardown_databases(old_config, verbosity=0)
+        calibration_ms = self.calibrate(options['iterations'])
+
+        self.stdout.write(f'calibration: {calibration_ms} ms')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name}: {result["queries"]} queries, p50 {result["p50_ms"]} ms, p95 {result["p95_ms"]} ms, '
+                f'p99 {result["p99_ms"]} ms, memory {result["memory_kb"]} KB'
+            )
+        if options['save_baseline']:
+            options['baseline'].write_text(
+                json.dumps({'calibration_ms': calibration_ms, 'scenarios': results}, indent=2)
+            )
+            self.stdout.write(self.style.SUCCESS(f'Baseline is stored in {options["baseline"]}'))
+            return
+        if not options['baseline'].exists():
+            self.stdout.write(self.style.WARNING('No baseline to compare with, use --save-baseline'))
+            return
+        failures = self.compare(
+            results, calibration_ms, json.loads(options['baseline'].read_text()), options['threshold']
+        )
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All scenarios are within baseline'))
+
+    @staticmethod
+    def client() -> Client:
+        """
+        Method to create logged in superuser client
+        """
+        User.objects.create_superuser('benchmark', 'benchmark@synthetic.example', 'benchmark-password')
+        client = Client()
+        client.login(username='benchmark', password='benchmark-password')
+        return client
+
+    @staticmethod
+    def scenarios(client: Client, network: Any) -> dict[str, Callable[[], Any]]:
+        """
+        Method to build requests of every scenario on synthetic units (caches are cleared to measure
+        uncached responses), one product is linked to every synthetic unit
+        """
+        product_ids = list(Product.objects.filter(units=network.deepest).values_list('pk', flat=True))
+        with transaction.atomic():
+            shared_product = Product.objects.create(title='Benchmark product', model='B', price=10)
+            shared_product.units.add(*TradeUnit.objects.values_list('pk', flat=True))
+        provider = TradeUnit.objects.filter(
+            unit_type=TradeUnit.UnitType.retail_network, path__startswith=f'{network.factories[0]}/'
+        ).values_list('pk', flat=True).first()
+        counter = iter(range(10 ** 9))
+
+        def cold(url: str) -> Callable[[], Any]:
+            def request() -> Any:
+                retail_cache.clear()
+                return client.get(url)
+            return request
+
+        def create() -> Any:
+            return client.post('/api/retail/', data={
+                'title': 'Benchmark unit',
+                'unit_type': TradeUnit.UnitType.entrepreneur,
+                'provider': provider,
+                'contact': {'email': f'benchmark{next(counter)}@synthetic.example', 'country': 'Country 1'},
+                'products': product_ids,
+            }, content_type='application/json')
+
+        def prices() -> Any:
+            step = next(counter) % 2
+            return client.post('/api/products/prices/', data=[
+                {'id': pk, 'price': f'{10 + step}.00'} for pk in product_ids
+            ], content_type='application/json')
+
+        def shared_price() -> Any:
+            step = next(counter) % 2
+            return client.patch(
+                f'/api/products/{shared_product.pk}/', data={'price': f'{10 + step}.00'},
+                content_type='application/json'
+            )
+
+        def login() -> Any:
+            return Client().post('/api/user/auth/', data={
+                'username': 'benchmark', 'password': 'benchmark-password'
+            }, content_type='application/json')
+
+        def token_login() -> Any:
+            return Client().post('/api/user/token/', data={
+                'username': 'benchmark', 'password': 'benchmark-password'
+            }, content_type='application/json')
+
+        token_client = Client(HTTP_AUTHORIZATION=f'Token {token_login().json()["token"]}')
+        etag = client.get(f'/api/retail/{network.deepest}/')['ETag']
+
+        return {
+            'retail list': cold('/api/retail/?page_size=100'),
+            'retail list (cached)': lambda: client.get('/api/retail/?page_size=100'),
+            'retail retrieve': cold(f'/api/retail/{network.deepest}/'),
+            'retail retrieve (cached)': lambda: client.get(f'/api/retail/{network.deepest}/'),
+            'retail retrieve (not modified)': lambda: client.get(
+                f'/api/retail/{network.deepest}/', HTTP_IF_NONE_MATCH=etag
+            ),
+            'retail create': create,
+            'product prices update': prices,
+            'product price update (linked to every unit)': shared_price,
+            'admin units changelist': lambda: client.get('/admin/chain/tradeunit/'),
+            'admin contacts changelist': lambda: client.get('/admin/chain/contact/'),
+            'login': login,
+            'token login': token_login,
+            'retail retrieve (token, cached)': lambda: token_client.get(f'/api/retail/{network.deepest}/'),
+        }
+
+    @staticmethod
+    def measure(scenario: Callable[[], Any], iterations: int) -> dict:
+        """
+        Method to run scenario and collect number of queries, latency percentiles
+        and peak of traced memory (measured in a separate run, as tracing slows requests down)
+
+        Raises:
+            - CommandError (in case of unsuccessful response)
+        """
+        response = scenario()
+        if response.status_code >= 400:
+            raise CommandError(f'Scenario failed with status {response.status_code}: {response.content[:200]}')
+        timings, queries = [], 0
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                scenario()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = max(queries, len(captured))
+        tracemalloc.start()
+        scenario()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        timings.sort()
+        return {
+            'queries': queries,
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(int(len(timings) * 0.95), len(timings) - 1)], 2),
+            'p99_ms': round(timings[min(int(len(timings) * 0.99), len(timings) - 1)], 2),
+            'memory_kb': round(peak / 1024, 1),
+        }
+
+    def calibrate(self, iterations: int) -> float:
+        """
+        Method to measure median latency of a fixed serialization workload (a unit of speed of the machine)
+        """
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            json.loads(json.dumps(self.calibration_payload))
+            timings.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(timings), 3)
+
+    @staticmethod
+    def compare(results: dict, calibration_ms: float, baseline: dict, threshold: float) -> list[str]:
+        """
+        Method to compare results with baseline (latency is compared relative to calibration workload
+        of every run)
+
+        Returns:
+            - list with descriptions of regressions
+        """
+        failures = []
+        for name, result in results.items():
+            expected = baseline['scenarios'].get(name)
+            if expected is None:
+                continue
+            if result['queries'] > expected['queries']:
+                failures.append(f'{name}: {result["queries"]} queries instead of {expected["queries"]}')
+            if result['memory_kb'] > expected['memory_kb'] * (1 + threshold):
+                failures.append(f'{name}: memory_kb {result["memory_kb"]} exceeds baseline {expected["memory_kb"]}')
+            relative, expected_relative = (
+                result['p95_ms'] / calibration_ms, expected['p95_ms'] / baseline['calibration_ms']
+            )
+            if relative > expected_relative * (1 + threshold):
+                failures.append(
+                    f'{name}: p95_ms {result["p95_ms"]} is {relative:.1f} calibrations, '
+                    f'baseline is {expected_relative:.1f} calibrations'
+                )
+        return failures
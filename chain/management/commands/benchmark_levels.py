@@ -0,0 +1,66 @@
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+
+from chain.models import TradeUnit, path_depth
+
+
+# ----------------------------------------------------------------
+class Command(BaseCommand):
+    """
+    Command to measure provider reassignment of a large subtree (all data is rolled back)
+    """
+    help = 'Benchmark moving a synthetic subtree to another provider'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--size', type=int, default=100_000, help='Number of units in moved subtree')
+        parser.add_argument('--fanout', type=int, default=10, help='Number of consumers of every unit')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        with transaction.atomic():
+            subtree_root = self.seed(options['size'], options['fanout'])
+            new_provider = TradeUnit.objects.create(title='Benchmark factory 2')
+            subtree_root.provider = new_provider
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                subtree_root.save()
+                elapsed = time.perf_counter() - started
+            moved = TradeUnit.objects.descendants(subtree_root).count()
+            stale = TradeUnit.objects.descendants(subtree_root).annotate(depth=path_depth()).exclude(level=F('depth')).count()
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f'Moved subtree of {moved + 1} units in {elapsed:.3f}s '
+            f'with {len(queries)} queries ({stale} units with wrong level)'
+        )
+
+    @staticmethod
+    def seed(size: int, fanout: int) -> TradeUnit:
+        """
+        Method to create a factory with a subtree of given size under its first consumer
+
+        Returns:
+            - root of the subtree
+        """
+        factory = TradeUnit.objects.create(title='Benchmark factory 1')
+        root = TradeUnit.objects.create(
+            title='Benchmark root', provider=factory, unit_type=TradeUnit.UnitType.retail_network
+        )
+        created, layer = 1, [root]
+        while created < size:
+            units = []
+            for provider in layer:
+                for _ in range(min(fanout, size - created - len(units))):
+                    units.append(TradeUnit(
+                        title='Benchmark unit',
+                        provider=provider,
+                        unit_type=TradeUnit.UnitType.entrepreneur,
+                        path=provider.subtree_path,
+                        level=provider.level + 1
+                    ))
+            layer = TradeUnit.objects.bulk_create(units, batch_size=5000)
+            created += len(units)
+        return root
@@ -0,0 +1,95 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+
+# ----------------------------------------------------------------
+class Command(BaseCommand):
+    """
+    Command to compare throughput and latency of synchronous (DRF) and asynchronous retail read paths
+    of a running server (WSGI or ASGI) under concurrent clients
+
+    All requests are sent by one logged in client, so the server has to run with throttling disabled
+    (THROTTLE_ENABLED=False) or with limits above concurrency and number of requests: throttled requests
+    are counted apart from errors and fail the command, as their latencies do not measure the read paths
+    """
+    help = 'Load benchmark of sync and async retail list/retrieve endpoints of a running server'
+
+    paths: dict = {
+        'sync list': '/api/retail/?page_size={page_size}',
+        'async list': '/api/async/retail/?page_size={page_size}',
+        'sync retrieve': '/api/retail/{unit}/',
+        'async retrieve': '/api/async/retail/{unit}/',
+    }
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--url', default='http://localhost:8000', help='Base url of server')
+        parser.add_argument('--username', required=True, help='Username to log in')
+        parser.add_argument('--password', required=True, help='Password to log in')
+        parser.add_argument('--unit', type=int, default=1, help='Id of unit for retrieve requests')
+        parser.add_argument('--page-size', type=int, default=100, help='Number of units per list page')
+        parser.add_argument('--concurrency', type=int, default=50, help='Number of concurrent clients')
+        parser.add_argument('--requests', type=int, default=1000, help='Number of requests per endpoint')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        login = urllib.request.Request(
+            f'{options["url"]}/api/user/auth/',
+            data=json.dumps({'username': options['username'], 'password': options['password']}).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            opener.open(login)
+        except OSError as error:
+            raise CommandError(f'Login failed: {error}')
+        throttled = 0
+        for name, path in self.paths.items():
+            url = options['url'] + path.format(unit=options['unit'], page_size=options['page_size'])
+            line, count = self.measure(name, opener, url, options['concurrency'], options['requests'])
+            self.stdout.write(line)
+            throttled += count
+        if throttled:
+            raise CommandError(
+                f'{throttled} requests were throttled: run the server with THROTTLE_ENABLED=False or raise '
+                f'THROTTLE_MAX_CONCURRENT_PER_CLIENT above --concurrency and rates above --requests'
+            )
+
+    @staticmethod
+    def measure(name: str, opener: Any, url: str, concurrency: int, requests: int) -> tuple[str, int]:
+        """
+        Method to send requests from concurrent clients and summarize latencies
+
+        Returns:
+            - tuple with line with throughput and latency percentiles and number of throttled requests
+        """
+        def request(_: int) -> tuple[float, int]:
+            started = time.perf_counter()
+            try:
+                with opener.open(url) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as error:
+                status = error.code
+            except OSError:
+                status = 0
+            return time.perf_counter() - started, status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(request, range(requests)))
+        elapsed = time.perf_counter() - started
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        throttled = sum(status == 429 for _, status in results)
+        errors = sum(status not in (200, 429) for _, status in results)
+        p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+        return (
+            f'{name}: {requests / elapsed:.1f} req/s, p50 {statistics.median(latencies):.1f} ms, '
+            f'p99 {p99:.1f} ms, errors {errors}, throttled {throttled}'
+        ), throttled
@@ -0,0 +1,69 @@
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Cast, Concat
+
+from chain.models import TradeUnit
+
+
+# ----------------------------------------------------------------
+class Command(BaseCommand):
+    """
+    Command to scan the whole provider graph for cycles (by provider links, in one pass over
+    (id, provider_id) pairs streamed from the database), units with materialized path not matching
+    path of their provider and units deeper than TRADE_UNIT_MAX_LEVEL setting
+    """
+    help = 'Find cycles, inconsistent paths and too deep units in provider graph'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--chunk-size', type=int, default=10_000, help='Number of rows fetched at once')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        providers = dict(
+            TradeUnit.objects.exclude(provider=None).values_list('pk', 'provider_id').iterator(
+                chunk_size=options['chunk_size']
+            )
+        )
+        cycles = self.find_cycles(providers)
+        for cycle in cycles:
+            self.stdout.write(f'Cycle: {" -> ".join(map(str, cycle + cycle[:1]))}')
+
+        inconsistent = TradeUnit.objects.exclude(provider=None).exclude(
+            path=Concat(F('provider__path'), Cast('provider_id', CharField()), Value('/'))
+        ).count() + TradeUnit.objects.filter(provider=None).exclude(path='').count()
+        max_level = getattr(settings, 'TRADE_UNIT_MAX_LEVEL', 50)
+        too_deep = TradeUnit.objects.filter(level__gt=max_level).count()
+        self.stdout.write(
+            f'Units with provider: {len(providers)}, cycles: {len(cycles)}, '
+            f'inconsistent paths: {inconsistent}, deeper than {max_level} levels: {too_deep}'
+        )
+        if cycles or inconsistent or too_deep:
+            raise CommandError('Provider graph is broken')
+        self.stdout.write(self.style.SUCCESS('Provider graph is consistent'))
+
+    @staticmethod
+    def find_cycles(providers: dict[int, int]) -> list[list[int]]:
+        """
+        Method to find cycles of graph where every unit has at most one provider in O(number of units):
+        every unit is visited once, walks stop at units finished by previous walks
+
+        Params:
+            - providers: dictionary with id of provider by id of unit
+
+        Returns:
+            - list with cycles (ids of units in order of provider links)
+        """
+        cycles, finished = [], set()
+        for start in providers:
+            walk, position = [], {}
+            pk = start
+            while pk in providers and pk not in finished and pk not in position:
+                position[pk] = len(walk)
+                walk.append(pk)
+                pk = providers[pk]
+            if pk in position:
+                cycles.append(walk[position[pk]:])
+            finished.update(walk)
+        return cycles
@@ -0,0 +1,44 @@
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+
+from chain.synthetic import NetworkGenerator
+
+
+# ----------------------------------------------------------------
+class Command(BaseCommand):
+    """
+    Command to generate synthetic trading network with contacts and products for benchmarks
+    and capacity planning (written with bulk inserts or with COPY on PostgreSQL in one transaction)
+    """
+    help = 'Generate synthetic network of trade units, contacts and products'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--size', type=int, default=100_000, help='Number of units')
+        parser.add_argument('--depth', type=int, default=2, help='Level of the deepest units')
+        parser.add_argument('--fanout', type=int, default=10, help='Number of consumers of every provider')
+        parser.add_argument('--products', type=int, default=1000, help='Number of products')
+        parser.add_argument('--products-per-unit', type=int, default=3, help='Number of products of every unit')
+        parser.add_argument('--countries', type=int, default=20, help='Number of countries of contacts')
+        parser.add_argument('--cities', type=int, default=50, help='Number of cities in every country')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of rows written together')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of random generator')
+        parser.add_argument('--copy', action='store_true', help='Write rows with COPY (PostgreSQL only)')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['size'] < 1 or options['depth'] < 0 or options['fanout'] < 1 or options['products'] < 1:
+            raise CommandError('Size, fanout and number of products must be positive, depth must not be negative')
+        generator = NetworkGenerator(
+            options['size'], depth=options['depth'], fanout=options['fanout'], products=options['products'],
+            products_per_unit=options['products_per_unit'], countries=options['countries'],
+            cities=options['cities'], batch_size=options['batch_size'], seed=options['seed'], copy=options['copy']
+        )
+        started = time.perf_counter()
+        with transaction.atomic():
+            network = generator.generate(progress=lambda created: self.stdout.write(f'{created}/{options["size"]}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {network.units} units, {network.products} products and {len(network.factories)} factories '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,72 @@
+import csv
+import json
+from pathlib import Path
+from typing import Any, Iterator
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from chain.bulk import TradeUnitBulkImporter
+
+
+# ----------------------------------------------------------------
+class Command(BaseCommand):
+    """
+    Command to bulk import trade units with contacts and products from CSV or JSONL file
+
+    CSV columns: title, unit_type, provider, email, country, city, street, number, products
+    (ids of products separated by ';'). JSONL lines have the format of bulk API rows
+    """
+    help = 'Import trade units from CSV or JSONL file in batches'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('file', type=Path, help='Path to CSV or JSONL file')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format (by extension if omitted)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows written together')
+        parser.add_argument('--upsert', action='store_true', help='Update units with existing contact email')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path = options['file']
+        if not path.exists():
+            raise CommandError(f'File {path} does not exist')
+        file_format = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'jsonl')
+        importer = TradeUnitBulkImporter(batch_size=options['batch_size'], upsert=options['upsert'])
+        created = updated = failed = 0
+        with path.open(newline='', encoding='utf-8') as file:
+            rows = self.read_csv(file) if file_format == 'csv' else self.read_jsonl(file)
+            for result in importer.run(rows):
+                if 'errors' in result:
+                    failed += 1
+                    self.stderr.write(json.dumps(result))
+                elif result['status'] == 'created':
+                    created += 1
+                else:
+                    updated += 1
+        self.stdout.write(self.style.SUCCESS(f'Created: {created}, updated: {updated}, failed: {failed}'))
+
+    @staticmethod
+    def read_csv(file) -> Iterator[dict]:
+        """
+        Method to convert CSV rows to the format of bulk API rows
+        """
+        for row in csv.DictReader(file):
+            yield {
+                'title': row.get('title'),
+                'unit_type': row.get('unit_type') or 1,
+                'provider': row.get('provider') or None,
+                'contact': {
+                    field: row.get(field) or None for field in ('email', 'country', 'city', 'street', 'number')
+                },
+                'products': [pk for pk in (row.get('products') or '').split(';') if pk.strip()],
+            }
+
+    @staticmethod
+    def read_jsonl(file) -> Iterator[Any]:
+        """
+        Method to read JSON rows line by line (invalid lines are passed as is to be reported)
+        """
+        for line in file:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    yield line
@@ -0,0 +1,34 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from chain.changes import units_changed
+from chain.models import TradeUnit
+
+
+# ----------------------------------------------------------------
+class Command(BaseCommand):
+    """
+    Command to recompute rolled-up debts of downstream networks (and optionally debts of units) in bulk
+    """
+    help = 'Recompute rolled-up debt of every trade unit in one UPDATE statement'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--from-products', action='store_true',
+            help='Reset debt of every unit to the sum of prices of its products first'
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        with transaction.atomic():
+            if options['from_products']:
+                prices = TradeUnit.products.through.objects.filter(
+                    tradeunit=OuterRef('pk')
+                ).order_by().values('tradeunit').annotate(total=Sum('product__price')).values('total')
+                TradeUnit.objects.update(debt=Coalesce(Subquery(prices, output_field=DecimalField()), Value(0)))
+                units_changed(TradeUnit.objects.values_list('pk', flat=True))
+            updated = TradeUnit.objects.all().refresh_network_debt()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed debts of {updated} units'))
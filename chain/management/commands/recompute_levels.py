@@ -0,0 +1,27 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from chain.models import TradeUnit
+
+
+# ----------------------------------------------------------------
+class Command(BaseCommand):
+    """
+    Command to recompute levels of trade units from their materialized paths in bulk
+    """
+    help = 'Recompute level of every trade unit (or of a subtree) in one UPDATE statement'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--unit', type=int, help='Id of unit whose subtree (including itself) is recomputed')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        queryset = TradeUnit.objects.all()
+        if options['unit']:
+            try:
+                unit = TradeUnit.objects.get(pk=options['unit'])
+            except TradeUnit.DoesNotExist:
+                raise CommandError(f'Trade unit {options["unit"]} does not exist')
+            queryset = queryset.filter(path__startswith=unit.subtree_path) | queryset.filter(pk=unit.pk)
+        updated = queryset.recompute_levels()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed levels of {updated} units'))
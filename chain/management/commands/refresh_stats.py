@@ -0,0 +1,20 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from chain.stats import refresh_stats
+
+
+# ----------------------------------------------------------------
+class Command(BaseCommand):
+    """
+    Command to recompute snapshot of network statistics (to be run on a schedule, e.g. by cron)
+    """
+    help = 'Recompute debts and numbers of units by country, city, unit type, level and top debtors of suppliers'
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        stats = refresh_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Computed statistics of {stats.summary["total"]["units"]} units '
+            f'(changes up to #{stats.last_change}) in {stats.duration:.2f} s'
+        ))
@@ -0,0 +1,37 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from chain.models import DebtReset, TradeUnit
+from chain.tasks import run_debt_reset
+
+
+# ----------------------------------------------------------------
+class Command(BaseCommand):
+    """
+    Command to reset debts of supplier's downstream network chunk by chunk
+    or to resume an interrupted debt reset
+    """
+    help = "Reset debts of supplier's downstream network in chunks with short transactions"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        scope = parser.add_mutually_exclusive_group(required=True)
+        scope.add_argument('--supplier', type=int, help='Id of unit whose downstream network is processed')
+        scope.add_argument('--job', type=int, help='Id of debt reset to resume')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of units in one transaction')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['job']:
+            job = DebtReset.objects.filter(pk=options['job']).first()
+            if job is None:
+                raise CommandError(f'Debt reset {options["job"]} does not exist')
+            if job.status == DebtReset.Status.done:
+                raise CommandError(f'Debt reset {job.pk} is already done')
+        else:
+            if not TradeUnit.objects.filter(pk=options['supplier']).exists():
+                raise CommandError(f'Trade unit {options["supplier"]} does not exist')
+            job = DebtReset.objects.create(supplier_id=options['supplier'], chunk_size=options['chunk_size'])
+        job = run_debt_reset(job, progress=lambda current: self.stdout.write(f'{current.processed}/{current.total}'))
+        if job.status == DebtReset.Status.failed:
+            raise CommandError(f'Debt reset {job.pk} failed: {job.error}')
+        self.stdout.write(self.style.SUCCESS(f'Reset debts of {job.processed} units'))
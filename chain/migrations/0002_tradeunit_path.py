@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    """Compute materialized paths of existing units walking the hierarchy from the roots"""
+    TradeUnit = apps.get_model('chain', 'TradeUnit')
+    consumers = {}
+    for pk, provider_id in TradeUnit.objects.values_list('pk', 'provider_id').iterator():
+        consumers.setdefault(provider_id, []).append(pk)
+    paths, queue = {}, [(pk, '') for pk in consumers.get(None, [])]
+    while queue:
+        pk, path = queue.pop()
+        paths[pk] = path
+        queue.extend((consumer, f'{path}{pk}/') for consumer in consumers.get(pk, []) if consumer not in paths)
+    units = [TradeUnit(pk=pk, path=path) for pk, path in paths.items() if path]
+    TradeUnit.objects.bulk_update(units, ['path'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chain', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradeunit',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=1024, verbose_name='Path of providers'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
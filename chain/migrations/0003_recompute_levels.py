@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:59
+
+from django.db import migrations
+from django.db.models import Value
+from django.db.models.functions import Length, Replace
+
+
+def recompute_levels(apps, schema_editor):
+    """Set level of existing units to the depth of their materialized paths"""
+    TradeUnit = apps.get_model('chain', 'TradeUnit')
+    TradeUnit.objects.update(level=Length('path') - Length(Replace('path', Value('/'), Value(''))))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chain', '0002_tradeunit_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:02
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Func, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Concat
+
+
+def fill_network_debt(apps, schema_editor):
+    """Compute rolled-up debt of existing units as the sum of debts of their downstream networks"""
+    TradeUnit = apps.get_model('chain', 'TradeUnit')
+    subtree = TradeUnit.objects.filter(
+        path__startswith=Concat(OuterRef('path'), Cast(OuterRef('pk'), models.CharField()), Value('/'))
+    ).order_by().values(total=Func(F('debt'), function='SUM'))
+    TradeUnit.objects.update(network_debt=Coalesce(
+        Subquery(subtree, output_field=models.DecimalField()), Value(Decimal(0))
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chain', '0003_recompute_levels'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradeunit',
+            name='network_debt',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=20, verbose_name='Debt of downstream network'),
+        ),
+        migrations.RunPython(fill_network_debt, migrations.RunPython.noop),
+    ]
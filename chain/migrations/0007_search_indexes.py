@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:30
+
+from django.db import migrations
+
+SEARCH_INDEXES = [
+    ('unit_title_trgm_idx', 'chain_tradeunit', 'title'),
+    ('contact_email_trgm_idx', 'chain_contact', 'email'),
+    ('contact_city_trgm_idx', 'chain_contact', 'city'),
+    ('contact_country_trgm_idx', 'chain_contact', 'country'),
+    ('product_title_trgm_idx', 'chain_product', 'title'),
+    ('product_model_trgm_idx', 'chain_product', 'model'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    """Create trigram GIN indexes serving icontains lookups (PostgreSQL only)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    """Drop trigram GIN indexes (PostgreSQL only)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chain', '0006_debtreset'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chain', '0007_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tradeunit',
+            index=models.Index(fields=['debt', 'id'], name='tradeunit_debt_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeunit',
+            index=models.Index(fields=['level', 'id'], name='tradeunit_level_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeunit',
+            index=models.Index(fields=['title', 'id'], name='tradeunit_title_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeunit',
+            index=models.Index(fields=['unit_type', 'id'], name='tradeunit_type_id_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chain', '0008_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradeunit',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, verbose_name='Modified'),
+        ),
+        migrations.AddField(
+            model_name='tradeunit',
+            name='version',
+            field=models.PositiveBigIntegerField(default=1, editable=False, verbose_name='Version'),
+        ),
+    ]
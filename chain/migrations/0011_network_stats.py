@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chain', '0010_tradeunitchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NetworkStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_change', models.BigIntegerField(default=0, verbose_name='Last change')),
+                ('summary', models.JSONField(default=dict, verbose_name='Summary')),
+                ('duration', models.FloatField(default=0, verbose_name='Duration')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+            ],
+            options={
+                'verbose_name': 'Network stats',
+                'verbose_name_plural': 'Network stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='TopDebtors',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('supplier_id', models.BigIntegerField(blank=True, null=True, verbose_name='Supplier')),
+                ('debtors', models.JSONField(default=list, verbose_name='Debtors')),
+                ('stats', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='top_debtors', to='chain.networkstats', verbose_name='Stats')),
+            ],
+            options={
+                'verbose_name': 'Top debtors',
+                'verbose_name_plural': 'Top debtors',
+                'indexes': [models.Index(fields=['stats', 'supplier_id'], name='topdebtors_supplier_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,16 @@
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from typing import Iterable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Func, Max, OuterRef, Q, Subquery, Sum, Value, When, prefetch_related_objects
+from django.db.models.functions import Cast, Coalesce, Concat, Greatest, Length, Now, Replace, Substr
 
 
 # ----------------------------------------------------------------
@@ -46,6 +57,10 @@ class Contact(models.Model):
     class Meta:
         verbose_name = 'Contact'
         verbose_name_plural = 'Contacts'
+        indexes = [
+            models.Index(fields=['country', 'city'], name='contact_country_city_idx'),
+            models.Index(fields=['city'], name='contact_city_idx'),
+        ]
 
 
 # ----------------------------------------------------------------
@@ -85,9 +100,248 @@ class Product(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs) -> None:
+        """
+        Redefined method to save product in one transaction with the shift of debts by change of its price
+        (previous price is read from the locked row, so deltas of concurrent changes are applied in turn)
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
+        indexes = [
+            models.Index(fields=['model'], name='product_model_idx'),
+        ]
+
+
+# ----------------------------------------------------------------
+def path_ids(path: str) -> list[int]:
+    """
+    Function to parse ids of providers from materialized path
+    """
+    return [int(pk) for pk in path.split('/') if pk]
+
+
+# ----------------------------------------------------------------
+def provider_deltas(path_deltas: Iterable[tuple[str, Decimal]]) -> defaultdict[int, Decimal]:
+    """
+    Function to sum up deltas of units given with their materialized paths for every provider
+    """
+    deltas = defaultdict(Decimal)
+    for path, delta in path_deltas:
+        for pk in path_ids(path):
+            deltas[pk] += delta
+    return deltas
+
+
+# ----------------------------------------------------------------
+def path_depth():
+    """
+    SQL expression counting providers in materialized path of unit
+    """
+    return Length('path') - Length(Replace('path', Value('/'), Value('')))
+
+
+# ----------------------------------------------------------------
+# trade unit queryset
+class TradeUnitQuerySet(models.QuerySet):
+    """
+    Custom queryset for TradeUnit entity
+    """
+    def ancestors(self, unit: 'TradeUnit') -> 'TradeUnitQuerySet':
+        """
+        Method to get all providers of unit up to the root (single indexed lookup by primary keys)
+        """
+        return self.filter(pk__in=unit.ancestor_ids).order_by('level')
+
+    def descendants(self, unit: 'TradeUnit') -> 'TradeUnitQuerySet':
+        """
+        Method to get whole downstream network of unit (single indexed prefix lookup by path)
+        """
+        return self.filter(path__startswith=unit.subtree_path)
+
+    def move_subtree(self, old_prefix: str, new_prefix: str) -> int:
+        """
+        Method to replace path prefix of every unit of a subtree and recompute their levels
+        in one UPDATE statement
+
+        Params:
+            - old_prefix: current path prefix of the subtree
+            - new_prefix: path prefix to set instead
+
+        Returns:
+            - number of updated units
+        """
+        return self.filter(path__startswith=old_prefix).update(
+            path=Concat(Value(new_prefix), Substr('path', len(old_prefix) + 1)),
+            level=path_depth() - old_prefix.count('/') + new_prefix.count('/')
+        )
+
+    def ancestor_ids(self) -> set[int]:
+        """
+        Method to collect ids of all providers of units in queryset from their distinct paths
+        """
+        paths = self.order_by().values_list('path', flat=True).distinct()
+        return {pk for path in paths for pk in path_ids(path)}
+
+    def path_totals(self, aggregate: models.Aggregate | None = None) -> defaultdict[int, Decimal]:
+        """
+        Method to sum up units in queryset for every provider from their materialized paths with one
+        query grouped by distinct paths (no subtree is scanned)
+
+        Params:
+            - aggregate: defines aggregate of units with the same path (sum of debts by default)
+
+        Returns:
+            - dictionary with total by id of provider
+        """
+        totals = defaultdict(Decimal)
+        for path, total in self.order_by().values_list('path').annotate(total=aggregate or Sum('debt')):
+            for pk in path_ids(path):
+                totals[pk] += total or Decimal(0)
+        return totals
+
+    def add_debt(self, delta: Decimal | Subquery) -> list[tuple[str, Decimal]]:
+        """
+        Method to add delta to debt of every unit in queryset in one UPDATE statement without lowering
+        debts below zero (e.g. after debt reset), units are locked and read first to know deltas actually applied
+
+        Params:
+            - delta: defines delta of debt (value or expression computed for every unit)
+
+        Returns:
+            - list with materialized path and applied delta of every unit (to roll up to providers)
+        """
+        if not isinstance(delta, Subquery):
+            delta = Value(delta, output_field=models.DecimalField())
+        debt = Coalesce(F('debt'), Value(Decimal(0)))
+        rows = self.select_for_update().order_by('pk').annotate(delta=delta).values_list('path', 'debt', 'delta')
+        applied = [
+            (path, max((current or Decimal(0)) + (unit_delta or Decimal(0)), Decimal(0)) - (current or Decimal(0)))
+            for path, current, unit_delta in rows
+        ]
+        self.update(debt=Greatest(debt + Coalesce(delta, Value(Decimal(0))), Value(Decimal(0))))
+        return applied
+
+    def add_network_debt(self, delta: Decimal) -> int:
+        """
+        Method to add delta to rolled-up debt of every unit in queryset in one UPDATE statement
+        """
+        return self.update(network_debt=F('network_debt') + delta)
+
+    def add_network_debts(self, deltas: dict[int, Decimal], batch_size: int = 500) -> int:
+        """
+        Method to add individual deltas to rolled-up debts of units by their ids with one UPDATE statement
+        per batch (every row is matched against the CASE of its batch only)
+        """
+        items = [(pk, delta) for pk, delta in deltas.items() if delta]
+        updated = 0
+        for start in range(0, len(items), batch_size):
+            batch = dict(items[start:start + batch_size])
+            updated += self.filter(pk__in=batch).update(network_debt=Case(
+                *[When(pk=pk, then=F('network_debt') + Value(delta)) for pk, delta in batch.items()],
+                default=F('network_debt'),
+                output_field=models.DecimalField()
+            ))
+        return updated
+
+    def refresh_network_debt(self) -> int:
+        """
+        Method to recompute rolled-up debt of every unit in queryset as the sum of debts
+        of its downstream network in one UPDATE statement
+        """
+        subtree = self.model.objects.filter(
+            path__startswith=Concat(OuterRef('path'), Cast(OuterRef('pk'), models.CharField()), Value('/'))
+        ).order_by().values(total=Func(F('debt'), function='SUM'))
+        return self.update(network_debt=Coalesce(
+            Subquery(subtree, output_field=models.DecimalField()), Value(Decimal(0))
+        ))
+
+    def bump_versions(self, pks: Iterable[int] | models.QuerySet, batch_size: int = 100) -> int:
+        """
+        Method to increase versions of units and of their downstream networks (nested provider chains
+        of consumers show the units) with set-based UPDATE statements: subtrees are updated by path prefix
+        only for units having consumers, and only for the topmost of them
+
+        Params:
+            - pks: ids of changed units (list or queryset of ids)
+            - batch_size: defines number of path prefixes matched by one UPDATE statement
+
+        Returns:
+            - number of updated rows
+        """
+        if not isinstance(pks, models.QuerySet):
+            pks = list(pks)
+            if not pks:
+                return 0
+        changes = {'version': F('version') + 1, 'modified': Now()}
+        updated = self.filter(pk__in=pks).update(**changes)
+        providers = dict(self.model.objects.filter(
+            pk__in=self.model.objects.filter(provider_id__in=pks).values('provider_id')
+        ).values_list('pk', 'path'))
+        prefixes = [f'{path}{pk}/' for pk, path in providers.items() if providers.keys().isdisjoint(path_ids(path))]
+        for start in range(0, len(prefixes), batch_size):
+            updated += self.filter(
+                reduce(or_, (Q(path__startswith=prefix) for prefix in prefixes[start:start + batch_size]))
+            ).update(**changes)
+        return updated
+
+    def recompute_levels(self) -> int:
+        """
+        Method to set level of every unit in queryset to the depth of its path in one UPDATE statement
+
+        Returns:
+            - number of updated units
+        """
+        return self.update(level=path_depth())
+
+    def attach_provider_chain(self, units: Iterable['TradeUnit']) -> list['TradeUnit']:
+        """
+        Method to load full provider ancestry of given units (known from their paths) with contacts
+        and products in a constant number of queries and link them in memory, so traversal
+        of unit.provider does not hit the database
+
+        Params:
+            - units: iterable with TradeUnit objects
+
+        Returns:
+            - list with the same TradeUnit objects
+        """
+        units = list(units)
+        loaded = {unit.pk: unit for unit in units}
+        ancestor_ids = {pk for unit in units for pk in unit.ancestor_ids} - loaded.keys()
+        if ancestor_ids:
+            loaded.update(
+                (unit.pk, unit) for unit in self.model.objects.select_related('contact').filter(pk__in=ancestor_ids)
+            )
+        prefetch_related_objects(list(loaded.values()), 'contact', 'products')
+        self.link_providers(loaded)
+        return units
+
+    async def aattach_provider_chain(self, units: Iterable['TradeUnit']) -> list['TradeUnit']:
+        """
+        Asynchronous version of attach_provider_chain
+        """
+        units = list(units)
+        loaded = {unit.pk: unit for unit in units}
+        ancestor_ids = {pk for unit in units for pk in unit.ancestor_ids} - loaded.keys()
+        if ancestor_ids:
+            async for unit in self.model.objects.select_related('contact').filter(pk__in=ancestor_ids):
+                loaded[unit.pk] = unit
+        await sync_to_async(prefetch_related_objects)(list(loaded.values()), 'contact', 'products')
+        self.link_providers(loaded)
+        return units
+
+    @staticmethod
+    def link_providers(loaded: dict[int, 'TradeUnit']) -> None:
+        """
+        Method to set loaded providers to units in memory
+        """
+        for unit in loaded.values():
+            if unit.provider_id in loaded:
+                unit.provider = loaded[unit.provider_id]
 
 
 # ----------------------------------------------------------------
@@ -104,6 +358,11 @@ class TradeUnit(models.Model):
         - unit_type: defines type of unit. Choose by class UnitType
         - debt: defines amount of debt
         - level: defines level in retail network hierarchy
+        - path: defines materialized path of providers' ids from the root, e.g. '1/5/'
+        - network_debt: defines total debt of downstream network of unit (maintained incrementally)
+        - version: defines counter increased on change of unit or of any provider in its chain
+        - modified: defines time of the last change of unit or of any provider in its chain
+        - maintained_fields: defines fields changed by set-based updates only (never written by save of loaded unit)
     """
     class UnitType(models.IntegerChoices):
         manufacture = 1, 'Factory'
@@ -151,10 +410,392 @@ class TradeUnit(models.Model):
     level = models.IntegerField(
         default=0
     )
+    path = models.CharField(
+        max_length=1024,
+        default='',
+        db_index=True,
+        editable=False,
+        verbose_name='Path of providers'
+    )
+    network_debt = models.DecimalField(
+        max_digits=20,
+        default=0,
+        decimal_places=2,
+        editable=False,
+        verbose_name='Debt of downstream network'
+    )
+    version = models.PositiveBigIntegerField(
+        default=1,
+        editable=False,
+        verbose_name='Version'
+    )
+    modified = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Modified'
+    )
+
+    objects = TradeUnitQuerySet.as_manager()
+    maintained_fields: tuple = ('network_debt', 'version')
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs) -> None:
+        """
+        Redefined method to leave rolled-up debt and version out of UPDATE of loaded unit, so saving
+        an instance loaded before their set-based updates does not write stale values back (version
+        only moves forward by F('version') + 1). Loaded unit whose row is deleted meanwhile is inserted
+        again as by default save (its stored state is read once per save)
+        """
+        try:
+            if (
+                not self._state.adding and not args
+                and kwargs.get('update_fields') is None and not kwargs.get('force_insert')
+                and self.stored_state() is not None
+            ):
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.maintained_fields
+                ]
+            super().save(*args, **kwargs)
+        finally:
+            self.__dict__.pop('_stored_state', None)
+
+    def stored_state(self) -> tuple | None:
+        """
+        Method to read path, debt, rolled-up debt and version of unit stored in database
+        (read once per save)
+
+        Returns:
+            - tuple with stored values or None if unit is not stored
+        """
+        if '_stored_state' not in self.__dict__:
+            self._stored_state = TradeUnit.objects.filter(pk=self.pk).values_list(
+                'path', 'debt', 'network_debt', 'version'
+            ).first() if self.pk is not None else None
+        return self._stored_state
+
+    @property
+    def ancestor_ids(self) -> list[int]:
+        """
+        Ids of all providers of unit ordered from the root
+        """
+        return path_ids(self.path)
+
+    @property
+    def subtree_path(self) -> str:
+        """
+        Path prefix shared by every unit of downstream network
+        """
+        return f'{self.path}{self.pk}/'
+
+    def get_ancestors(self) -> TradeUnitQuerySet:
+        """
+        Method to get all providers of unit up to the root
+        """
+        return TradeUnit.objects.ancestors(self)
+
+    def get_descendants(self) -> TradeUnitQuerySet:
+        """
+        Method to get whole downstream network of unit
+        """
+        return TradeUnit.objects.descendants(self)
+
+    def get_subtree_count(self) -> int:
+        """
+        Method to count units in downstream network
+        """
+        return self.get_descendants().count()
+
+    def provider_error(
+        self, provider_id: int | None, provider_path: str, current_path: str | None = None
+    ) -> str | None:
+        """
+        Method to check that provider does not make a cycle and provider chain does not become deeper
+        than TRADE_UNIT_MAX_LEVEL setting: both are checked by the path of provider in O(depth),
+        height of downstream network of a moved unit is one indexed lookup by path prefix
+
+        Params:
+            - provider_id: id of new provider
+            - provider_path: materialized path of new provider
+            - current_path: materialized path of unit stored in database (None for a new unit)
+
+        Returns:
+            - description of error (None if provider is correct)
+        """
+        if provider_id is None:
+            return None
+        if self.pk is not None and (provider_id == self.pk or self.pk in path_ids(provider_path)):
+            return 'Provider can not be a consumer of the unit'
+        max_level = getattr(settings, 'TRADE_UNIT_MAX_LEVEL', 50)
+        level = len(path_ids(provider_path)) + 1
+        if level <= max_level and current_path is not None and current_path != f'{provider_path}{provider_id}/':
+            deepest = TradeUnit.objects.filter(path__startswith=f'{current_path}{self.pk}/').aggregate(
+                level=Max('level')
+            )['level']
+            if deepest is not None:
+                level += deepest - len(path_ids(current_path))
+        if level > max_level:
+            return f'Provider chain can not be deeper than {max_level} levels'
+        return None
+
+    def clean(self) -> None:
+        """
+        Redefined method to validate provider of unit (type, cycles and depth of chain)
+
+        Raises:
+            - ValidationError (in case of incorrect provider)
+        """
+        if self.unit_type == TradeUnit.UnitType.manufacture and self.provider_id:
+            raise ValidationError({'provider': 'Manufacture should not have provider'})
+        if self.provider_id:
+            paths = dict(TradeUnit.objects.filter(pk__in=[self.provider_id, self.pk]).values_list('pk', 'path'))
+            error = self.provider_error(self.provider_id, paths.get(self.provider_id, ''), paths.get(self.pk))
+            if error:
+                raise ValidationError({'provider': error})
+
     class Meta:
         verbose_name = 'Trade unit'
         verbose_name_plural = 'Trade units'
+        indexes = [
+            models.Index(fields=['debt', 'id'], name='tradeunit_debt_id_idx'),
+            models.Index(fields=['level', 'id'], name='tradeunit_level_id_idx'),
+            models.Index(fields=['title', 'id'], name='tradeunit_title_id_idx'),
+            models.Index(fields=['unit_type', 'id'], name='tradeunit_type_id_idx'),
+        ]
+
+
+# ----------------------------------------------------------------
+# debt reset model
+class DebtReset(models.Model):
+    """
+    Model representing a job resetting debts chunk by chunk
+
+    Attrs:
+        - supplier: defines unit whose downstream network (including itself) is processed
+        - units: defines explicit ids of processed units (all units of supplier's network if empty)
+        - chunk_size: defines number of units processed in one transaction
+        - status: defines state of job. Choose by class Status
+        - total: defines number of units to process
+        - processed: defines number of processed units
+        - last_pk: defines id of the last processed unit (job is resumed after it)
+        - error: defines description of failure
+        - created: defines date and time of creation
+        - finished: defines date and time of completion
+        - max_units: defines maximal number of explicit ids of units (larger scopes are reset by supplier)
+    """
+    class Status(models.TextChoices):
+        pending = 'pending', 'Pending'
+        running = 'running', 'Running'
+        done = 'done', 'Done'
+        failed = 'failed', 'Failed'
+
+    supplier = models.ForeignKey(
+        TradeUnit,
+        verbose_name='Supplier',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    units = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Units'
+    )
+    chunk_size = models.PositiveIntegerField(
+        default=1000,
+        validators=[MinValueValidator(1)],
+        verbose_name='Chunk size'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.pending,
+        verbose_name='Status'
+    )
+    total = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Total'
+    )
+    processed = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Processed'
+    )
+    last_pk = models.BigIntegerField(
+        default=0,
+        verbose_name='Last processed unit'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Error'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created'
+    )
+    finished = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Finished'
+    )
+
+    max_units: int = 10_000
+
+    def __str__(self):
+        return f'Debt reset #{self.pk} ({self.processed}/{self.total})'
+
+    def clean(self) -> None:
+        """
+        Redefined method to require scope of reset and to limit number of explicit ids of units
+
+        Raises:
+            - ValidationError (in case of neither supplier nor units are given or of too many units)
+        """
+        if not self.supplier_id and not self.units:
+            raise ValidationError('Supplier or units are required')
+        if self.units and len(self.units) > self.max_units:
+            raise ValidationError({
+                'units': f'At most {self.max_units} units can be given, reset debts of supplier instead'
+            })
+
+    class Meta:
+        verbose_name = 'Debt reset'
+        verbose_name_plural = 'Debt resets'
+
+
+# ----------------------------------------------------------------
+# trade unit change queryset
+class TradeUnitChangeQuerySet(models.QuerySet):
+    """
+    Custom queryset for TradeUnitChange entity
+    """
+    def record(self, pks: Iterable[int] | models.QuerySet, action: str, batch_size: int = 1000) -> int:
+        """
+        Method to append changes of units to change log in batches
+
+        Params:
+            - pks: ids of changed units (list or queryset of ids)
+            - action: defines kind of change. Choose by class TradeUnitChange.Action
+
+        Returns:
+            - number of recorded changes
+        """
+        if isinstance(pks, models.QuerySet):
+            pks = pks.iterator(chunk_size=batch_size)
+        return len(self.bulk_create((self.model(unit_id=pk, action=action) for pk in pks), batch_size=batch_size))
+
+
+# ----------------------------------------------------------------
+# trade unit change model
+class TradeUnitChange(models.Model):
+    """
+    Model representing a record of append-only change log of units (id of record is the cursor of change feed)
+
+    Attrs:
+        - unit_id: defines id of changed unit (kept after deletion of unit)
+        - action: defines kind of change. Choose by class Action
+        - created: defines date and time of change
+    """
+    class Action(models.TextChoices):
+        created = 'created', 'Created'
+        updated = 'updated', 'Updated'
+        deleted = 'deleted', 'Deleted'
+
+    unit_id = models.BigIntegerField(
+        verbose_name='Unit'
+    )
+    action = models.CharField(
+        max_length=10,
+        choices=Action.choices,
+        verbose_name='Action'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created'
+    )
+
+    objects = TradeUnitChangeQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.get_action_display()} unit #{self.unit_id}'
+
+    class Meta:
+        verbose_name = 'Trade unit change'
+        verbose_name_plural = 'Trade unit changes'
+
+
+# ----------------------------------------------------------------
+# network stats model
+class NetworkStats(models.Model):
+    """
+    Model representing a snapshot of precomputed statistics of the whole network (the latest one is served,
+    older ones are deleted by refresh)
+
+    Attrs:
+        - last_change: defines id of the last record of change log included in snapshot
+        - summary: defines numbers of units and totals of debts by country, city, unit type and level
+        - duration: defines seconds spent on computing of snapshot
+        - created: defines date and time of computing
+    """
+    last_change = models.BigIntegerField(
+        default=0,
+        verbose_name='Last change'
+    )
+    summary = models.JSONField(
+        default=dict,
+        verbose_name='Summary'
+    )
+    duration = models.FloatField(
+        default=0,
+        verbose_name='Duration'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created'
+    )
+
+    def __str__(self):
+        return f'Network stats #{self.pk} ({self.created:%Y-%m-%d %H:%M:%S})'
+
+    class Meta:
+        verbose_name = 'Network stats'
+        verbose_name_plural = 'Network stats'
+
+
+# ----------------------------------------------------------------
+# top debtors model
+class TopDebtors(models.Model):
+    """
+    Model representing units with the largest debts in downstream network of supplier
+
+    Attrs:
+        - stats: defines snapshot of statistics
+        - supplier_id: defines id of supplier (empty for the whole network)
+        - debtors: defines list of debtors (id, title and debt) from the largest debt
+    """
+    stats = models.ForeignKey(
+        NetworkStats,
+        on_delete=models.CASCADE,
+        related_name='top_debtors',
+        verbose_name='Stats'
+    )
+    supplier_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Supplier'
+    )
+    debtors = models.JSONField(
+        default=list,
+        verbose_name='Debtors'
+    )
+
+    def __str__(self):
+        return f'Top debtors of {self.supplier_id or "network"}'
+
+    class Meta:
+        verbose_name = 'Top debtors'
+        verbose_name_plural = 'Top debtors'
+        indexes = [
+            models.Index(fields=['stats', 'supplier_id'], name='topdebtors_supplier_idx'),
+        ]
@@ -0,0 +1,183 @@
+import json
+from typing import Any
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import Request
+
+
+# ----------------------------------------------------------------
+class RetailCursorPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination by primary key, so every page costs one indexed range query
+    however deep the client scrolls
+
+    Units can be ordered by ?ordering=<field> (- for descending) from ordering_fields: position
+    of unit is then a pair (value, id), so ties of non-unique values are broken by primary key
+    instead of offsets. Empty values are ordered as the largest ones (as in PostgreSQL indexes)
+
+    Attrs:
+        - ordering: defines unique and indexed default ordering field
+        - page_size: defines default number of units per page
+        - page_size_query_param: defines query parameter to change number of units per page
+        - max_page_size: defines upper bound of number of units per page
+        - ordering_query_param: defines query parameter to change ordering
+        - ordering_fields: defines fields allowed for ordering
+        - position_alias: defines annotation with value of ordering field (rows may be fetched without it)
+    """
+    ordering: str = 'id'
+    page_size: int = 100
+    page_size_query_param: str = 'page_size'
+    max_page_size: int = 1000
+    ordering_query_param: str = 'ordering'
+    ordering_fields: tuple = ('id', 'debt', 'level', 'title')
+    position_alias: str = 'position_value'
+
+    def get_ordering(self, request: Request, queryset: QuerySet, view: Any) -> tuple:
+        """
+        Redefined method to take ordering from query parameter with primary key as tiebreaker
+
+        Raises:
+            - ValidationError (in case of unknown ordering field)
+        """
+        value = request.query_params.get(self.ordering_query_param)
+        if not value:
+            return super().get_ordering(request, queryset, view)
+        field = value.removeprefix('-')
+        if field not in self.ordering_fields:
+            raise ValidationError({
+                self.ordering_query_param: [f'Ordering must be one of: {", ".join(self.ordering_fields)}.']
+            })
+        if field == 'id':
+            return value,
+        return value, '-id' if value.startswith('-') else 'id'
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view: Any = None) -> list | None:
+        """
+        Redefined method to filter pages by pairs (value, id) in case of ordering by non-unique field
+        (the rest follows CursorPagination)
+        """
+        self.ordering = self.get_ordering(request, queryset, view)
+        if len(self.ordering) == 1:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        descending = self.ordering[0].startswith('-') != reverse
+        field = self.ordering[0].removeprefix('-')
+        queryset = queryset.annotate(**{self.position_alias: F(field)}).order_by(
+            F(field).desc(nulls_first=True) if descending else F(field).asc(nulls_last=True),
+            '-id' if descending else 'id'
+        )
+        if current_position is not None:
+            queryset = queryset.filter(self.keyset_condition(field, descending, *json.loads(current_position)))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following_position = len(results) > len(self.page)
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering) if has_following_position else None
+        )
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            self.next_position = current_position if self.has_next else None
+            self.previous_position = following_position if self.has_previous else None
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position if self.has_next else None
+            self.previous_position = current_position if self.has_previous else None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    @staticmethod
+    def keyset_condition(field: str, descending: bool, value: Any, pk: int) -> Q:
+        """
+        Method to build condition selecting units following position (value, id) in given direction
+        (empty values follow all others in ascending order)
+        """
+        if descending:
+            if value is None:
+                return Q(**{f'{field}__isnull': True, 'id__lt': pk}) | Q(**{f'{field}__isnull': False})
+            return Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+        if value is None:
+            return Q(**{f'{field}__isnull': True, 'id__gt': pk})
+        return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}) | Q(**{f'{field}__isnull': True})
+
+    def _get_position_from_instance(self, instance: Any, ordering: tuple) -> str:
+        """
+        Redefined method to get position of unit as JSON pair (value, id) in case of ordering
+        by non-unique field (value is taken from annotation added by paginate_queryset)
+        """
+        if len(ordering) == 1:
+            return super()._get_position_from_instance(instance, ordering)
+        if isinstance(instance, dict):
+            value, pk = instance[self.position_alias], instance['id']
+        else:
+            value, pk = getattr(instance, self.position_alias), instance.pk
+        return json.dumps([None if value is None else str(value), pk])
+
+
+# ----------------------------------------------------------------
+class AncestorsCursorPagination(RetailCursorPagination):
+    """
+    Keyset pagination of providers of unit from the nearest one up to the factory
+    (every level of the chain has exactly one provider)
+    """
+    ordering: str = '-level'
+
+
+# ----------------------------------------------------------------
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator for admin changelists taking number of rows of unfiltered large tables
+    from PostgreSQL planner statistics instead of running full COUNT(*)
+
+    Attrs:
+        - exact_count_threshold: defines estimated number of rows below which exact count is used
+    """
+    exact_count_threshold: int = 100_000
+
+    @cached_property
+    def count(self) -> int:
+        """
+        Redefined property to estimate number of rows of unfiltered queryset
+        """
+        queryset = self.object_list
+        connection = connections[getattr(queryset, 'db', 'default')]
+        if connection.vendor == 'postgresql' and hasattr(queryset, 'query') and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= self.exact_count_threshold:
+                return int(row[0])
+        return super().count
+
+
+# ----------------------------------------------------------------
+class ProductCursorPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination of products by primary key
+
+    Attrs:
+        - ordering: defines unique and indexed ordering field
+        - page_size: defines default number of products per page
+        - page_size_query_param: defines query parameter to change number of products per page
+        - max_page_size: defines upper bound of number of products per page
+    """
+    ordering: str = 'id'
+    page_size: int = 100
+    page_size_query_param: str = 'page_size'
+    max_page_size: int = 1000
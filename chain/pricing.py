@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Case, OuterRef, Subquery, Sum, Value, When
+
+from chain.changes import units_changed
+from chain.models import Product, TradeUnit, provider_deltas
+
+
+# ----------------------------------------------------------------
+def update_product_prices(prices: dict[int, Decimal | None]) -> dict:
+    """
+    Function to change prices of products and pass price deltas to debts of every linked unit
+    and rolled-up debts of their providers in one transaction
+
+    Number of statements does not depend on number of products and linked units: changed products are locked
+    and updated with one statement, debts are shifted by shift_linked_debts
+
+    Params:
+        - prices: dictionary with new price by id of product (all products must exist)
+
+    Returns:
+        - dictionary with numbers of changed products and units
+    """
+    links = TradeUnit.products.through.objects
+    with transaction.atomic():
+        current = dict(
+            Product.objects.select_for_update().filter(pk__in=prices).order_by('pk').values_list('pk', 'price')
+        )
+        changed = [pk for pk, price in current.items() if prices[pk] != price]
+        if not changed:
+            return {'products': 0, 'units': 0}
+        Product.objects.filter(pk__in=changed).update(price=Case(
+            *[When(pk=pk, then=Value(prices[pk])) for pk in changed],
+            output_field=models.DecimalField()
+        ))
+        units_changed(links.filter(product__in=changed).values_list('tradeunit', flat=True).distinct())
+        count = shift_linked_debts({
+            pk: (prices[pk] or Decimal(0)) - (current[pk] or Decimal(0)) for pk in changed
+        })
+    return {'products': len(changed), 'units': count}
+
+
+# ----------------------------------------------------------------
+def shift_linked_debts(deltas: dict[int, Decimal]) -> int:
+    """
+    Function to add price deltas of products to debts of every linked unit and rolled-up debts
+    of their providers with set-based statements
+
+    Debts of linked units are shifted by one UPDATE with the sum of deltas of their products taken
+    from the through table (debts are not lowered below zero), rolled-up debts of providers are shifted
+    by deltas actually applied, read from the locked linked units (one UPDATE per batch of providers),
+    so no subtree is scanned
+
+    Params:
+        - deltas: dictionary with price delta by id of product
+
+    Returns:
+        - number of changed units
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    delta_sum = Sum(Case(
+        *[When(product=pk, then=Value(delta)) for pk, delta in deltas.items()],
+        output_field=models.DecimalField()
+    ))
+    links = TradeUnit.products.through.objects.filter(product__in=deltas).order_by()
+    unit_delta = links.filter(tradeunit=OuterRef('pk')).values('tradeunit').annotate(total=delta_sum).values('total')
+    applied = TradeUnit.objects.filter(pk__in=links.values('tradeunit')).add_debt(
+        Subquery(unit_delta, output_field=models.DecimalField())
+    )
+    TradeUnit.objects.add_network_debts(provider_deltas(applied))
+    return len(applied)
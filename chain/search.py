@@ -0,0 +1,53 @@
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
+from django.db.models.functions import Greatest
+
+from chain.models import Contact, Product, TradeUnit
+
+
+# ----------------------------------------------------------------
+def search_filter(query: str) -> Q:
+    """
+    Function to build condition matching units by partial title, contact (email, country, city)
+    or products (title, model)
+
+    Every part is a lookup in one table (on PostgreSQL icontains is served by GIN trigram indexes
+    of UPPER(column)), parts are combined by primary and foreign keys, so the planner can OR bitmaps
+    of indexes instead of scanning joined tables
+    """
+    contacts = Contact.objects.filter(
+        Q(email__icontains=query) | Q(city__icontains=query) | Q(country__icontains=query)
+    ).values('pk')
+    products = Product.objects.filter(Q(title__icontains=query) | Q(model__icontains=query)).values('pk')
+    links = TradeUnit.products.through.objects.filter(product__in=products).values('tradeunit_id')
+    return Q(title__icontains=query) | Q(contact__in=contacts) | Q(pk__in=links)
+
+
+# ----------------------------------------------------------------
+def search_rank(query: str):
+    """
+    Function to build rank expression of found units: trigram word similarity of title and contact
+    on PostgreSQL, exact/prefix/partial match of title on other databases
+    """
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        return Greatest(*(
+            TrigramWordSimilarity(query, field)
+            for field in ('title', 'contact__email', 'contact__city', 'contact__country')
+        ))
+    return Case(
+        When(title__iexact=query, then=Value(3)),
+        When(title__istartswith=query, then=Value(2)),
+        When(title__icontains=query, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+# ----------------------------------------------------------------
+def search_units(queryset: QuerySet, query: str) -> QuerySet:
+    """
+    Function to filter units by search query and order them by rank (best matches first)
+    """
+    return queryset.filter(search_filter(query)).annotate(rank=search_rank(query)).order_by('-rank', 'pk')
@@ -1,9 +1,13 @@
 from typing import Type, Any
 
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Manager
 from rest_framework import serializers
 from rest_framework.utils.serializer_helpers import ReturnDict
 
-from chain.models import TradeUnit, Contact, Product
+from chain.models import TradeUnit, TradeUnitChange, Contact, Product, DebtReset
+from trading_network.instrumentation import serialization_span
 
 
 # ----------------------------------------------------------------
@@ -26,6 +30,47 @@ class ProductSerializer(serializers.ModelSerializer):
         fields: str = '__all__'
 
 
+# ----------------------------------------------------------------
+class ProductPriceSerializer(serializers.Serializer):
+    """
+    Serializer validating one row of bulk price update (existence of products is checked for the whole list at once)
+
+    Attrs:
+        - id: IntegerField defines id of product
+        - price: DecimalField defines new price of product
+    """
+    id = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=0, allow_null=True)
+
+
+# ----------------------------------------------------------------
+class ProductPriceListSerializer(serializers.ListSerializer):
+    """
+    Serializer validating list of bulk price update
+    """
+    child = ProductPriceSerializer()
+
+    def validate(self, attrs: list) -> dict:
+        """
+        Redefined method to check products with one query
+
+        Returns:
+            - dictionary with new price by id of product
+
+        Raises:
+            - ValidationError (in case of empty list, repeated or unknown products)
+        """
+        if not attrs:
+            raise serializers.ValidationError('Expected a non-empty list of prices')
+        prices = {row['id']: row['price'] for row in attrs}
+        if len(prices) < len(attrs):
+            raise serializers.ValidationError('Every product can be listed only once')
+        unknown = prices.keys() - set(Product.objects.filter(pk__in=prices).values_list('pk', flat=True))
+        if unknown:
+            raise serializers.ValidationError(f'Unknown products: {", ".join(map(str, sorted(unknown)))}')
+        return prices
+
+
 # ----------------------------------------------------------------
 class RetailCreateSerializer(serializers.ModelSerializer):
     """
@@ -42,9 +87,22 @@ class RetailCreateSerializer(serializers.ModelSerializer):
     products = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all(), many=True)
     debt = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
 
+    def validate_provider(self, provider: TradeUnit) -> TradeUnit:
+        """
+        Method to check that provider chain of the new unit does not become too deep
+
+        Raises:
+            - ValidationError (in case of too deep provider chain)
+        """
+        error = TradeUnit().provider_error(provider.pk, provider.path)
+        if error:
+            raise serializers.ValidationError(error)
+        return provider
+
     def create(self, validated_data) -> Type[TradeUnit]:
         """
         Redefined function to create a new trade unit (Create Contact entity and relates it with unit)
+        in one transaction. Debt is accumulated from prices of products when they are set
 
         Params:
             - validated_data: dictionary with validated data of TradeUnit entity
@@ -55,16 +113,67 @@ class RetailCreateSerializer(serializers.ModelSerializer):
         contact_data, product_data = validated_data.pop('contact'), validated_data.pop('products')
         contact_serializer = ContactSerializer(data=contact_data)
         contact_serializer.is_valid(raise_exception=True)
-        contact = contact_serializer.save()
-        trade_unit = TradeUnit.objects.create(contact=contact, **validated_data)
-        trade_unit.products.set(product_data)
-        trade_unit.debt = sum([product.price for product in trade_unit.products.all()])
-        trade_unit.save()
+        with transaction.atomic():
+            contact = contact_serializer.save()
+            trade_unit = TradeUnit.objects.create(contact=contact, **validated_data)
+            trade_unit.products.set(product_data)
         return trade_unit
 
     class Meta:
         model: Type[TradeUnit] = TradeUnit
-        exclude: list = ['level']
+        exclude: list = ['level', 'path', 'network_debt', 'version', 'modified']
+
+
+# ----------------------------------------------------------------
+class ContactImportSerializer(ContactSerializer):
+    """
+    Contact serializer for bulk import (uniqueness of email is checked for the whole batch at once)
+    """
+    class Meta(ContactSerializer.Meta):
+        fields: list = ['email', 'country', 'city', 'street', 'number']
+        extra_kwargs: dict = {'email': {'validators': []}}
+
+
+# ----------------------------------------------------------------
+class RetailImportSerializer(serializers.Serializer):
+    """
+    Serializer validating one row of bulk import without database queries
+
+    Attrs:
+        - title: CharField defines title of unit
+        - unit_type: ChoiceField defines type of unit
+        - provider: IntegerField defines id of existing provider (checked for the whole batch at once)
+        - contact: ContactImportSerializer handles incoming data with contact info
+        - products: ListField defines ids of existing products (checked for the whole batch at once)
+    """
+    title = serializers.CharField(max_length=25)
+    unit_type = serializers.ChoiceField(choices=TradeUnit.UnitType.choices, default=TradeUnit.UnitType.manufacture)
+    provider = serializers.IntegerField(required=False, allow_null=True, default=None)
+    contact = ContactImportSerializer()
+    products = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate_products(self, value: list[int]) -> list[int]:
+        """
+        Method to drop repeated products, so debt counts every linked product once
+        """
+        return list(dict.fromkeys(value))
+
+
+# ----------------------------------------------------------------
+class RetailListSerializer(serializers.ListSerializer):
+    """
+    Retail list serializer loading provider chains of the whole page at once
+    """
+    def to_representation(self, data) -> list:
+        """
+        Redefined method to attach providers, contacts and products to every unit before serialization
+        (unless they are loaded in advance)
+        """
+        iterable = data.all() if isinstance(data, Manager) else data
+        with serialization_span():
+            if self.context.get('chain_loaded'):
+                return super().to_representation(iterable)
+            return super().to_representation(TradeUnit.objects.attach_provider_chain(iterable))
 
 
 # ----------------------------------------------------------------
@@ -91,14 +200,73 @@ class RetailSerializer(serializers.ModelSerializer):
 
     def get_provider(self, obj) -> ReturnDict | None:
         """
-        Method defines recursive traversal of nested entities
+        Method defines recursive traversal of nested entities (provider chain is loaded in advance)
         """
         if obj.provider:
-            provider_serializer = self.__class__(obj.provider)
+            chain = self.context.get('chain', frozenset()) | {obj.pk}
+            if obj.provider_id in chain:
+                raise ValueError(f'Provider chain of unit {obj.pk} is a cycle')
+            provider_serializer = self.__class__(
+                obj.provider, context={**self.context, 'chain_loaded': True, 'chain': chain}
+            )
             return provider_serializer.data
         return None
 
+    def to_representation(self, instance) -> Any:
+        """
+        Redefined method to load provider chain of a single unit before serialization
+        """
+        with serialization_span():
+            if self.parent is None and not self.context.get('chain_loaded'):
+                TradeUnit.objects.attach_provider_chain([instance])
+            return super().to_representation(instance)
+
     class Meta:
         model: Type[TradeUnit] = TradeUnit
-        exclude: list = ['level']
+        exclude: list = ['level', 'path', 'network_debt', 'version', 'modified']
         read_only_fields: list = ['debt']
+        list_serializer_class: Type[RetailListSerializer] = RetailListSerializer
+
+
+# ----------------------------------------------------------------
+class DebtResetSerializer(serializers.ModelSerializer):
+    """
+    Debt reset serializer
+
+    Attrs:
+        - supplier: PrimaryKeyRelatedField defines unit whose downstream network is processed
+        - units: ListField defines explicit ids of processed units
+    """
+    supplier = serializers.PrimaryKeyRelatedField(queryset=TradeUnit.objects.all(), required=False, allow_null=True)
+    units = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_null=True, allow_empty=False,
+        max_length=DebtReset.max_units
+    )
+
+    def validate(self, attrs) -> Any:
+        """
+        Redefined method to require scope of reset and to limit number of units (checked by DebtReset.clean)
+
+        Raises:
+            - ValidationError (in case of neither supplier nor units are given or of too many units)
+        """
+        try:
+            DebtReset(supplier=attrs.get('supplier'), units=attrs.get('units')).clean()
+        except DjangoValidationError as error:
+            raise serializers.ValidationError(error.message_dict if hasattr(error, 'error_dict') else error.messages)
+        return attrs
+
+    class Meta:
+        model: Type[DebtReset] = DebtReset
+        fields: str = '__all__'
+        read_only_fields: list = ['status', 'total', 'processed', 'last_pk', 'error', 'created', 'finished']
+
+
+# ----------------------------------------------------------------
+class TradeUnitChangeSerializer(serializers.ModelSerializer):
+    """
+    Trade unit change serializer
+    """
+    class Meta:
+        model: Type[TradeUnitChange] = TradeUnitChange
+        fields: list = ['id', 'unit_id', 'action', 'created']
@@ -1,23 +1,215 @@
-from django.db.models.signals import pre_save
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from chain.models import TradeUnit
+from chain.changes import units_changed
+from chain.models import Contact, Product, TradeUnit, TradeUnitChange, path_ids, provider_deltas
+from chain.pricing import shift_linked_debts
 
 
 # ----------------------------------------------------------------
 @receiver(pre_save, sender=TradeUnit)
 def set_tradeunit_level(sender, instance, **kwargs):
     """
-    Called every time a TradeUnit is created to calculate the level in the hierarchy
+    Called every time a TradeUnit is saved to calculate the materialized path of providers
+    and the level in the hierarchy (remembers the previous state in case of provider or debt change
+    and refreshes rolled-up debt and version of the instance, which are not written by save)
 
     Raises:
-        - ValueError (in case of trying to set provider to manufacture unit)
-    """
-    if instance.unit_type == TradeUnit.UnitType.manufacture:
-        if instance.provider:
-            raise ValueError('Manufacture should not have provider')
-        instance.level = 0
-    elif instance.provider.unit_type == TradeUnit.UnitType.manufacture:
-        instance.level = 1
+        - ValueError (in case of trying to set provider to manufacture unit, of provider from
+          downstream network of the unit or of too deep provider chain)
+    """
+    if instance.unit_type == TradeUnit.UnitType.manufacture and instance.provider_id:
+        raise ValueError('Manufacture should not have provider')
+    instance._previous_state = None
+    if instance.pk:
+        state = instance.stored_state()
+        if state is not None:
+            instance._previous_state = state[:3]
+            instance.network_debt, instance.version = state[2], state[3]
+        else:
+            # unit inserted again after deletion of its row: its former consumers are detached
+            instance.network_debt = Decimal(0)
+    if instance.provider_id:
+        provider_path = TradeUnit.objects.filter(pk=instance.provider_id).values_list('path', flat=True).get()
+        current_path = instance._previous_state[0] if instance._previous_state else None
+        error = instance.provider_error(instance.provider_id, provider_path, current_path)
+        if error:
+            raise ValueError(error)
+        instance.path = f'{provider_path}{instance.provider_id}/'
+    else:
+        instance.path = ''
+    instance.level = len(instance.ancestor_ids)
+
+
+# ----------------------------------------------------------------
+@receiver(post_save, sender=TradeUnit)
+def move_tradeunit_subtree(sender, instance, created, **kwargs):
+    """
+    Called every time a TradeUnit is saved to move paths and levels of its downstream network
+    after provider change
+    """
+    previous_state = getattr(instance, '_previous_state', None)
+    if not created and previous_state is not None and previous_state[0] != instance.path:
+        TradeUnit.objects.move_subtree(f'{previous_state[0]}{instance.pk}/', instance.subtree_path)
+
+
+# ----------------------------------------------------------------
+@receiver(post_save, sender=TradeUnit)
+def roll_up_tradeunit_debt(sender, instance, created, **kwargs):
+    """
+    Called every time a TradeUnit is saved to pass change of its debt (or of the whole downstream
+    network debt in case of provider change) to rolled-up debt of its providers
+    """
+    debt = Decimal(str(instance.debt or 0))
+    previous_state = getattr(instance, '_previous_state', None)
+    if created or previous_state is None:
+        add_providers_debt(instance.path, debt)
+        return
+    previous_path, previous_debt, network_debt = previous_state
+    previous_debt = previous_debt or Decimal(0)
+    if previous_path != instance.path:
+        add_providers_debt(previous_path, -previous_debt - network_debt)
+        add_providers_debt(instance.path, debt + network_debt)
+    elif debt != previous_debt:
+        add_providers_debt(instance.path, debt - previous_debt)
+
+
+# ----------------------------------------------------------------
+@receiver(pre_delete, sender=TradeUnit)
+def detach_tradeunit_subtree(sender, instance, **kwargs):
+    """
+    Called every time a TradeUnit is deleted to cut it out of paths, levels and rolled-up debts
+    of its downstream network and providers (direct consumers become roots as their provider is set to null),
+    versions of the downstream network are increased before it is cut out
+    """
+    state = TradeUnit.objects.filter(pk=instance.pk).values_list('path', 'debt', 'network_debt').first()
+    if state is not None:
+        path, debt, network_debt = state
+        TradeUnit.objects.bump_versions([instance.pk])
+        TradeUnit.objects.move_subtree(f'{path}{instance.pk}/', '')
+        add_providers_debt(path, -(debt or Decimal(0)) - network_debt)
+
+
+# ----------------------------------------------------------------
+@receiver(m2m_changed, sender=TradeUnit.products.through)
+def update_tradeunit_debt(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Called every time products of a TradeUnit (or units of a Product) are changed to add prices
+    of linked products to debts of units and remove prices of unlinked ones
+    """
+    if action in ('pre_remove', 'pre_clear'):
+        links = sender.objects.filter(product=instance) if reverse else sender.objects.filter(tradeunit=instance)
+        if pk_set is not None:
+            links = links.filter(tradeunit__in=pk_set) if reverse else links.filter(product__in=pk_set)
+        instance._unlinked_pks = set(links.values_list('tradeunit_id' if reverse else 'product_id', flat=True))
+        return
+    if action == 'post_add':
+        sign, pks = 1, pk_set
+    elif action in ('post_remove', 'post_clear'):
+        sign, pks = -1, getattr(instance, '_unlinked_pks', set())
+    else:
+        return
+    if not pks:
+        return
+    if reverse:
+        applied = TradeUnit.objects.filter(pk__in=pks).add_debt(sign * (instance.price or Decimal(0)))
+        TradeUnit.objects.add_network_debts(provider_deltas(applied))
+    else:
+        delta = sign * (Product.objects.filter(pk__in=pks).aggregate(total=Sum('price'))['total'] or Decimal(0))
+        applied = sum((applied for _, applied in TradeUnit.objects.filter(pk=instance.pk).add_debt(delta)), Decimal(0))
+        add_providers_debt(instance.path, applied)
+        instance.debt = Decimal(str(instance.debt or 0)) + applied
+
+
+# ----------------------------------------------------------------
+@receiver(pre_save, sender=Product)
+def remember_product_price(sender, instance, **kwargs):
+    """
+    Called every time a Product is saved to remember its previous price read from the locked row
+    (the row stays locked until the saving transaction ends)
+    """
+    instance._previous_price = None
+    if instance.pk:
+        instance._previous_price = Product.objects.select_for_update().filter(
+            pk=instance.pk
+        ).values_list('price', flat=True).first()
+
+
+# ----------------------------------------------------------------
+@receiver(post_save, sender=Product)
+def propagate_product_price(sender, instance, created, **kwargs):
+    """
+    Called every time a Product is saved to pass change of its price to debts of every linked unit
+    and rolled-up debts of their providers with set-based updates
+    """
+    if created:
+        return
+    delta = Decimal(str(instance.price or 0)) - (getattr(instance, '_previous_price', None) or Decimal(0))
+    shift_linked_debts({instance.pk: delta})
+
+
+# ----------------------------------------------------------------
+@receiver(pre_delete, sender=Product)
+def remove_product_price(sender, instance, **kwargs):
+    """
+    Called every time a Product is deleted to remove its price from debts of every linked unit
+    """
+    if instance.price:
+        shift_linked_debts({instance.pk: -instance.price})
+
+
+# ----------------------------------------------------------------
+@receiver(post_save, sender=TradeUnit)
+@receiver(post_delete, sender=TradeUnit)
+def register_tradeunit_change(sender, instance, created=False, **kwargs):
+    """
+    Called every time a TradeUnit is saved or deleted to record the change, increase versions and evict
+    cached responses of it and of its downstream network
+    """
+    if kwargs['signal'] is post_delete:
+        action = TradeUnitChange.Action.deleted
     else:
-        instance.level = instance.provider.level + 1
+        action = TradeUnitChange.Action.created if created else TradeUnitChange.Action.updated
+    units_changed([instance.pk], action)
+
+
+# ----------------------------------------------------------------
+@receiver(post_save, sender=Contact)
+@receiver(pre_delete, sender=Contact)
+@receiver(post_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def register_related_change(sender, instance, created=False, **kwargs):
+    """
+    Called every time a Contact or a Product is saved or deleted to record changes, increase versions
+    and evict cached responses of units showing it (a created one is shown by no unit yet)
+    """
+    if created:
+        return
+    units = TradeUnit.objects.filter(**{'contact' if sender is Contact else 'products': instance})
+    units_changed(list(units.values_list('pk', flat=True)))
+
+
+# ----------------------------------------------------------------
+@receiver(m2m_changed, sender=TradeUnit.products.through)
+def register_products_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Called every time products of a TradeUnit (or units of a Product) are changed to record changes,
+    increase versions and evict cached responses of changed units
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            units_changed([instance.pk])
+        else:
+            units_changed(pk_set if action != 'post_clear' else getattr(instance, '_unlinked_pks', []))
+
+
+# ----------------------------------------------------------------
+def add_providers_debt(path: str, delta: Decimal) -> None:
+    """
+    Function to add delta to rolled-up debt of every provider from materialized path
+    """
+    if delta and path:
+        TradeUnit.objects.filter(pk__in=path_ids(path)).add_network_debt(delta)
@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Max, Sum
+
+from chain.models import NetworkStats, TopDebtors, TradeUnit, TradeUnitChange, path_ids
+
+CENTS: Decimal = Decimal('0.01')
+refresh_lock = threading.Lock()
+
+
+# ----------------------------------------------------------------
+def compute_summary() -> dict:
+    """
+    Function to count units and sum their debts by country, city, unit type and level with two grouped
+    queries: by pairs (country, city) and (unit type, level), single dimensions are summed up from pairs
+
+    Returns:
+        - dictionary with total and lists of groups (ordered by debt, levels by level)
+    """
+    cities, countries, unit_types, levels = (defaultdict(lambda: [0, Decimal(0)]) for _ in range(4))
+    for country, city, units, debt in TradeUnit.objects.order_by().values_list(
+        'contact__country', 'contact__city'
+    ).annotate(units=Count('pk'), debt=Sum('debt')):
+        for group in (cities[(country, city)], countries[(country,)]):
+            group[0] += units
+            group[1] += debt or Decimal(0)
+    labels = dict(TradeUnit._meta.get_field('unit_type').flatchoices)
+    for unit_type, level, units, debt in TradeUnit.objects.order_by().values_list(
+        'unit_type', 'level'
+    ).annotate(units=Count('pk'), debt=Sum('debt')):
+        for group in (unit_types[(labels.get(unit_type, unit_type),)], levels[(level,)]):
+            group[0] += units
+            group[1] += debt or Decimal(0)
+
+    def listed(groups: dict, fields: tuple, key=lambda item: (-item[1][1], -item[1][0])) -> list[dict]:
+        return [
+            {**dict(zip(fields, values)), 'units': units, 'debt': str(debt.quantize(CENTS))}
+            for values, (units, debt) in sorted(groups.items(), key=key)
+        ]
+
+    return {
+        'total': {
+            'units': sum(units for units, _ in countries.values()),
+            'debt': str(sum((debt for _, debt in countries.values()), Decimal(0)).quantize(CENTS)),
+        },
+        'countries': listed(countries, ('country',)),
+        'cities': listed(cities, ('country', 'city')),
+        'unit_types': listed(unit_types, ('unit_type',)),
+        'levels': listed(levels, ('level',), key=lambda item: item[0]),
+    }
+
+
+# ----------------------------------------------------------------
+def top_debtors(size: int) -> list[dict]:
+    """
+    Function to get units with the largest debts in the whole network with one query served
+    by index (debt, id) read backwards (no units are scanned beyond the returned ones)
+
+    Params:
+        - size: defines number of debtors
+    """
+    units = TradeUnit.objects.filter(debt__gt=0).order_by('-debt', '-pk').values_list('pk', 'title', 'debt')[:size]
+    return [{'id': pk, 'title': title, 'debt': str(debt.quantize(CENTS))} for pk, title, debt in units]
+
+
+# ----------------------------------------------------------------
+def compute_top_debtors(size: int) -> dict[int | None, list[dict]]:
+    """
+    Function to find units with the largest debts in downstream network of every supplier and of the whole
+    network with one pass over units with debt streamed in order of debt: every unit is taken by those
+    of its providers (known from its path) whose lists are not full yet
+
+    Params:
+        - size: defines number of debtors of every supplier
+
+    Returns:
+        - dictionary with list of debtors by id of supplier (None for the whole network)
+    """
+    top = defaultdict(list)
+    units = TradeUnit.objects.filter(debt__gt=0).order_by('-debt', '-pk').values_list('pk', 'title', 'path', 'debt')
+    for pk, title, path, debt in units.iterator(chunk_size=2000):
+        debtor = None
+        for supplier_id in (None, *path_ids(path)):
+            if len(top[supplier_id]) < size:
+                debtor = debtor or {'id': pk, 'title': title, 'debt': str(debt.quantize(CENTS))}
+                top[supplier_id].append(debtor)
+    return top
+
+
+# ----------------------------------------------------------------
+def refresh_stats() -> NetworkStats:
+    """
+    Function to compute new snapshot of statistics and replace previous ones in one transaction
+    (snapshot includes changes of change log up to the latest one seen before computing)
+
+    Returns:
+        - NetworkStats object
+    """
+    started = time.monotonic()
+    last_change = TradeUnitChange.objects.aggregate(last=Max('pk'))['last'] or 0
+    summary = compute_summary()
+    top = compute_top_debtors(getattr(settings, 'STATS_TOP_DEBTORS', 10))
+    with transaction.atomic():
+        stats = NetworkStats.objects.create(
+            last_change=last_change, summary=summary, duration=time.monotonic() - started
+        )
+        TopDebtors.objects.bulk_create((
+            TopDebtors(stats=stats, supplier_id=supplier_id, debtors=debtors) for supplier_id, debtors in top.items()
+        ), batch_size=1000)
+        NetworkStats.objects.filter(pk__lt=stats.pk).delete()
+    return stats
+
+
+# ----------------------------------------------------------------
+def current_stats() -> tuple[NetworkStats | None, bool]:
+    """
+    Function to get the latest snapshot of statistics: a missing snapshot is computed in background
+    (so no snapshot is returned until it is ready), a stale one (change log is ahead of it) older than
+    STATS_REFRESH_INTERVAL seconds is served while new one is computed in background (both are computed
+    synchronously if STATS_REFRESH_ASYNC setting is disabled)
+
+    Returns:
+        - tuple with NetworkStats object (None while the first one is computed) and whether changes after it exist
+    """
+    stats = NetworkStats.objects.order_by('-pk').first()
+    if stats is None:
+        if not getattr(settings, 'STATS_REFRESH_ASYNC', True):
+            return refresh_stats(), False
+        start_stats_refresh()
+        return None, True
+    stale = TradeUnitChange.objects.filter(pk__gt=stats.last_change).exists()
+    if stale and time.time() - stats.created.timestamp() >= getattr(settings, 'STATS_REFRESH_INTERVAL', 60):
+        if not getattr(settings, 'STATS_REFRESH_ASYNC', True):
+            return refresh_stats(), False
+        start_stats_refresh()
+    return stats, stale
+
+
+# ----------------------------------------------------------------
+def start_stats_refresh() -> None:
+    """
+    Function to refresh statistics in a background thread unless refresh of this process is running already
+    """
+    if refresh_lock.acquire(blocking=False):
+        threading.Thread(target=refresh_in_thread, daemon=True).start()
+
+
+# ----------------------------------------------------------------
+def refresh_in_thread() -> None:
+    """
+    Function to refresh statistics with its own database connection
+    """
+    try:
+        refresh_stats()
+    finally:
+        close_old_connections()
+        refresh_lock.release()
@@ -0,0 +1,233 @@
+import csv
+import io
+import math
+import random
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from typing import Callable, NamedTuple
+
+from django.db import connection, models
+
+from chain.models import Contact, Product, TradeUnit
+
+
+# ----------------------------------------------------------------
+class SyntheticNetwork(NamedTuple):
+    """
+    Summary of generated network
+
+    Attrs:
+        - units: defines number of created units
+        - products: defines number of created products
+        - factories: defines ids of created factories
+        - deepest: defines id of a unit on the deepest level
+    """
+    units: int
+    products: int
+    factories: list[int]
+    deepest: int | None
+
+
+# ----------------------------------------------------------------
+class NetworkGenerator:
+    """
+    Generator of synthetic trading network: factories on level 0, retail networks on intermediate levels
+    and individual entrepreneurs on the deepest level, every unit with its own contact and products.
+    Units are written level by level with bulk inserts, paths, levels, debts and rolled-up debts are
+    computed in memory, so the number of queries depends on the number of batches only.
+    On PostgreSQL rows can be written with COPY (ids are reserved from sequences beforehand)
+
+    Attrs:
+        - size: defines number of units to create
+        - depth: defines level of the deepest units
+        - fanout: defines number of consumers of every provider
+        - products: defines number of products to create
+        - products_per_unit: defines number of products linked to every unit
+        - countries: defines number of countries of contacts (skewed distribution)
+        - cities: defines number of cities in every country (skewed distribution)
+        - batch_size: defines number of rows of one insert
+        - seed: defines seed of random generator
+        - copy: defines whether rows are written with COPY (PostgreSQL only, ignored on other databases)
+    """
+    def __init__(
+        self, size: int, depth: int = 2, fanout: int = 10, products: int = 1000, products_per_unit: int = 3,
+        countries: int = 20, cities: int = 50, batch_size: int = 5000, seed: int = 0,
+        copy: bool = False
+    ) -> None:
+        self.size = size
+        self.depth = depth
+        self.fanout = fanout
+        self.products = products
+        self.products_per_unit = min(products_per_unit, products)
+        self.countries = countries
+        self.cities = cities
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.copy = copy and connection.vendor == 'postgresql'
+        self.run = uuid.uuid4().hex[:8]
+
+    def generate(self, progress: Callable[[int], None] | None = None) -> SyntheticNetwork:
+        """
+        Method to write the whole network
+
+        Params:
+            - progress: optional callable receiving number of created units after every batch
+
+        Returns:
+            - SyntheticNetwork summary
+        """
+        prices = self.create_products()
+        per_factory = sum(self.fanout ** level for level in range(self.depth + 1))
+        factories_count = max(1, math.ceil(self.size / per_factory))
+        network_debts = defaultdict(Decimal)
+        created, providers, factories, deepest = 0, [None] * factories_count, [], None
+
+        for level in range(self.depth + 1):
+            unit_type = self.unit_type(level)
+            slots = providers if level == 0 else [provider for provider in providers for _ in range(self.fanout)]
+            slots = slots[:self.size - created]
+            next_providers = []
+            for start in range(0, len(slots), self.batch_size):
+                units = self.create_batch(slots[start:start + self.batch_size], unit_type, level, prices)
+                for unit in units:
+                    for pk in unit.ancestor_ids:
+                        network_debts[pk] += unit.debt
+                next_providers.extend((unit.pk, unit.subtree_path) for unit in units)
+                created += len(units)
+                if progress:
+                    progress(created)
+            if level == 0:
+                factories = [pk for pk, _ in next_providers]
+            if next_providers:
+                deepest = next_providers[-1][0]
+            providers = next_providers
+            if created >= self.size or not providers:
+                break
+
+        self.write_network_debts(network_debts)
+        return SyntheticNetwork(created, len(prices), factories, deepest)
+
+    def unit_type(self, level: int) -> int:
+        """
+        Method to choose type of units of level
+        """
+        if level == 0:
+            return TradeUnit.UnitType.manufacture
+        if level == self.depth:
+            return TradeUnit.UnitType.entrepreneur
+        return TradeUnit.UnitType.retail_network
+
+    def create_products(self) -> dict[int, Decimal]:
+        """
+        Method to create products
+
+        Returns:
+            - dictionary with prices of products by their ids
+        """
+        products = []
+        for start in range(0, self.products, self.batch_size):
+            products += self.insert(Product, [
+                Product(
+                    title=f'Product {i}',
+                    model=f'Model {i % 50}',
+                    price=Decimal(self.rng.randrange(100, 100_000)) / 100
+                )
+                for i in range(start, min(start + self.batch_size, self.products))
+            ])
+        return {product.pk: product.price for product in products}
+
+    def create_batch(self, slots: list, unit_type: int, level: int, prices: dict) -> list[TradeUnit]:
+        """
+        Method to write one batch of contacts, units and links to products
+
+        Params:
+            - slots: list with (id, subtree path) of providers (None for factories)
+
+        Returns:
+            - list with created units
+        """
+        contacts = self.insert(Contact, [self.contact() for _ in slots])
+        product_ids = list(prices)
+        links, units = [], []
+        for contact, provider in zip(contacts, slots):
+            chosen = self.rng.sample(product_ids, self.products_per_unit)
+            links.append(chosen)
+            path = provider[1] if provider else ''
+            units.append(TradeUnit(
+                title=f'Unit {contact.pk}',
+                contact=contact,
+                unit_type=unit_type,
+                provider_id=provider[0] if provider else None,
+                path=path,
+                level=level,
+                debt=sum((prices[pk] for pk in chosen), Decimal(0))
+            ))
+        units = self.insert(TradeUnit, units)
+        through = TradeUnit.products.through
+        self.insert(through, [
+            through(tradeunit_id=unit.pk, product_id=product_id)
+            for unit, chosen in zip(units, links) for product_id in chosen
+        ])
+        return units
+
+    def insert(self, model: type[models.Model], objects: list) -> list:
+        """
+        Method to insert objects of model with bulk create or with COPY
+
+        Returns:
+            - list with inserted objects (with primary keys)
+        """
+        if not self.copy:
+            return model.objects.bulk_create(objects, batch_size=self.batch_size)
+        if not objects:
+            return objects
+        fields = model._meta.concrete_fields
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+                [model._meta.db_table, model._meta.pk.column, len(objects)]
+            )
+            for obj, (pk,) in zip(objects, cursor.fetchall()):
+                obj.pk = pk
+                obj._state.adding, obj._state.db = False, connection.alias
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for obj in objects:
+                writer.writerow([self.copy_value(field, obj) for field in fields])
+            buffer.seek(0)
+            table = connection.ops.quote_name(model._meta.db_table)
+            columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+        return objects
+
+    @staticmethod
+    def copy_value(field: models.Field, obj: models.Model) -> object:
+        """
+        Method to convert value of field to CSV value of COPY (NULL is written as \\N)
+        """
+        value = field.get_db_prep_save(field.pre_save(obj, True), connection)
+        return '\\N' if value is None else value
+
+    def contact(self) -> Contact:
+        """
+        Method to build contact in a country and a city chosen with skewed (Zipf-like) distribution
+        """
+        country = min(int(self.rng.paretovariate(1.2)), self.countries)
+        city = min(int(self.rng.paretovariate(1.2)), self.cities)
+        return Contact(
+            email=f'{uuid.uuid4().hex[:12]}.{self.run}@synthetic.example',
+            country=f'Country {country}',
+            city=f'City {country}-{city}',
+            street=f'Street {self.rng.randrange(1, 500)}',
+            number=str(self.rng.randrange(1, 200))
+        )
+
+    def write_network_debts(self, network_debts: dict[int, Decimal]) -> None:
+        """
+        Method to write rolled-up debts of providers computed in memory
+        """
+        TradeUnit.objects.bulk_update(
+            [TradeUnit(pk=pk, network_debt=debt) for pk, debt in network_debts.items()],
+            ['network_debt'], batch_size=self.batch_size
+        )
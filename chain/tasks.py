@@ -0,0 +1,115 @@
+import threading
+from bisect import bisect_right
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from chain.changes import units_changed
+from chain.models import DebtReset, TradeUnit, path_ids
+
+
+# ----------------------------------------------------------------
+def start_debt_reset(job: DebtReset) -> None:
+    """
+    Function to run debt reset in a background thread after commit of current transaction
+    (synchronously if DEBT_RESET_ASYNC setting is disabled)
+    """
+    if getattr(settings, 'DEBT_RESET_ASYNC', True):
+        transaction.on_commit(lambda: threading.Thread(target=run_in_thread, args=(job.pk,), daemon=True).start())
+    else:
+        run_debt_reset(job)
+
+
+# ----------------------------------------------------------------
+def run_in_thread(job_id: int) -> None:
+    """
+    Function to run debt reset with its own database connection
+    """
+    try:
+        run_debt_reset(DebtReset.objects.get(pk=job_id))
+    finally:
+        close_old_connections()
+
+
+# ----------------------------------------------------------------
+def run_debt_reset(job: DebtReset, progress=None) -> DebtReset:
+    """
+    Function to reset debts of job's units chunk by chunk (continues after the last processed unit)
+
+    Params:
+        - job: DebtReset object
+        - progress: optional callable receiving job after every chunk
+
+    Returns:
+        - job
+    """
+    try:
+        if job.units is not None:
+            job.units = sorted(set(job.units))
+        if job.status == DebtReset.Status.pending:
+            job.total = debt_reset_scope(job).count() if job.units is None else len(job.units)
+        job.status, job.error = DebtReset.Status.running, ''
+        job.save(update_fields=['status', 'total', 'error'])
+        while ids := next_chunk(job):
+            reset_chunk(job, ids)
+            if progress:
+                progress(job)
+    except Exception as error:
+        job.status, job.error = DebtReset.Status.failed, repr(error)
+    else:
+        job.status = DebtReset.Status.done
+    job.finished = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished'])
+    return job
+
+
+# ----------------------------------------------------------------
+def debt_reset_scope(job: DebtReset):
+    """
+    Function to get queryset of units of supplier's downstream network processed by job
+
+    Raises:
+        - ValueError (in case of job without supplier, e.g. supplier is deleted)
+    """
+    supplier_path = TradeUnit.objects.filter(pk=job.supplier_id).values_list('path', flat=True).first()
+    if not job.supplier_id or supplier_path is None:
+        raise ValueError('Supplier of debt reset does not exist')
+    return TradeUnit.objects.filter(Q(path__startswith=f'{supplier_path}{job.supplier_id}/') | Q(pk=job.supplier_id))
+
+
+# ----------------------------------------------------------------
+def next_chunk(job: DebtReset) -> list[int]:
+    """
+    Function to get ids of the next chunk after the last processed unit (keyset by primary key,
+    explicit ids are sorted once by run_debt_reset)
+    """
+    if job.units is not None:
+        start = bisect_right(job.units, job.last_pk)
+        return job.units[start:start + job.chunk_size]
+    return list(
+        debt_reset_scope(job).filter(pk__gt=job.last_pk).order_by('pk').values_list('pk', flat=True)[:job.chunk_size]
+    )
+
+
+# ----------------------------------------------------------------
+def reset_chunk(job: DebtReset, ids: list[int]) -> None:
+    """
+    Function to reset debts of one chunk in a short transaction and subtract them
+    from rolled-up debts of providers
+    """
+    with transaction.atomic():
+        units = TradeUnit.objects.select_for_update().filter(pk__in=ids)
+        deltas = Counter()
+        for path, debt in units.values_list('path', 'debt'):
+            for pk in path_ids(path):
+                deltas[pk] -= debt or Decimal(0)
+        processed = units.update(debt=0)
+        TradeUnit.objects.add_network_debts(deltas)
+        job.processed += processed
+        job.last_pk = ids[-1]
+        job.save(update_fields=['processed', 'last_pk'])
+        units_changed(ids)
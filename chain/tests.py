@@ -1,3 +1,802 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
+from io import StringIO
+from typing import Any
+from unittest.mock import patch
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.db.models import F
+from django.test import AsyncClient, TestCase
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from chain.admin import RetailAdmin
+from chain.bulk import TradeUnitBulkImporter
+from chain.cache import retail_cache
+from chain.compact import CompactRetailSerializer
+from chain.management.commands.find_cycles import Command
+from chain.models import Contact, DebtReset, Product, TradeUnit, TradeUnitChange, TradeUnitQuerySet
+from chain.pagination import RetailCursorPagination
+from chain.serializers import RetailSerializer
+from chain.stats import refresh_stats, top_debtors
+from chain.tasks import run_debt_reset
+from core.models import User
+from trading_network.throttling import bucket_store
+
+
+# ----------------------------------------------------------------
+class StaleSaveTestCase(TestCase):
+    """
+    Tests of saving trade units loaded before set-based updates of their rolled-up debts
+    """
+    def setUp(self) -> None:
+        self.factory = TradeUnit.objects.create(title='Factory')
+        self.retail = TradeUnit.objects.create(
+            title='Retail', provider=self.factory, unit_type=TradeUnit.UnitType.retail_network, debt=20
+        )
+
+    def network_debt(self, unit: TradeUnit) -> Decimal:
+        return TradeUnit.objects.values_list('network_debt', flat=True).get(pk=unit.pk)
+
+    def test_stale_save_keeps_network_debt(self) -> None:
+        stale = TradeUnit.objects.get(pk=self.factory.pk)
+        TradeUnit.objects.create(
+            title='Entrepreneur', provider=self.factory, unit_type=TradeUnit.UnitType.entrepreneur, debt=4
+        )
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(self.network_debt(self.factory), Decimal(24))
+        self.assertEqual(stale.network_debt, Decimal(24))
+        self.retail.delete()
+        self.assertEqual(self.network_debt(self.factory), Decimal(4))
+
+    def test_stale_save_of_consumer_keeps_network_debt(self) -> None:
+        stale = TradeUnit.objects.get(pk=self.retail.pk)
+        TradeUnit.objects.create(
+            title='Entrepreneur', provider=self.retail, unit_type=TradeUnit.UnitType.entrepreneur, debt=4
+        )
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(self.network_debt(self.retail), Decimal(4))
+        self.assertEqual(self.network_debt(self.factory), Decimal(24))
+
+
+# ----------------------------------------------------------------
+class SubtreeTestCase(TestCase):
+    """
+    Tests of paths, levels and rolled-up debts of downstream networks of moved and deleted units
+    """
+    def setUp(self) -> None:
+        self.factory = TradeUnit.objects.create(title='Factory')
+        self.retail = TradeUnit.objects.create(
+            title='Retail', provider=self.factory, unit_type=TradeUnit.UnitType.retail_network, debt=10
+        )
+        self.entrepreneur = TradeUnit.objects.create(
+            title='Entrepreneur', provider=self.retail, unit_type=TradeUnit.UnitType.entrepreneur, debt=5
+        )
+        self.consumer = TradeUnit.objects.create(
+            title='Consumer', provider=self.entrepreneur, unit_type=TradeUnit.UnitType.entrepreneur, debt=1
+        )
+
+    def state(self, unit: TradeUnit) -> tuple:
+        return TradeUnit.objects.values_list('path', 'level', 'network_debt').get(pk=unit.pk)
+
+    def test_move_of_subtree(self) -> None:
+        other_factory = TradeUnit.objects.create(title='Other factory')
+        with patch.object(TradeUnitQuerySet, 'recompute_levels') as recompute:
+            self.entrepreneur.provider = other_factory
+            self.entrepreneur.save()
+        recompute.assert_not_called()
+        self.assertEqual(self.state(self.entrepreneur), (f'{other_factory.pk}/', 1, Decimal(1)))
+        self.assertEqual(self.state(self.consumer), (f'{other_factory.pk}/{self.entrepreneur.pk}/', 2, Decimal(0)))
+        self.assertEqual(self.state(other_factory), ('', 0, Decimal(6)))
+        self.assertEqual(self.state(self.retail), (f'{self.factory.pk}/', 1, Decimal(0)))
+        self.assertEqual(self.state(self.factory), ('', 0, Decimal(10)))
+
+    def test_recompute_levels_of_subtree(self) -> None:
+        TradeUnit.objects.update(level=7)
+        call_command('recompute_levels', unit=self.entrepreneur.pk, stdout=StringIO())
+        self.assertEqual(
+            list(TradeUnit.objects.order_by('pk').values_list('level', flat=True)), [7, 7, 2, 3]
+        )
+
+    def test_delete_of_middle_unit_detaches_subtree(self) -> None:
+        self.retail.delete()
+        self.assertEqual(self.state(self.entrepreneur), ('', 0, Decimal(1)))
+        self.assertEqual(self.state(self.consumer), (f'{self.entrepreneur.pk}/', 1, Decimal(0)))
+        self.assertEqual(self.state(self.factory), ('', 0, Decimal(0)))
+        self.assertIsNone(TradeUnit.objects.get(pk=self.entrepreneur.pk).provider_id)
+
+    def test_save_of_deleted_unit_inserts_it(self) -> None:
+        TradeUnit.objects.get(pk=self.retail.pk).delete()
+        self.retail.title = 'Retail again'
+        self.retail.save()
+        self.assertEqual(TradeUnit.objects.get(pk=self.retail.pk).title, 'Retail again')
+        self.assertEqual(self.state(self.retail), (f'{self.factory.pk}/', 1, Decimal(0)))
+        self.assertEqual(self.state(self.factory), ('', 0, Decimal(10)))
+
+
+# ----------------------------------------------------------------
+class NetworkDebtPropagationTestCase(TestCase):
+    """
+    Tests of rolled-up debts shifted by deltas on bulk import and on change of units of a product
+    """
+    def setUp(self) -> None:
+        self.factory = TradeUnit.objects.create(title='Factory')
+        self.other_factory = TradeUnit.objects.create(title='Other factory')
+        self.retail = TradeUnit.objects.create(
+            title='Retail', provider=self.factory, unit_type=TradeUnit.UnitType.retail_network, debt=10,
+            contact=Contact.objects.create(email='retail@example.com', country='NL')
+        )
+        self.entrepreneur = TradeUnit.objects.create(
+            title='Entrepreneur', provider=self.retail, unit_type=TradeUnit.UnitType.entrepreneur, debt=5
+        )
+        self.product = Product.objects.create(title='Product', model='P', price=7)
+
+    def network_debt(self, unit: TradeUnit) -> Decimal:
+        return TradeUnit.objects.values_list('network_debt', flat=True).get(pk=unit.pk)
+
+    def assert_network_debts_consistent(self) -> None:
+        shifted = dict(TradeUnit.objects.values_list('pk', 'network_debt'))
+        TradeUnit.objects.all().refresh_network_debt()
+        self.assertEqual(shifted, dict(TradeUnit.objects.values_list('pk', 'network_debt')))
+
+    def row(self, title: str, email: str, provider: TradeUnit, unit_type: str) -> dict:
+        return {
+            'title': title, 'unit_type': unit_type, 'provider': provider.pk, 'products': [self.product.pk],
+            'contact': {'email': email, 'country': 'NL', 'city': 'Delft', 'street': 'Main', 'number': '1'},
+        }
+
+    def test_bulk_import_moves_subtree(self) -> None:
+        with patch.object(TradeUnitQuerySet, 'refresh_network_debt') as refresh:
+            results = list(TradeUnitBulkImporter(upsert=True).run([
+                self.row('Retail', 'retail@example.com', self.other_factory, TradeUnit.UnitType.retail_network),
+                self.row('New', 'new@example.com', self.retail, TradeUnit.UnitType.entrepreneur),
+            ]))
+        refresh.assert_not_called()
+        self.assertEqual([result['status'] for result in results], ['updated', 'created'])
+        self.assert_network_debts_consistent()
+        self.assertEqual(self.network_debt(self.other_factory), Decimal(19))
+        self.assertEqual(self.network_debt(self.factory), Decimal(0))
+
+    def test_product_units_change(self) -> None:
+        with patch.object(TradeUnitQuerySet, 'refresh_network_debt') as refresh:
+            self.product.units.add(self.retail, self.entrepreneur)
+        refresh.assert_not_called()
+        self.assert_network_debts_consistent()
+        self.assertEqual(self.network_debt(self.factory), Decimal(29))
+        self.product.units.remove(self.entrepreneur)
+        self.assert_network_debts_consistent()
+        self.product.units.clear()
+        self.assert_network_debts_consistent()
+        self.assertEqual(self.network_debt(self.factory), Decimal(15))
+
+    def test_debts_are_not_lowered_below_zero_after_reset(self) -> None:
+        self.retail.products.add(self.product)
+        self.product.units.add(self.entrepreneur)
+        run_debt_reset(DebtReset.objects.create(supplier=self.factory))
+        self.assertEqual(self.network_debt(self.factory), Decimal(0))
+        self.retail.products.remove(self.product)
+        self.product.price = 3
+        self.product.save()
+        self.product.units.remove(self.entrepreneur)
+        self.assertEqual(TradeUnit.objects.get(pk=self.retail.pk).debt, Decimal(0))
+        self.assertEqual(TradeUnit.objects.get(pk=self.entrepreneur.pk).debt, Decimal(0))
+        self.assertEqual(self.network_debt(self.factory), Decimal(0))
+        self.assert_network_debts_consistent()
+
+
+# ----------------------------------------------------------------
+class BulkImportTestCase(TestCase):
+    """
+    Tests of provider changes and products of bulk imported units
+    """
+    def setUp(self) -> None:
+        self.factory = TradeUnit.objects.create(title='Factory')
+        self.first = self.unit('First', 'first@example.com', debt=10)
+        self.second = self.unit('Second', 'second@example.com', debt=5)
+        self.product = Product.objects.create(title='Product', model='P', price=10)
+
+    def unit(self, title: str, email: str, debt: int = 0) -> TradeUnit:
+        return TradeUnit.objects.create(
+            title=title, provider=self.factory, unit_type=TradeUnit.UnitType.retail_network, debt=debt,
+            contact=Contact.objects.create(email=email)
+        )
+
+    def row(self, unit: TradeUnit | None, provider: TradeUnit, email: str = 'new@example.com') -> dict:
+        return {
+            'title': unit.title if unit else 'New', 'unit_type': TradeUnit.UnitType.retail_network,
+            'provider': provider.pk, 'contact': {'email': unit.contact.email if unit else email},
+            'products': [self.product.pk],
+        }
+
+    def path(self, unit: TradeUnit) -> str:
+        return TradeUnit.objects.values_list('path', flat=True).get(pk=unit.pk)
+
+    def test_rows_can_not_make_cycle(self) -> None:
+        results = list(TradeUnitBulkImporter(upsert=True).run([
+            self.row(self.first, self.second), self.row(self.second, self.first)
+        ]))
+        self.assertEqual(results[0]['status'], 'updated')
+        self.assertEqual(results[1]['errors'], {'provider': ['Provider can not be a consumer of the unit']})
+        self.assertEqual(self.path(self.first), f'{self.factory.pk}/{self.second.pk}/')
+        self.assertEqual(self.path(self.second), f'{self.factory.pk}/')
+        self.assertEqual(TradeUnit.objects.get(pk=self.second.pk).debt, Decimal(5))
+        self.assertEqual(TradeUnit.objects.get(pk=self.factory.pk).network_debt, Decimal(15))
+        self.assertEqual(TradeUnit.objects.get(pk=self.second.pk).network_debt, Decimal(10))
+
+    def test_new_unit_follows_provider_moved_in_batch(self) -> None:
+        results = list(TradeUnitBulkImporter(upsert=True).run([
+            self.row(None, self.first), self.row(self.first, self.second)
+        ]))
+        self.assertEqual([result['status'] for result in results], ['created', 'updated'])
+        new = TradeUnit.objects.get(pk=results[0]['id'])
+        self.assertEqual(new.path, f'{self.factory.pk}/{self.second.pk}/{self.first.pk}/')
+        self.assertEqual(new.level, 3)
+        self.assertEqual(TradeUnit.objects.get(pk=self.second.pk).network_debt, Decimal(20))
+
+    @override_settings(TRADE_UNIT_MAX_LEVEL=2)
+    def test_new_unit_under_moved_provider_respects_depth(self) -> None:
+        results = list(TradeUnitBulkImporter(upsert=True).run([
+            self.row(None, self.first), self.row(self.first, self.second)
+        ]))
+        self.assertEqual(results[0]['errors'], {'provider': ['Provider chain can not be deeper than 2 levels']})
+        self.assertEqual(results[1]['status'], 'updated')
+
+    def test_repeated_products_are_counted_once(self) -> None:
+        row = self.row(None, self.first)
+        row['products'] = [self.product.pk, self.product.pk]
+        unit = TradeUnit.objects.get(pk=list(TradeUnitBulkImporter().run([row]))[0]['id'])
+        self.assertEqual(unit.debt, Decimal(10))
+        self.assertEqual(list(unit.products.values_list('pk', flat=True)), [self.product.pk])
+
+
+# ----------------------------------------------------------------
+@override_settings(THROTTLE_ENABLED=False)
+class ProviderCycleTestCase(TestCase):
+    """
+    Tests of rejection of provider cycles and too deep provider chains and of scan of provider graph
+    """
+    def setUp(self) -> None:
+        self.factory = TradeUnit.objects.create(title='Factory')
+        self.retail = TradeUnit.objects.create(
+            title='Retail', provider=self.factory, unit_type=TradeUnit.UnitType.retail_network,
+            contact=Contact.objects.create(email='retail@example.com')
+        )
+        self.entrepreneur = TradeUnit.objects.create(
+            title='Entrepreneur', provider=self.retail, unit_type=TradeUnit.UnitType.entrepreneur
+        )
+        self.other_retail = TradeUnit.objects.create(
+            title='Other retail', provider=TradeUnit.objects.create(title='Other factory'),
+            unit_type=TradeUnit.UnitType.retail_network
+        )
+
+    def change_provider_in_admin(self, unit: TradeUnit, provider: TradeUnit) -> Any:
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+        return self.client.post(f'/admin/chain/tradeunit/{unit.pk}/change/', {
+            'title': unit.title, 'unit_type': unit.unit_type, 'debt': '0', 'provider': provider.pk,
+        })
+
+    def find_cycles(self) -> str:
+        output = StringIO()
+        call_command('find_cycles', stdout=output)
+        return output.getvalue()
+
+    @override_settings(TRADE_UNIT_MAX_LEVEL=2)
+    def test_api_rejects_too_deep_provider(self) -> None:
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('user', password='password'))
+        response = client.post('/api/retail/', {
+            'title': 'Unit', 'unit_type': TradeUnit.UnitType.entrepreneur, 'provider': self.entrepreneur.pk,
+            'contact': {'email': 'unit@example.com'}, 'products': [],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('provider', response.data)
+        self.assertFalse(TradeUnit.objects.filter(title='Unit').exists())
+
+    def test_admin_rejects_cycle(self) -> None:
+        response = self.change_provider_in_admin(self.retail, self.entrepreneur)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Provider can not be a consumer of the unit')
+        self.assertEqual(TradeUnit.objects.get(pk=self.retail.pk).provider_id, self.factory.pk)
+
+    @override_settings(TRADE_UNIT_MAX_LEVEL=2)
+    def test_admin_rejects_too_deep_move_of_subtree(self) -> None:
+        response = self.change_provider_in_admin(self.retail, self.other_retail)
+        self.assertContains(response, 'Provider chain can not be deeper than 2 levels')
+        self.assertEqual(TradeUnit.objects.get(pk=self.entrepreneur.pk).level, 2)
+
+    def test_save_rejects_cycle(self) -> None:
+        self.retail.provider = self.entrepreneur
+        with self.assertRaises(ValueError):
+            self.retail.save()
+        self.assertEqual(TradeUnit.objects.get(pk=self.retail.pk).path, f'{self.factory.pk}/')
+
+    @override_settings(TRADE_UNIT_MAX_LEVEL=2)
+    def test_bulk_rejects_too_deep_move_of_subtree(self) -> None:
+        results = list(TradeUnitBulkImporter(upsert=True).run([{
+            'title': 'Retail', 'unit_type': TradeUnit.UnitType.retail_network, 'provider': self.other_retail.pk,
+            'products': [], 'contact': {'email': 'retail@example.com'},
+        }]))
+        self.retail.refresh_from_db()
+        self.assertIn('errors', results[0])
+        self.assertEqual(self.retail.provider_id, self.factory.pk)
+
+    def test_find_cycles_passes_consistent_graph(self) -> None:
+        self.assertIn('Provider graph is consistent', self.find_cycles())
+
+    def test_find_cycles_reports_cycle(self) -> None:
+        TradeUnit.objects.filter(pk=self.retail.pk).update(provider=self.entrepreneur)
+        with self.assertRaises(CommandError):
+            self.find_cycles()
+        cycles = Command.find_cycles(dict(TradeUnit.objects.exclude(provider=None).values_list('pk', 'provider_id')))
+        self.assertEqual([sorted(cycle) for cycle in cycles], [[self.retail.pk, self.entrepreneur.pk]])
+
+    @override_settings(TRADE_UNIT_MAX_LEVEL=1)
+    def test_find_cycles_reports_too_deep_units(self) -> None:
+        with self.assertRaises(CommandError):
+            self.find_cycles()
+
+
+# ----------------------------------------------------------------
+class CompactRetailSerializerTestCase(TestCase):
+    """
+    Tests of output of compact serializer against RetailSerializer
+    """
+    def setUp(self) -> None:
+        products = [
+            Product.objects.create(title='Product', model='P', price=Decimal('7.50'), release='2023-01-02'),
+            Product.objects.create(title='Free', model='F', price=None, release=None),
+        ]
+        factory = TradeUnit.objects.create(
+            title='Factory', contact=Contact.objects.create(email='factory@example.com', country='NL', city='Delft')
+        )
+        factory.products.set(products)
+        retail = TradeUnit.objects.create(
+            title='Retail', provider=factory, unit_type=TradeUnit.UnitType.retail_network, debt=Decimal('0.10')
+        )
+        retail.products.set(products[:1])
+        TradeUnit.objects.create(
+            title='Entrepreneur', provider=retail, unit_type=TradeUnit.UnitType.entrepreneur, debt=None,
+            contact=Contact.objects.create(email='entrepreneur@example.com')
+        )
+
+    def render(self, serializer: CompactRetailSerializer) -> bytes:
+        return JSONRenderer().render(serializer.serialize(TradeUnit.objects.order_by('pk').values(*serializer.columns)))
+
+    def expected(self, fields: list[str] | None = None, flat: bool = False) -> bytes:
+        def select(data: dict) -> dict:
+            selected = {}
+            for name, value in data.items():
+                if fields is not None and name not in fields:
+                    continue
+                if name == 'provider' and flat:
+                    selected['provider_id'] = value['id'] if value else None
+                else:
+                    selected[name] = select(value) if name == 'provider' and value else value
+            return selected
+
+        units = RetailSerializer(TradeUnit.objects.order_by('pk'), many=True).data
+        return JSONRenderer().render([select(unit) for unit in units])
+
+    def test_default_output_is_identical(self) -> None:
+        self.assertEqual(self.render(CompactRetailSerializer()), self.expected())
+
+    def test_selected_fields_are_identical(self) -> None:
+        fields = ['id', 'title', 'contact', 'provider', 'debt']
+        self.assertEqual(self.render(CompactRetailSerializer(fields=fields)), self.expected(fields))
+
+    def test_flat_output_is_identical(self) -> None:
+        self.assertEqual(self.render(CompactRetailSerializer(flat=True)), self.expected(flat=True))
+        fields = ['id', 'products', 'provider_id']
+        self.assertEqual(
+            self.render(CompactRetailSerializer(fields=fields, flat=True)),
+            self.expected(['id', 'products', 'provider'], flat=True)
+        )
+
+
+# ----------------------------------------------------------------
+class RetailCacheTestCase(TestCase):
+    """
+    Tests of clearing cached retail responses
+    """
+    def test_clear_evicts_responses_only(self) -> None:
+        retail_cache.set_unit(retail_cache.get_unit(1, 1), {'id': 1})
+        self.assertEqual(retail_cache.get_unit(1, 1).data, {'id': 1})
+        retail_cache.cache.set('foreign', 'kept')
+        retail_cache.clear()
+        self.assertIsNone(retail_cache.get_unit(1, 1).data)
+        self.assertEqual(retail_cache.cache.get('foreign'), 'kept')
+
+    def test_new_version_misses_cached_unit(self) -> None:
+        retail_cache.set_unit(retail_cache.get_unit(1, 1), {'id': 1})
+        self.assertIsNone(retail_cache.get_unit(1, 2).data)
+
+
+# ----------------------------------------------------------------
+@override_settings(THROTTLE_ENABLED=False)
+class ConditionalRetrieveTestCase(TestCase):
+    """
+    Tests of conditional retrieve of units by ETag
+    """
+    def setUp(self) -> None:
+        retail_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('user', password='password'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.unit = TradeUnit.objects.create(title='A')
+        self.url = f'/api/retail/{self.unit.pk}/'
+
+    def test_not_modified(self) -> None:
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_modified_after_change(self) -> None:
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'title': 'B'}, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'B')
+
+    def test_modified_after_stale_save(self) -> None:
+        stale = TradeUnit.objects.get(pk=self.unit.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'title': 'B'}, format='json')
+        etag = self.client.get(self.url)['ETag']
+        stale.title = 'B-new'
+        with self.captureOnCommitCallbacks(execute=True):
+            stale.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'B-new')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_change_missed_by_cache_is_not_served(self) -> None:
+        self.client.get(self.url)
+        # change made by another process: version is increased, but this process keeps its cache entries
+        TradeUnit.objects.filter(pk=self.unit.pk).update(title='B', version=F('version') + 1)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['title'], 'B')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+# ----------------------------------------------------------------
+@override_settings(THROTTLE_ENABLED=False)
+class PendingChangesTestCase(TestCase):
+    """
+    Tests of changes of units registered once per transaction
+    """
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('user', password='password'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider = TradeUnit.objects.create(title='Provider')
+            self.product = Product.objects.create(title='Product', model='P', price=3)
+
+    def changes(self, unit_id: int) -> list[str]:
+        return list(TradeUnitChange.objects.filter(unit_id=unit_id).values_list('action', flat=True))
+
+    def test_create_registers_one_change(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/retail/', {
+                'title': 'Unit', 'unit_type': TradeUnit.UnitType.retail_network, 'provider': self.provider.pk,
+                'contact': {'email': 'unit@example.com'}, 'products': [self.product.pk],
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.changes(response.data['id']), [TradeUnitChange.Action.created])
+        self.assertEqual(TradeUnit.objects.get(pk=response.data['id']).version, 2)
+
+    def test_versions_are_increased_inside_transaction(self) -> None:
+        with transaction.atomic():
+            self.provider.title = 'Renamed'
+            self.provider.save()
+            self.product.units.add(self.provider)
+            self.assertEqual(TradeUnit.objects.get(pk=self.provider.pk).version, 3)
+            self.assertEqual(
+                self.changes(self.provider.pk), [TradeUnitChange.Action.created, TradeUnitChange.Action.updated]
+            )
+
+    def test_rolled_back_savepoint_does_not_hide_later_change(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.product.units.add(self.provider)
+            with self.assertRaises(ValueError), transaction.atomic():
+                TradeUnit.objects.get(pk=self.provider.pk).delete()
+                raise ValueError
+            pk = self.provider.pk
+            self.provider.delete()
+        self.assertEqual(self.changes(pk), [
+            TradeUnitChange.Action.created, TradeUnitChange.Action.updated, TradeUnitChange.Action.deleted
+        ])
+
+    def test_rolled_back_changes_are_not_registered(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError), transaction.atomic():
+                self.provider.title = 'Rolled back'
+                self.provider.save()
+                raise ValueError
+            self.product.units.add(self.provider)
+        self.assertEqual(
+            self.changes(self.provider.pk), [TradeUnitChange.Action.created, TradeUnitChange.Action.updated]
+        )
+
+
+# ----------------------------------------------------------------
+class DebtResetScopeTestCase(TestCase):
+    """
+    Tests of scope of debt resets
+    """
+    def setUp(self) -> None:
+        self.supplier = TradeUnit.objects.create(title='Supplier')
+        self.consumer = TradeUnit.objects.create(
+            title='Consumer', provider=self.supplier, unit_type=TradeUnit.UnitType.retail_network, debt=10
+        )
+        self.other = TradeUnit.objects.create(title='Other', debt=5)
+
+    def test_scope_is_required(self) -> None:
+        with self.assertRaises(ValidationError):
+            DebtReset(chunk_size=100).full_clean()
+
+    def test_job_without_scope_fails(self) -> None:
+        job = run_debt_reset(DebtReset.objects.create())
+        self.assertEqual(job.status, DebtReset.Status.failed)
+        self.assertEqual(TradeUnit.objects.get(pk=self.other.pk).debt, Decimal(5))
+
+    def test_job_of_deleted_supplier_fails(self) -> None:
+        job = DebtReset.objects.create(supplier=self.supplier)
+        self.supplier.delete()
+        job = run_debt_reset(DebtReset.objects.get(pk=job.pk))
+        self.assertEqual(job.status, DebtReset.Status.failed)
+        self.assertEqual(TradeUnit.objects.get(pk=self.consumer.pk).debt, Decimal(10))
+        self.assertEqual(TradeUnit.objects.get(pk=self.other.pk).debt, Decimal(5))
+
+    def test_job_resets_downstream_network(self) -> None:
+        job = run_debt_reset(DebtReset.objects.create(supplier=self.supplier))
+        self.assertEqual(job.status, DebtReset.Status.done)
+        self.assertEqual(TradeUnit.objects.get(pk=self.consumer.pk).debt, Decimal(0))
+        self.assertEqual(TradeUnit.objects.get(pk=self.other.pk).debt, Decimal(5))
+
+    def test_admin_form_requires_scope(self) -> None:
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+        response = self.client.post('/admin/chain/debtreset/add/', {'units': '', 'chunk_size': 1000})
+        self.assertContains(response, 'Supplier or units are required')
+        self.assertFalse(DebtReset.objects.exists())
+
+    @override_settings(DEBT_RESET_ASYNC=False, THROTTLE_ENABLED=False)
+    def test_api_caps_units(self) -> None:
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser('admin', password='password'))
+        with patch.object(DebtReset, 'max_units', 2):
+            response = client.post('/api/debt-resets/', {'units': [1, 2, 3]}, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('units', response.data)
+            response = client.post(
+                '/api/debt-resets/', {'units': [self.other.pk, self.consumer.pk], 'chunk_size': 1}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        job = DebtReset.objects.get(pk=response.data['id'])
+        self.assertEqual((job.status, job.processed, job.last_pk), (DebtReset.Status.done, 2, self.other.pk))
+        self.assertEqual(TradeUnit.objects.get(pk=self.other.pk).debt, Decimal(0))
+
+    @override_settings(DEBT_RESET_ASYNC=False)
+    def test_admin_action_caps_selection(self) -> None:
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+        with patch.object(RetailAdmin, 'reset_debt_max_units', 2):
+            self.client.post('/admin/chain/tradeunit/', {
+                'action': 'reset_debt', '_selected_action': [self.supplier.pk, self.consumer.pk, self.other.pk]
+            })
+        self.assertFalse(DebtReset.objects.exists())
+
+
+# ----------------------------------------------------------------
+@override_settings(THROTTLE_ENABLED=False)
+class RetailListTestCase(TestCase):
+    """
+    Tests of keyset pagination by every ordering field (with empty and repeated values) and of filters of units
+    """
+    def setUp(self) -> None:
+        retail_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('user', password='password'))
+        self.factories = [
+            TradeUnit.objects.create(
+                title=f'Factory {number}',
+                contact=Contact.objects.create(email=f'factory{number}@example.com', country=country, city=city)
+            ) for number, (country, city) in enumerate([('NL', 'Delft'), ('DE', 'Berlin')])
+        ]
+        self.retail = [
+            TradeUnit.objects.create(
+                title='ABC'[number % 3], provider=self.factories[number % 2], debt=debt,
+                unit_type=TradeUnit.UnitType.retail_network
+            ) for number, debt in enumerate([10, None, 5, 10, None, 5])
+        ]
+        self.entrepreneurs = [
+            TradeUnit.objects.create(
+                title='AB'[number % 2], provider=self.retail[number], debt=debt,
+                unit_type=TradeUnit.UnitType.entrepreneur
+            ) for number, debt in enumerate([None, 10, 0, 10])
+        ]
+        self.product = Product.objects.create(title='Product', model='P', price=0)
+        self.product.units.add(self.retail[0], self.entrepreneurs[1])
+
+    def pages(self, url: str, direction: str = 'next') -> list[list[int]]:
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([unit['id'] for unit in response.data['results']])
+            url = response.data[direction]
+        return pages
+
+    def ids(self, **params: Any) -> list[int]:
+        return [pk for page in self.pages(f'/api/retail/?{urlencode({"page_size": 1000, **params})}') for pk in page]
+
+    def test_pages_follow_every_ordering_both_ways(self) -> None:
+        for field in RetailCursorPagination.ordering_fields:
+            rows = TradeUnit.objects.values_list(field, 'id')
+            ascending = [pk for _, pk in sorted(rows, key=lambda row: (row[0] is None, row[0] or 0, row[1]))]
+            for ordering, expected in ((field, ascending), (f'-{field}', ascending[::-1])):
+                with self.subTest(ordering=ordering):
+                    forward = self.pages(f'/api/retail/?ordering={ordering}&page_size=3')
+                    self.assertEqual([pk for page in forward for pk in page], expected)
+                    last_page = f'/api/retail/?ordering={ordering}&page_size=3'
+                    for _ in forward[1:]:
+                        last_page = self.client.get(last_page).data['next']
+                    backward = self.pages(last_page, 'previous')
+                    self.assertEqual([pk for page in reversed(backward) for pk in page], expected)
+
+    def test_filters(self) -> None:
+        units = {unit.pk: unit for unit in TradeUnit.objects.select_related('contact')}
+        expected = {
+            'city': ('Delft', lambda unit: unit.contact is not None and unit.contact.city == 'Delft'),
+            'country': ('DE', lambda unit: unit.contact is not None and unit.contact.country == 'DE'),
+            'unit_type': (
+                TradeUnit.UnitType.entrepreneur, lambda unit: unit.unit_type == TradeUnit.UnitType.entrepreneur
+            ),
+            'level_min': (1, lambda unit: unit.level >= 1),
+            'level_max': (1, lambda unit: unit.level <= 1),
+            'debt_min': (5, lambda unit: unit.debt is not None and unit.debt >= 5),
+            'debt_max': (5, lambda unit: unit.debt is not None and unit.debt <= 5),
+            'provider': (self.retail[1].pk, lambda unit: unit.provider_id == self.retail[1].pk),
+            'supplier': (self.factories[0].pk, lambda unit: self.factories[0].pk in unit.ancestor_ids),
+            'product': (self.product.pk, lambda unit: unit.pk in (self.retail[0].pk, self.entrepreneurs[1].pk)),
+        }
+        for name, (value, matches) in expected.items():
+            with self.subTest(filter=name):
+                ids = self.ids(**{name: value})
+                self.assertTrue(ids)
+                self.assertEqual(sorted(ids), [pk for pk, unit in units.items() if matches(unit)])
+        self.assertEqual(
+            self.ids(supplier=self.factories[0].pk, ordering='-debt', debt_min=5),
+            [pk for pk in self.ids(ordering='-debt') if pk in self.ids(supplier=self.factories[0].pk, debt_min=5)]
+        )
+
+
+# ----------------------------------------------------------------
+@override_settings(THROTTLE_ENABLED=False)
+class AsyncRetailListTestCase(TestCase):
+    """
+    Tests of filters of asynchronous list of units
+    """
+    def setUp(self) -> None:
+        self.supplier = TradeUnit.objects.create(title='Supplier')
+        self.consumer = TradeUnit.objects.create(
+            title='Consumer', provider=self.supplier, unit_type=TradeUnit.UnitType.retail_network
+        )
+        self.other = TradeUnit.objects.create(title='Other')
+        self.async_client = AsyncClient()
+        self.async_client.force_login(User.objects.create_user('user', password='password'))
+
+    async def test_supplier_filter(self) -> None:
+        response = await self.async_client.get(f'/api/async/retail/?supplier={self.supplier.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([unit['id'] for unit in response.json()['results']], [self.consumer.pk])
+
+    async def test_unauthenticated_request_gets_401(self) -> None:
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Token invalid'}):
+            response = await AsyncClient().get('/api/async/retail/', **headers)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response['WWW-Authenticate'], 'Token')
+            sync_response = self.client.get('/api/retail/', **headers)
+            self.assertEqual((sync_response.status_code, sync_response['WWW-Authenticate']), (401, 'Token'))
+
+    async def test_export_is_streamed_asynchronously(self) -> None:
+        response = await self.async_client.get('/api/retail/export/')
+        self.assertTrue(response.is_async)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines], [self.supplier.pk, self.consumer.pk, self.other.pk]
+        )
+
+    async def test_unknown_supplier_filter(self) -> None:
+        response = await self.async_client.get('/api/async/retail/?supplier=100000')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+
+# ----------------------------------------------------------------
+@override_settings(THROTTLE_ENABLED=False, STATS_REFRESH_ASYNC=True, STATS_TOP_DEBTORS=2)
+class NetworkStatsTestCase(TestCase):
+    """
+    Tests of network statistics served without computing them on request
+    """
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('user', password='password'))
+        self.factory = TradeUnit.objects.create(title='Factory')
+        self.units = [
+            TradeUnit.objects.create(
+                title=f'Unit {debt}', provider=self.factory, unit_type=TradeUnit.UnitType.retail_network, debt=debt
+            ) for debt in (5, 20, 10, 0)
+        ]
+
+    def test_first_request_starts_refresh_in_background(self) -> None:
+        with patch('chain.stats.start_stats_refresh') as start, patch('chain.stats.refresh_stats') as refresh:
+            response = self.client.get('/api/retail/stats/')
+        self.assertEqual(response.status_code, 202)
+        start.assert_called_once()
+        refresh.assert_not_called()
+        self.assertEqual(
+            [debtor['id'] for debtor in response.data['top_debtors']], [self.units[1].pk, self.units[2].pk]
+        )
+
+    def test_snapshot_is_served(self) -> None:
+        refresh_stats()
+        response = self.client.get(f'/api/retail/stats/?supplier={self.factory.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total']['units'], 5)
+        self.assertEqual(response.data['top_debtors'], top_debtors(2))
+
+
+# ----------------------------------------------------------------
+@override_settings(
+    THROTTLE_ENABLED=True, THROTTLE_USER_RATE='10/60', THROTTLE_ENDPOINT_RATE='10/60',
+    THROTTLE_MAX_CONCURRENT_PER_CLIENT=1
+)
+class AdmissionTestCase(TestCase):
+    """
+    Tests of throttling and caps of concurrent requests
+    """
+    def setUp(self) -> None:
+        bucket_store.cache_clear()
+        self.unit = TradeUnit.objects.create(title='Unit')
+        self.user = User.objects.create_user('admitted', password='password')
+        self.client.force_login(self.user)
+        self.async_client = AsyncClient()
+        self.async_client.force_login(self.user)
+
+    @override_settings(THROTTLE_USER_RATE='1000/60', THROTTLE_ENDPOINT_RATE='1000/60')
+    def test_streaming_response_keeps_slot(self) -> None:
+        response = self.client.get('/api/retail/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f'/api/retail/{self.unit.pk}/').status_code, 429)
+        b''.join(response.streaming_content)
+        self.assertEqual(self.client.get(f'/api/retail/{self.unit.pk}/').status_code, 200)
+
+    @override_settings(THROTTLE_ANON_RATE='2/60')
+    def test_forwarded_address_does_not_change_anonymous_client(self) -> None:
+        self.client.logout()
+        statuses = [
+            self.client.post(
+                '/api/user/token/', {'username': 'admitted', 'password': 'wrong'},
+                content_type='application/json', HTTP_X_FORWARDED_FOR=f'10.0.0.{number}'
+            ).status_code for number in range(3)
+        ]
+        self.assertEqual(statuses[-1], 429)
+
+    async def test_async_list_is_throttled(self) -> None:
+        for _ in range(2):
+            self.assertEqual((await self.async_client.get('/api/async/retail/')).status_code, 200)
+        response = await self.async_client.get('/api/async/retail/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+
+    async def test_async_detail_is_throttled(self) -> None:
+        await self.async_client.get('/api/async/retail/?page_size=1000')
+        response = await self.async_client.get(f'/api/async/retail/{self.unit.pk}/')
+        self.assertEqual(response.status_code, 429)
@@ -1,13 +1,45 @@
-from typing import Type
+import hashlib
+import json
+from itertools import islice
+from typing import AsyncIterator, Iterable, Iterator, Type
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpRequest, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
-from drf_spectacular.utils import extend_schema, extend_schema_view
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.viewsets import ModelViewSet
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, Throttled, ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.mixins import CreateModelMixin, ListModelMixin, RetrieveModelMixin
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
+from chain.bulk import TradeUnitBulkImporter
+from chain.cache import retail_cache
+from chain.compact import CompactRetailSerializer
 from chain.filters import RetailCountryFilter
-from chain.models import TradeUnit
-from chain.serializers import RetailSerializer, RetailCreateSerializer
+from chain.models import DebtReset, Product, TradeUnit, TradeUnitChange
+from chain.pagination import AncestorsCursorPagination, ProductCursorPagination, RetailCursorPagination
+from chain.pricing import update_product_prices
+from chain.search import search_units
+from chain.stats import current_stats, top_debtors
+from chain.serializers import (
+    DebtResetSerializer, ProductPriceListSerializer, ProductPriceSerializer, ProductSerializer, RetailSerializer,
+    RetailCreateSerializer, RetailImportSerializer, TradeUnitChangeSerializer
+)
+from chain.tasks import start_debt_reset
+from core.authentication import SignedTokenAuthentication
+from core.models import User
+from trading_network.throttling import TokenBucketThrottle
 
 
 # ----------------------------------------------------------------
@@ -18,12 +50,28 @@ from chain.serializers import RetailSerializer, RetailCreateSerializer
         summary="Add Retail Network"
     ),
     retrieve=extend_schema(
-        description="Get one Retail Network",
-        summary="Get Retail Network"
+        description="Get one Retail Network (ETag and Last-Modified change with the unit or any of its providers, "
+                    "If-None-Match and If-Modified-Since requests are answered with 304)",
+        summary="Get Retail Network",
+        parameters=[
+            OpenApiParameter('fields', str, description='Comma separated names of returned fields'),
+            OpenApiParameter('flat', bool, description='Return provider_id instead of nested provider chain'),
+        ]
     ),
     list=extend_schema(
-        description="Get list of Retail Networks",
-        summary="Get all Retail Networks"
+        description="Get list of Retail Networks (cursor pagination by id or by ordering field)",
+        summary="Get all Retail Networks",
+        parameters=[
+            OpenApiParameter('ordering', str, enum=['id', '-id', 'debt', '-debt', 'level', '-level', 'title', '-title'],
+                             description='Ordering field (- for descending order)'),
+            OpenApiParameter('fields', str, description='Comma separated names of returned fields'),
+            OpenApiParameter('flat', bool, description='Return provider_id instead of nested provider chain'),
+        ]
+    ),
+    export=extend_schema(
+        description="Stream all (filtered) Retail Networks as NDJSON with constant memory",
+        summary="Export Retail Networks",
+        responses={200: RetailSerializer(many=True)}
     ),
     update=extend_schema(
         description="Full update of Retail Network",
@@ -37,6 +85,64 @@ from chain.serializers import RetailSerializer, RetailCreateSerializer
         description="Delete Retail Network",
         summary="Delete Retail Network"
     ),
+    search=extend_schema(
+        description="Find Retail Networks by partial title, contact email, country, city "
+                    "or title/model of products, best matches first",
+        summary="Search Retail Networks",
+        parameters=[
+            OpenApiParameter('q', str, required=True, description='Search query'),
+            OpenApiParameter('limit', int, description='Number of returned units (20 by default, 100 at most)'),
+            OpenApiParameter('fields', str, description='Comma separated names of returned fields'),
+            OpenApiParameter('flat', bool, description='Return provider_id instead of nested provider chain'),
+        ]
+    ),
+    ancestors=extend_schema(
+        description="Get flat list of providers of Retail Network from the nearest one up to the factory "
+                    "(?depth= limits number of levels)",
+        summary="Get providers of Retail Network",
+        parameters=[
+            OpenApiParameter('depth', int, description='Maximal number of levels above the unit'),
+            OpenApiParameter('fields', str, description='Comma separated names of returned fields'),
+        ]
+    ),
+    descendants=extend_schema(
+        description="Get flat list of downstream network of Retail Network (?depth= limits number of levels)",
+        summary="Get downstream network of Retail Network",
+        parameters=[
+            OpenApiParameter('depth', int, description='Maximal number of levels below the unit'),
+            OpenApiParameter('fields', str, description='Comma separated names of returned fields'),
+        ]
+    ),
+    changes=extend_schema(
+        description="Get changes of Retail Networks (created, updated, deleted) after cursor ?since= in order "
+                    "of occurrence. Pass returned next as since of the following request until has_more is false",
+        summary="Get change feed of Retail Networks",
+        parameters=[
+            OpenApiParameter('since', int, description='Id of the last received change (0 by default)'),
+            OpenApiParameter('limit', int, description='Number of returned changes (100 by default, 1000 at most)'),
+        ],
+        responses={200: TradeUnitChangeSerializer(many=True)}
+    ),
+    stats=extend_schema(
+        description="Get precomputed numbers of units and debts by country, city, unit type and level and units "
+                    "with the largest debts in the whole network (or in downstream network of ?supplier=)",
+        summary="Retail Network statistics",
+        parameters=[OpenApiParameter('supplier', int, description='Id of unit whose top debtors are returned')],
+        responses={200: None}
+    ),
+    cache_stats=extend_schema(
+        description="Get numbers of cache hits and misses of retail responses (admin only)",
+        summary="Retail cache statistics",
+        responses={200: None}
+    ),
+    bulk=extend_schema(
+        description="Create (or update by contact email with upsert=true) Retail Networks in batches. "
+                    "Result of every row is streamed back as a line of NDJSON",
+        summary="Bulk import Retail Networks",
+        request=RetailImportSerializer(many=True),
+        responses={200: None},
+        parameters=[OpenApiParameter('upsert', bool, description='Update units with existing contact email')]
+    ),
 )
 class RetailViewSet(ModelViewSet):
     """
@@ -49,6 +155,13 @@ class RetailViewSet(ModelViewSet):
         - permission_classes: defines permissions for this APIView
         - filter_backends: defines collection of filtering options for list action
         - filterset_class: defines filterset class
+        - pagination_class: defines keyset pagination for list action
+        - export_chunk_size: defines number of units fetched from server-side cursor at once by export action
+        - search_limit: defines default number of units found by search action
+        - max_search_limit: defines upper bound of number of units found by search action
+        - changes_limit: defines default number of changes returned by changes action
+        - max_changes_limit: defines upper bound of number of changes returned by changes action
+        - throttle_costs: defines cost of request by action charged by throttling
     """
     queryset = TradeUnit.objects.all()
     default_serializer = RetailSerializer
@@ -58,6 +171,27 @@ class RetailViewSet(ModelViewSet):
     permission_classes: list = [IsAuthenticated]
     filter_backends: list = [DjangoFilterBackend]
     filterset_class: list = RetailCountryFilter
+    pagination_class = RetailCursorPagination
+    export_chunk_size: int = 1000
+    search_limit: int = 20
+    max_search_limit: int = 100
+    changes_limit: int = 100
+    max_changes_limit: int = 1000
+    throttle_costs: dict = {
+        'retrieve': 1,
+        'list': 5,
+        'search': 3,
+        'ancestors': 2,
+        'descendants': 5,
+        'changes': 2,
+        'stats': 2,
+        'create': 2,
+        'update': 2,
+        'partial_update': 2,
+        'destroy': 2,
+        'export': 50,
+        'bulk': 50,
+    }
 
     def get_serializer_class(self) -> Type[RetailSerializer | RetailCreateSerializer]:
         """
@@ -68,3 +202,510 @@ class RetailViewSet(ModelViewSet):
             - RetailCreateSerializer if action is 'create'
         """
         return self.serializers.get(self.action, self.default_serializer)
+
+    def perform_update(self, serializer: RetailSerializer) -> None:
+        """
+        Redefined method to save unit with its products in one transaction (changes are registered once)
+        """
+        with transaction.atomic():
+            serializer.save()
+
+    def throttle_cost(self, request: Request) -> int:
+        """
+        Method to get cost of request charged by throttling: cost of action grows with every started
+        hundred of units per page and is doubled for nested provider chains
+
+        Returns:
+            - cost of request in tokens
+        """
+        cost = self.throttle_costs.get(self.action, 1)
+        params = request.query_params
+        if self.action in ('list', 'ancestors', 'descendants'):
+            page_size = params.get(self.paginator.page_size_query_param, '')
+            if page_size.isdigit():
+                cost *= max(1, -(-min(int(page_size), self.paginator.max_page_size) // 100))
+        fields = params.get('fields')
+        if (
+            self.action in ('list', 'retrieve', 'search') and params.get('flat') not in ('true', '1')
+            and (not fields or 'provider' in fields.split(','))
+        ):
+            cost *= 2
+        return cost
+
+    def list(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Redefined method to serve list pages from cache (keyed by query parameters)
+        or to serialize them from values() rows by compact serializer
+        """
+        data, key = retail_cache.get_list(request.GET.urlencode())
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+        serializer = CompactRetailSerializer.from_params(request.query_params)
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()).values(*serializer.columns))
+        response = self.get_paginated_response(serializer.serialize(page))
+        retail_cache.set_list(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def retrieve(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Redefined method to answer conditional requests by version of unit (read by primary key)
+        with 304, to serve units from cache (evicted on change of unit or any of its providers)
+        or to serialize them from values() rows by compact serializer
+        """
+        serializer = CompactRetailSerializer.from_params(request.query_params)
+        version, modified = get_object_or_404(
+            self.filter_queryset(self.get_queryset()).values_list('version', 'modified'), pk=kwargs[self.lookup_field]
+        )
+        variant = f'{request.GET.urlencode()}:{request.accepted_renderer.format}'
+        headers = {
+            'ETag': f'"{kwargs[self.lookup_field]}-{version}-{hashlib.md5(variant.encode()).hexdigest()[:12]}"',
+            'Last-Modified': http_date(modified.timestamp()),
+        }
+        not_modified = get_conditional_response(
+            request, etag=headers['ETag'], last_modified=int(modified.timestamp())
+        )
+        if not_modified is not None:
+            return Response(status=not_modified.status_code, headers=headers)
+        lookup = retail_cache.get_unit(kwargs[self.lookup_field], version, variant=request.GET.urlencode())
+        if lookup.data is not None:
+            return Response(lookup.data, headers={**headers, 'X-Cache': 'HIT'})
+        row = get_object_or_404(
+            self.filter_queryset(self.get_queryset()).values(*serializer.columns), pk=kwargs[self.lookup_field]
+        )
+        data = serializer.serialize([row])[0]
+        retail_cache.set_unit(lookup, data)
+        return Response(data, headers={**headers, 'X-Cache': 'MISS'})
+
+    @action(detail=False, methods=['get'])
+    def search(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Method to find units by partial title, contact or products ordered by rank
+
+        Returns:
+            - Response: dictionary with the best matching serialized units
+
+        Raises:
+            - ValidationError (in case of empty query or incorrect limit)
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ['This parameter is required.']})
+        limit = request.query_params.get('limit', str(self.search_limit))
+        if not limit.isdigit() or not 1 <= int(limit) <= self.max_search_limit:
+            raise ValidationError({'limit': [f'Limit must be an integer from 1 to {self.max_search_limit}.']})
+        data, key = retail_cache.get_list(f'search:{request.GET.urlencode()}')
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+        serializer = CompactRetailSerializer.from_params(request.query_params)
+        queryset = search_units(self.filter_queryset(self.get_queryset()), query)
+        data = {'results': serializer.serialize(queryset.values(*serializer.columns)[:int(limit)])}
+        retail_cache.set_list(key, data)
+        return Response(data, headers={'X-Cache': 'MISS'})
+
+    @action(detail=True, methods=['get'], pagination_class=AncestorsCursorPagination)
+    def ancestors(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Method to get flat list of providers of unit from the nearest one up to the factory
+        """
+        return self.network(request, 'ancestors')
+
+    @action(detail=True, methods=['get'])
+    def descendants(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Method to get flat list of downstream network of unit
+        """
+        return self.network(request, 'descendants')
+
+    def network(self, request: Request, relation: str) -> Response:
+        """
+        Method to serve page of ancestors or descendants of unit: path of the unit is read by primary key,
+        then the page is fetched by one indexed lookup (by primary keys or by path prefix)
+        limited by ?depth=<number of levels>
+
+        Returns:
+            - Response: page of flat serialized units
+
+        Raises:
+            - ValidationError (in case of depth is not a positive integer)
+        """
+        depth = request.query_params.get('depth')
+        if depth is not None and (not depth.isdigit() or int(depth) < 1):
+            raise ValidationError({'depth': ['Depth must be a positive integer.']})
+        data, key = retail_cache.get_list(f'{relation}:{self.kwargs[self.lookup_field]}:{request.GET.urlencode()}')
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+        unit = get_object_or_404(self.get_queryset().only('path', 'level'), pk=self.kwargs[self.lookup_field])
+        queryset = getattr(TradeUnit.objects, relation)(unit)
+        if depth is not None:
+            if relation == 'ancestors':
+                queryset = queryset.filter(level__gte=unit.level - int(depth))
+            else:
+                queryset = queryset.filter(level__lte=unit.level + int(depth))
+        serializer = CompactRetailSerializer.from_params(request.query_params, flat=True)
+        page = self.paginate_queryset(queryset.values(*serializer.columns))
+        response = self.get_paginated_response(serializer.serialize(page))
+        retail_cache.set_list(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Method to get page of change log after cursor (id of the last received change) by one indexed
+        lookup by primary key, so cost of request does not depend on size of the log
+
+        Returns:
+            - Response: dictionary with cursor of the following request and serialized changes
+
+        Raises:
+            - ValidationError (in case of incorrect since or limit)
+        """
+        since = request.query_params.get('since', '0')
+        if not since.isdigit():
+            raise ValidationError({'since': ['Since must be a non-negative integer.']})
+        limit = request.query_params.get('limit', str(self.changes_limit))
+        if not limit.isdigit() or not 1 <= int(limit) <= self.max_changes_limit:
+            raise ValidationError({'limit': [f'Limit must be an integer from 1 to {self.max_changes_limit}.']})
+        rows = list(
+            TradeUnitChange.objects.filter(pk__gt=int(since)).order_by('pk').values(
+                *TradeUnitChangeSerializer.Meta.fields
+            )[:int(limit) + 1]
+        )
+        has_more = len(rows) > int(limit)
+        rows = rows[:int(limit)]
+        return Response({
+            'since': int(since),
+            'next': rows[-1]['id'] if rows else int(since),
+            'has_more': has_more,
+            'results': TradeUnitChangeSerializer(rows, many=True).data,
+        })
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Method to get the latest snapshot of network statistics with top debtors of supplier
+        (read by primary key and one indexed lookup, no units are scanned), 202 is answered while
+        the first snapshot is computed (with top debtors of the whole network read by index)
+
+        Returns:
+            - Response: dictionary with statistics
+
+        Raises:
+            - ValidationError (in case of supplier is not a positive integer)
+        """
+        supplier = request.query_params.get('supplier')
+        if supplier is not None and (not supplier.isdigit() or int(supplier) < 1):
+            raise ValidationError({'supplier': ['Supplier must be a positive integer.']})
+        stats, stale = current_stats()
+        if stats is None:
+            return Response({
+                'detail': 'Statistics are being computed.',
+                'stale': stale,
+                'top_debtors': [] if supplier else top_debtors(getattr(settings, 'STATS_TOP_DEBTORS', 10)),
+            }, status=202, headers={'Retry-After': '5'})
+        debtors = stats.top_debtors.filter(supplier_id=int(supplier) if supplier else None).values_list(
+            'debtors', flat=True
+        ).first()
+        return Response({
+            'refreshed': stats.created,
+            'last_change': stats.last_change,
+            'stale': stale,
+            **stats.summary,
+            'top_debtors': debtors or [],
+        })
+
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAdminUser])
+    def cache_stats(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Method to get numbers of cache hits and misses
+        """
+        return Response(retail_cache.stats())
+
+    @action(detail=False, methods=['get'])
+    def export(self, request: Request, *args: tuple, **kwargs: dict) -> StreamingHttpResponse:
+        """
+        Method to stream filtered units one JSON line per unit
+
+        Returns:
+            - StreamingHttpResponse: NDJSON with serialized units
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by('pk')
+        return ndjson_response(request, self.stream(queryset))
+
+    def stream(self, queryset) -> Iterator[str]:
+        """
+        Method to serialize units chunk by chunk iterating queryset with server-side cursor
+        """
+        units = queryset.iterator(chunk_size=self.export_chunk_size)
+        while chunk := list(islice(units, self.export_chunk_size)):
+            for data in self.get_serializer(chunk, many=True).data:
+                yield json.dumps(data, cls=JSONEncoder) + '\n'
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request: Request, *args: tuple, **kwargs: dict) -> StreamingHttpResponse:
+        """
+        Method to import list of units in batches
+
+        Returns:
+            - StreamingHttpResponse: NDJSON with result of every row
+
+        Raises:
+            - ValidationError (in case of request body is not a list)
+        """
+        if not isinstance(request.data, list):
+            raise ValidationError('Expected a list of units')
+        importer = TradeUnitBulkImporter(upsert=request.query_params.get('upsert') in ('true', '1'))
+        return ndjson_response(request, (json.dumps(result) + '\n' for result in importer.run(request.data)))
+
+
+# ----------------------------------------------------------------
+@extend_schema(tags=['Debt Reset'])
+@extend_schema_view(
+    create=extend_schema(
+        description="Start resetting debts of supplier's downstream network (or of given units) "
+                    "in chunks with short transactions",
+        summary="Start debt reset"
+    ),
+    retrieve=extend_schema(
+        description="Get progress of debt reset",
+        summary="Get debt reset"
+    ),
+    list=extend_schema(
+        description="Get list of debt resets",
+        summary="Get all debt resets"
+    ),
+)
+class DebtResetViewSet(CreateModelMixin, RetrieveModelMixin, ListModelMixin, GenericViewSet):
+    """
+    ViewSet to handle GET, POST requests for DebtReset entity
+
+    Attrs:
+        - queryset: defines queryset for DebtReset
+        - serializer_class: defines serializer class for this ViewSet
+        - permission_classes: defines permissions for this ViewSet
+    """
+    queryset = DebtReset.objects.order_by('-pk')
+    serializer_class = DebtResetSerializer
+    permission_classes: list = [IsAdminUser]
+
+    def perform_create(self, serializer: DebtResetSerializer) -> None:
+        """
+        Redefined method to start debt reset in background
+        """
+        start_debt_reset(serializer.save())
+
+
+# ----------------------------------------------------------------
+@extend_schema(tags=['Products'])
+@extend_schema_view(
+    create=extend_schema(
+        description="Create new product",
+        summary="Add product"
+    ),
+    retrieve=extend_schema(
+        description="Get one product",
+        summary="Get product"
+    ),
+    list=extend_schema(
+        description="Get list of products (cursor pagination by id)",
+        summary="Get all products"
+    ),
+    update=extend_schema(
+        description="Full update of product (change of price is passed to debts of linked units)",
+        summary="Update product"
+    ),
+    partial_update=extend_schema(
+        description="Partial update of product (change of price is passed to debts of linked units)",
+        summary="Partial update product"
+    ),
+    destroy=extend_schema(
+        description="Delete product (its price is removed from debts of linked units)",
+        summary="Delete product"
+    ),
+    prices=extend_schema(
+        description="Change prices of many products in one transaction: deltas are passed to debts "
+                    "of every linked unit and rolled-up debts of their providers with set-based updates",
+        summary="Bulk update prices of products",
+        request=ProductPriceSerializer(many=True),
+        responses={200: None}
+    ),
+)
+class ProductViewSet(ModelViewSet):
+    """
+    ViewSet to handle GET, POST, PUT, PATCH, DELETE requests for Product entity
+
+    Attrs:
+        - queryset: defines queryset for Product
+        - serializer_class: defines serializer class for this ViewSet
+        - permission_classes: defines permissions for this ViewSet
+        - pagination_class: defines keyset pagination for list action
+        - throttle_costs: defines cost of request by action charged by throttling
+    """
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    permission_classes: list = [IsAuthenticated]
+    pagination_class = ProductCursorPagination
+    throttle_costs: dict = {'list': 2, 'prices': 20}
+
+    @action(detail=False, methods=['post'])
+    def prices(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Method to change prices of products listed as [{"id": ..., "price": ...}]
+
+        Returns:
+            - Response: dictionary with numbers of changed products and units
+        """
+        serializer = ProductPriceListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(update_product_prices(serializer.validated_data))
+
+
+# ----------------------------------------------------------------
+def ndjson_response(request: Request, lines: Iterable[str], chunk_size: int = 100) -> StreamingHttpResponse:
+    """
+    Function to stream NDJSON lines: under ASGI (which consumes synchronous iterators into memory before
+    sending them) lines are given by asynchronous iterator pulling them chunk by chunk from synchronous code
+    """
+    if isinstance(request._request, ASGIRequest):
+        lines = aiterate_chunks(iter(lines), chunk_size)
+    return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+
+# ----------------------------------------------------------------
+async def aiterate_chunks(lines: Iterator[str], chunk_size: int) -> AsyncIterator[str]:
+    """
+    Function to iterate synchronous iterator of lines asynchronously: every chunk of lines is taken
+    in the thread of synchronous code of the request (so database connection of the iterator is kept)
+    """
+    while chunk := await sync_to_async(lambda: list(islice(lines, chunk_size)))():
+        yield ''.join(chunk)
+
+
+# ----------------------------------------------------------------
+async def authenticated_user(request: HttpRequest) -> User | None:
+    """
+    Function to get user authenticated by token or session of request from asynchronous view
+
+    Returns:
+        - User object or None if request is not authenticated
+
+    Raises:
+        - AuthenticationFailed (in case of invalid token)
+    """
+    keyword, _, token = request.headers.get('Authorization', '').partition(' ')
+    if keyword.lower() == SignedTokenAuthentication.keyword.lower():
+        return await sync_to_async(SignedTokenAuthentication.authenticate_token)(token.strip())
+    return await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+
+
+# ----------------------------------------------------------------
+async def admit(request: HttpRequest, view: View) -> JsonResponse | None:
+    """
+    Function to authenticate request of asynchronous view and charge its cost from token buckets
+    of the client by the same throttle as requests of REST framework views (errors are answered
+    as by REST framework views: 401 with WWW-Authenticate header for unauthenticated requests)
+
+    Returns:
+        - JsonResponse with error if request is not admitted, otherwise None
+    """
+    throttle = TokenBucketThrottle()
+    try:
+        user = await authenticated_user(request)
+        if user is None:
+            raise NotAuthenticated()
+        if not await sync_to_async(throttle.allow_user)(request, view, user):
+            raise Throttled(throttle.wait())
+    except APIException as error:
+        response = JsonResponse({'detail': error.detail}, status=error.status_code)
+        if isinstance(error, (NotAuthenticated, AuthenticationFailed)):
+            response['WWW-Authenticate'] = SignedTokenAuthentication.keyword
+        if isinstance(error, Throttled):
+            response['Retry-After'] = str(error.wait)
+        return response
+    return None
+
+
+# ----------------------------------------------------------------
+class AsyncRetailListView(View):
+    """
+    Asynchronous view to handle GET requests for list of TradeUnit entities
+    (keyset pagination by ?after=<id>, same filters as RetailViewSet)
+
+    Attrs:
+        - page_size: defines default number of units per page
+        - max_page_size: defines upper bound of number of units per page
+        - throttle_costs: defines cost of request by method charged by throttling
+    """
+    page_size: int = 100
+    max_page_size: int = 1000
+    throttle_costs: dict = {'get': 5}
+
+    def throttle_cost(self, request: HttpRequest) -> int:
+        """
+        Method to get cost of request charged by throttling: cost grows with every started hundred
+        of units per page (as cost of list action of RetailViewSet)
+
+        Returns:
+            - cost of request in tokens
+        """
+        cost = self.throttle_costs['get']
+        page_size = request.GET.get('page_size', '')
+        if page_size.isdigit():
+            cost *= max(1, -(-min(int(page_size), self.max_page_size) // 100))
+        return cost
+
+    async def get(self, request: HttpRequest, *args: tuple, **kwargs: dict) -> JsonResponse:
+        """
+        Method to get page of units with provider chains loaded by asynchronous ORM
+
+        Returns:
+            - JsonResponse: dictionary with link to the next page and serialized units
+        """
+        if rejection := await admit(request, self):
+            return rejection
+        filterset = RetailCountryFilter(request.GET, queryset=TradeUnit.objects.select_related('contact'))
+        try:
+            after = int(request.GET.get('after', 0))
+            page_size = min(int(request.GET.get('page_size', self.page_size)), self.max_page_size)
+        except ValueError:
+            return JsonResponse({'detail': 'Parameters after and page_size must be integers.'}, status=400)
+        if not filterset.is_valid():
+            return JsonResponse(filterset.errors, status=400)
+        await filterset.aload_subtree_paths()
+        units = [unit async for unit in filterset.qs.filter(pk__gt=after).order_by('pk')[:page_size + 1]]
+        next_url = None
+        if len(units) > page_size:
+            units = units[:page_size]
+            params = request.GET.copy()
+            params['after'] = units[-1].pk
+            next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+        await TradeUnit.objects.aattach_provider_chain(units)
+        data = RetailSerializer(units, many=True, context={'chain_loaded': True}).data
+        return JsonResponse({'next': next_url, 'results': data}, encoder=JSONEncoder)
+
+
+# ----------------------------------------------------------------
+class AsyncRetailDetailView(View):
+    """
+    Asynchronous view to handle GET requests for one TradeUnit entity
+
+    Attrs:
+        - throttle_costs: defines cost of request by method charged by throttling
+    """
+    throttle_costs: dict = {'get': 1}
+
+    async def get(self, request: HttpRequest, pk: int, *args: tuple, **kwargs: dict) -> JsonResponse:
+        """
+        Method to get unit with provider chain loaded by asynchronous ORM
+
+        Returns:
+            - JsonResponse: serialized unit
+        """
+        if rejection := await admit(request, self):
+            return rejection
+        unit = await TradeUnit.objects.select_related('contact').filter(pk=pk).afirst()
+        if unit is None:
+            return JsonResponse({'detail': 'Not found.'}, status=404)
+        await TradeUnit.objects.aattach_provider_chain([unit])
+        return JsonResponse(RetailSerializer(unit, context={'chain_loaded': True}).data, encoder=JSONEncoder)
@@ -0,0 +1,218 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core import signing
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.plumbing import build_bearer_security_scheme_object
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from core.models import User
+
+TOKEN_SALT: str = 'core.authentication.token'
+
+
+# ----------------------------------------------------------------
+class ExpiringCache:
+    """
+    Thread-safe in-process LRU cache with lifetime of entries (every worker process keeps its own)
+
+    Attrs:
+        - max_size: defines maximal number of entries (the least recently used one is evicted)
+        - timeout: defines lifetime of entries in seconds
+    """
+    def __init__(self, max_size: int, timeout: float) -> None:
+        self.max_size = max_size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key: Any) -> Any:
+        """
+        Method to get value of key (None in case of missing or expired entry)
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any, timeout: float | None = None) -> None:
+        """
+        Method to store value of key for timeout seconds (lifetime of cache by default)
+        """
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + (self.timeout if timeout is None else timeout))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: Any) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = ExpiringCache(
+    getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10_000), getattr(settings, 'AUTH_TOKEN_MAX_AGE', 86_400)
+)
+user_cache = ExpiringCache(
+    getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10_000), getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+)
+credentials_cache = ExpiringCache(
+    getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10_000), getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+)
+
+
+# ----------------------------------------------------------------
+def credentials_hash(user: User) -> str:
+    """
+    Function to get short digest of user's password hash (tokens are revoked by change of password)
+    """
+    return user.get_session_auth_hash()[:16]
+
+
+# ----------------------------------------------------------------
+def issue_token(user: User) -> str:
+    """
+    Function to issue signed token of user (no database record is stored)
+    """
+    return signing.dumps({'u': user.pk, 'h': credentials_hash(user)}, salt=TOKEN_SALT, compress=True)
+
+
+# ----------------------------------------------------------------
+def verify_credentials(username: str | None, password: str | None) -> User | None:
+    """
+    Function to check username and password: repeated logins of the same user with the same
+    credentials skip password hashing while the user is cached (only an HMAC digest of credentials
+    is kept in memory, change of password makes it stale)
+
+    Returns:
+        - user in case of valid credentials, None otherwise
+    """
+    if not username or not password:
+        return None
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(), f'{username}\0{password}'.encode(), hashlib.sha256
+    ).hexdigest()
+    cached = credentials_cache.get(digest)
+    if cached is not None:
+        user = cached_user(cached[0])
+        if user is not None and credentials_hash(user) == cached[1]:
+            return user
+        credentials_cache.delete(digest)
+    user = authenticate(username=username, password=password)
+    if user is not None:
+        user_cache.set(user.pk, user)
+        credentials_cache.set(digest, (user.pk, credentials_hash(user)))
+    return user
+
+
+# ----------------------------------------------------------------
+def cached_user(pk: int) -> User | None:
+    """
+    Function to get active user from in-process cache or database
+    """
+    user = user_cache.get(pk)
+    if user is None:
+        user = User.objects.filter(pk=pk, is_active=True).first()
+        if user is not None:
+            user_cache.set(pk, user)
+    return user
+
+
+# ----------------------------------------------------------------
+def forget_user(pk: int) -> None:
+    """
+    Function to drop user from in-process cache (tokens of the user are verified against database again)
+    """
+    user_cache.delete(pk)
+
+
+# ----------------------------------------------------------------
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Stateless authentication by signed token in header "Authorization: Token <token>"
+
+    Signature and age of token are verified once per process and kept in token cache, users are kept
+    in user cache for AUTH_USER_CACHE_TIMEOUT seconds, so authenticated requests make no database queries
+
+    Attrs:
+        - keyword: defines keyword of Authorization header
+    """
+    keyword: str = 'Token'
+
+    def authenticate(self, request: Request) -> tuple[User, str] | None:
+        """
+        Redefined method to authenticate request by token
+
+        Returns:
+            - tuple with user and token, None in case of request without token
+
+        Raises:
+            - AuthenticationFailed (in case of malformed, expired or revoked token)
+        """
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise AuthenticationFailed('Invalid token header')
+        try:
+            token = header[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed('Invalid token header')
+        return self.authenticate_token(token), token
+
+    @staticmethod
+    def authenticate_token(token: str) -> User:
+        """
+        Method to get user of token
+
+        Raises:
+            - AuthenticationFailed (in case of malformed, expired or revoked token)
+        """
+        payload = token_cache.get(token)
+        if payload is None:
+            max_age = getattr(settings, 'AUTH_TOKEN_MAX_AGE', 86_400)
+            try:
+                payload = signing.loads(token, salt=TOKEN_SALT, max_age=max_age)
+            except signing.SignatureExpired:
+                raise AuthenticationFailed('Token has expired')
+            except signing.BadSignature:
+                raise AuthenticationFailed('Invalid token')
+            issued = signing.b62_decode(token.rsplit(':', 2)[1])
+            token_cache.set(token, payload, timeout=issued + max_age - time.time())
+        user = cached_user(payload['u'])
+        if user is None or credentials_hash(user) != payload['h']:
+            raise AuthenticationFailed('Token is revoked')
+        return user
+
+    def authenticate_header(self, request: Request) -> str:
+        return self.keyword
+
+
+# ----------------------------------------------------------------
+class SignedTokenScheme(OpenApiAuthenticationExtension):
+    """
+    OpenAPI description of signed token authentication
+    """
+    target_class = SignedTokenAuthentication
+    name = 'tokenAuth'
+
+    def get_security_definition(self, auto_schema: Any) -> dict:
+        return build_bearer_security_scheme_object(header_name='Authorization', token_prefix='Token')
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.authentication import forget_user
+from core.models import User
+
+
+# ----------------------------------------------------------------
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    """
+    Called every time a User is saved or deleted to drop it from in-process cache of authentication
+    (other processes see the change after AUTH_USER_CACHE_TIMEOUT seconds)
+    """
+    forget_user(instance.pk)
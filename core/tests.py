@@ -1,3 +1,42 @@
 from django.test import TestCase
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from core.authentication import issue_token, token_cache, user_cache
+from core.models import User
+
+
+# ----------------------------------------------------------------
+@override_settings(THROTTLE_ENABLED=False)
+class SignedTokenTestCase(TestCase):
+    """
+    Tests of authentication by signed tokens
+    """
+    def setUp(self) -> None:
+        token_cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user('user', password='password')
+        self.client = APIClient()
+
+    def get_units(self, token: str) -> int:
+        return self.client.get('/api/retail/', HTTP_AUTHORIZATION=f'Token {token}').status_code
+
+    def test_issued_token_authenticates(self) -> None:
+        response = self.client.post('/api/user/token/', {'username': 'user', 'password': 'password'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_units(response.data['token']), 200)
+
+    def test_wrong_password_gets_no_token(self) -> None:
+        response = self.client.post('/api/user/token/', {'username': 'user', 'password': 'wrong'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('token', response.data)
+
+    def test_password_change_revokes_token(self) -> None:
+        token = issue_token(self.user)
+        self.assertEqual(self.get_units(token), 200)
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertEqual(self.get_units(token), 401)
+
+    def test_tampered_token_is_rejected(self) -> None:
+        self.assertEqual(self.get_units(f'{issue_token(self.user)}x'), 401)
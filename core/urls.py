@@ -1,10 +1,11 @@
 from django.urls import path
 
-from core.views import UserCreateView, UserLoginView
+from core.views import UserCreateView, UserLoginView, UserTokenView
 
 # ----------------------------------------------------------------
 # urlpatterns
 urlpatterns = [
     path('reg/', UserCreateView.as_view()),
     path('auth/', UserLoginView.as_view()),
+    path('token/', UserTokenView.as_view()),
 ]
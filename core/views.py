@@ -1,6 +1,7 @@
 from typing import Any
 
-from django.contrib.auth import authenticate, login
+from django.conf import settings
+from django.contrib.auth import login
 from drf_spectacular.utils import extend_schema
 from rest_framework import status
 from rest_framework.exceptions import AuthenticationFailed
@@ -8,6 +9,7 @@ from rest_framework.generics import CreateAPIView
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from core.authentication import issue_token, verify_credentials
 from core.models import User
 from core.serializers import UserRegistrationSerializer
 
@@ -58,11 +60,41 @@ class UserLoginView(CreateAPIView):
         Raises:
             - AuthenticationFailed (in case of invalid username or password)
         """
-        user: Any = authenticate(
-            username=request.data.get('username'),
-            password=request.data.get('password')
-        )
+        user: Any = verify_credentials(request.data.get('username'), request.data.get('password'))
         if user:
             login(request, user)
             return Response('Successful login', status=status.HTTP_200_OK)
         raise AuthenticationFailed('Invalid username or password')
+
+
+@extend_schema(tags=['User'])
+class UserTokenView(CreateAPIView):
+    """
+    View to issue signed token for API clients (no session is created)
+
+    Attrs:
+        - authentication_classes: defines authentication classes (credentials are taken from request body)
+    """
+    authentication_classes: list = []
+
+    @extend_schema(
+        description="Get signed token for header 'Authorization: Token <token>'",
+        summary="Get user token",
+    )
+    def post(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Method to check credentials and issue token
+
+        Returns:
+            - Response: dictionary with token and its lifetime in seconds
+
+        Raises:
+            - AuthenticationFailed (in case of invalid username or password)
+        """
+        user: Any = verify_credentials(request.data.get('username'), request.data.get('password'))
+        if user:
+            return Response(
+                {'token': issue_token(user), 'expires_in': getattr(settings, 'AUTH_TOKEN_MAX_AGE', 86_400)},
+                status=status.HTTP_200_OK
+            )
+        raise AuthenticationFailed('Invalid username or password')
@@ -0,0 +1,29 @@
+"""
+Gunicorn settings for production serving of trading_network project.
+
+WSGI: gunicorn trading_network.wsgi
+ASGI: gunicorn trading_network.asgi -k uvicorn.workers.UvicornWorker
+"""
+import multiprocessing
+import os
+
+# address to listen on
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# number of worker processes
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+# number of threads of every sync (WSGI) worker
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# restart workers after number of requests to limit memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# seconds to wait for a worker to handle request
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+# seconds to keep idle connections (behind a load balancer)
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = '-'
@@ -0,0 +1,269 @@
+"""
+Opt-in request instrumentation: per-endpoint query counts, database time, serialization time
+and latency histograms, N+1 detection
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest, HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS: tuple = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS: tuple = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+# ----------------------------------------------------------------
+class RequestStats:
+    """
+    Statistics of one request
+
+    Attrs:
+        - queries: defines number of executed queries
+        - db_time: defines time spent in database in seconds
+        - serialization_time: defines time spent in serializers and renderers in seconds
+        - statements: defines counter of executed SQL templates (without parameters)
+        - depth: defines depth of nested serialization spans (only the outermost one is timed)
+    """
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.statements = Counter()
+        self.depth = 0
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """
+        Method to get SQL templates executed at least threshold times (N+1 candidates)
+        """
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+
+current_stats: ContextVar[RequestStats | None] = ContextVar('current_stats', default=None)
+
+
+# ----------------------------------------------------------------
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets
+
+    Attrs:
+        - buckets: defines upper bounds of buckets
+        - counts: defines number of observations in every bucket (the last one is +Inf)
+        - sum: defines sum of observations
+        - count: defines number of observations
+    """
+    def __init__(self, buckets: tuple) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        cumulative, buckets = 0, {}
+        for bound, count in zip([*self.buckets, '+Inf'], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'buckets': buckets, 'sum': round(self.sum, 6), 'count': self.count}
+
+
+# ----------------------------------------------------------------
+class MetricsRegistry:
+    """
+    In-process registry of per-endpoint histograms (every worker process keeps its own registry)
+
+    Attrs:
+        - metrics: defines histograms of latency, database time, serialization time and queries
+        - n_plus_one: defines counters of detected N+1 patterns by endpoint and SQL template
+    """
+    metrics: dict = {
+        'latency_seconds': LATENCY_BUCKETS,
+        'db_seconds': LATENCY_BUCKETS,
+        'serialization_seconds': LATENCY_BUCKETS,
+        'queries': QUERY_BUCKETS,
+    }
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.endpoints = defaultdict(lambda: {name: Histogram(buckets) for name, buckets in self.metrics.items()})
+        self.n_plus_one = defaultdict(Counter)
+
+    def record(self, endpoint: str, latency: float, stats: RequestStats, repeated: list) -> None:
+        """
+        Method to add statistics of one request
+        """
+        with self.lock:
+            histograms = self.endpoints[endpoint]
+            histograms['latency_seconds'].observe(latency)
+            histograms['db_seconds'].observe(stats.db_time)
+            histograms['serialization_seconds'].observe(stats.serialization_time)
+            histograms['queries'].observe(stats.queries)
+            for sql, _ in repeated:
+                self.n_plus_one[endpoint][sql] += 1
+
+    def snapshot(self) -> dict:
+        """
+        Method to get all histograms and N+1 patterns
+        """
+        with self.lock:
+            return {
+                endpoint: {
+                    **{name: histogram.to_dict() for name, histogram in histograms.items()},
+                    'n_plus_one': dict(self.n_plus_one.get(endpoint, {})),
+                }
+                for endpoint, histograms in sorted(self.endpoints.items())
+            }
+
+    def reset(self) -> None:
+        with self.lock:
+            self.endpoints.clear()
+            self.n_plus_one.clear()
+
+
+registry = MetricsRegistry()
+
+
+# ----------------------------------------------------------------
+def normalize_sql(sql: str) -> str:
+    """
+    Function to build SQL template: literals and lists of placeholders are collapsed,
+    so the same lookup with different ids is counted as one statement
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+\b', '?', sql)
+    return re.sub(r'(?:%s|\?)(?:\s*,\s*(?:%s|\?))+', '?...', sql)
+
+
+# ----------------------------------------------------------------
+def execute_wrapper(execute: Callable, sql: str, params: Any, many: bool, context: dict) -> Any:
+    """
+    Function to count and time queries of the current request (installed on every connection)
+    """
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+        stats.statements[normalize_sql(sql)] += 1
+
+
+# ----------------------------------------------------------------
+def install_wrapper(connection: Any, **kwargs: Any) -> None:
+    """
+    Function to install query wrapper on connection (once)
+    """
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+# ----------------------------------------------------------------
+@contextmanager
+def serialization_span() -> Iterator[None]:
+    """
+    Context manager to time serialization of the current request (nested spans are not counted twice)
+    """
+    stats = current_stats.get()
+    if stats is None:
+        yield
+        return
+    stats.depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.depth -= 1
+        if stats.depth == 0:
+            stats.serialization_time += time.perf_counter() - started
+
+
+# ----------------------------------------------------------------
+class InstrumentationMiddleware:
+    """
+    Middleware to record per-endpoint query counts, database time, serialization time and latency
+    (enabled by INSTRUMENTATION_ENABLED setting)
+
+    Adds Server-Timing and X-Query-Count headers to responses and logs SQL templates repeated
+    at least INSTRUMENTATION_N_PLUS_ONE_THRESHOLD times within one request
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 10)
+        connection_created.connect(install_wrapper, dispatch_uid='instrumentation')
+        for connection in connections.all(initialized_only=True):
+            install_wrapper(connection)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, started = RequestStats(), time.perf_counter()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request: HttpRequest) -> Any:
+        stats, started = RequestStats(), time.perf_counter()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    def finish(self, request: HttpRequest, response: HttpResponse, stats: RequestStats, latency: float) -> Any:
+        """
+        Method to record statistics of request and add timing headers to response
+        """
+        match = getattr(request, 'resolver_match', None)
+        endpoint = f'{request.method} {match.view_name if match else "unresolved"}'
+        repeated = stats.repeated(self.threshold)
+        for sql, count in repeated:
+            logger.warning('Possible N+1 in %s: %s queries of %s', endpoint, count, sql)
+        registry.record(endpoint, latency, stats, repeated)
+        response['X-Query-Count'] = str(stats.queries)
+        response['Server-Timing'] = (
+            f'db;dur={stats.db_time * 1000:.2f}, serialization;dur={stats.serialization_time * 1000:.2f}, '
+            f'total;dur={latency * 1000:.2f}'
+        )
+        return response
+
+
+# ----------------------------------------------------------------
+class InstrumentedJSONRenderer(JSONRenderer):
+    """
+    JSON renderer counting rendering into serialization time
+    """
+    def render(self, data: Any, accepted_media_type: str | None = None, renderer_context: Any = None) -> bytes:
+        with serialization_span():
+            return super().render(data, accepted_media_type, renderer_context)
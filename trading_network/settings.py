@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'trading_network.instrumentation.InstrumentationMiddleware',
+    'trading_network.throttling.ConcurrencyLimitMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,9 +88,77 @@ DATABASES = {
 # }
 
 
+# Cache (retail responses use a separate cache, local memory by default, file-based e.g. by
+# RETAIL_CACHE_URL=filecache:///var/tmp/retail_cache; generations of cached lists are kept in this cache,
+# so all processes serving requests have to share its backend: file, redis or memcached)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+    'retail': env.cache('RETAIL_CACHE_URL', default='locmemcache://retail?MAX_ENTRIES=100000'),
+}
+
+# lifetime of cached retail responses in seconds
+RETAIL_CACHE_TIMEOUT = env.int('RETAIL_CACHE_TIMEOUT', default=300)
+
+
+# run debt resets in background threads
+DEBT_RESET_ASYNC = env.bool('DEBT_RESET_ASYNC', default=True)
+
+
+# network statistics: a snapshot older than STATS_REFRESH_INTERVAL seconds is recomputed in background
+# (synchronously if STATS_REFRESH_ASYNC is disabled) once change log is ahead of it, number of top debtors
+# kept for every supplier
+STATS_REFRESH_INTERVAL = env.int('STATS_REFRESH_INTERVAL', default=60)
+STATS_REFRESH_ASYNC = env.bool('STATS_REFRESH_ASYNC', default=True)
+STATS_TOP_DEBTORS = env.int('STATS_TOP_DEBTORS', default=10)
+
+
+# maximal level of trade unit in provider chain
+TRADE_UNIT_MAX_LEVEL = env.int('TRADE_UNIT_MAX_LEVEL', default=50)
+
+
+# request instrumentation (query counts, timings, N+1 detection), disabled by default
+INSTRUMENTATION_ENABLED = env.bool('INSTRUMENTATION_ENABLED', default=False)
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = env.int('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', default=10)
+
+
+# signed API tokens: lifetime in seconds, size of in-process caches of verified tokens and users,
+# lifetime of cached users in seconds (change of user in another process is seen after it)
+AUTH_TOKEN_MAX_AGE = env.int('AUTH_TOKEN_MAX_AGE', default=86_400)
+AUTH_TOKEN_CACHE_SIZE = env.int('AUTH_TOKEN_CACHE_SIZE', default=10_000)
+AUTH_USER_CACHE_TIMEOUT = env.int('AUTH_USER_CACHE_TIMEOUT', default=60)
+
+
+# admission control: token buckets '<capacity>/<seconds>' charged by cost of request (of all requests
+# of a user or an anonymous address and of every endpoint of a client), kept in process memory or in
+# SQLite file given by THROTTLE_STORE, and caps of requests served at once by a process and by a client
+THROTTLE_ENABLED = env.bool('THROTTLE_ENABLED', default=True)
+THROTTLE_USER_RATE = env.str('THROTTLE_USER_RATE', default='600/60')
+THROTTLE_ANON_RATE = env.str('THROTTLE_ANON_RATE', default='60/60')
+THROTTLE_ENDPOINT_RATE = env.str('THROTTLE_ENDPOINT_RATE', default='300/60')
+THROTTLE_STORE = env.str('THROTTLE_STORE', default='')
+THROTTLE_MAX_CONCURRENT_REQUESTS = env.int('THROTTLE_MAX_CONCURRENT_REQUESTS', default=64)
+THROTTLE_MAX_CONCURRENT_PER_CLIENT = env.int('THROTTLE_MAX_CONCURRENT_PER_CLIENT', default=8)
+# number of trusted proxies in front of the server adding X-Forwarded-For (0 identifies anonymous clients
+# by REMOTE_ADDR, as the header is sent by clients themselves)
+THROTTLE_NUM_PROXIES = env.int('THROTTLE_NUM_PROXIES', default=0)
+
+
 # REST Framework settings
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'core.authentication.SignedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'trading_network.throttling.TokenBucketThrottle',
+    ],
+    'NUM_PROXIES': THROTTLE_NUM_PROXIES,
+    'DEFAULT_RENDERER_CLASSES': [
+        'trading_network.instrumentation.InstrumentedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 
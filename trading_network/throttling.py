@@ -0,0 +1,325 @@
+"""
+Request admission control: token-bucket throttling of API requests by cost and caps of concurrent requests
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from functools import cache
+from typing import Any, Callable
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpRequest, HttpResponseBase, JsonResponse
+from rest_framework.request import Request
+from rest_framework.throttling import BaseThrottle
+
+Limit = tuple[str, float, float]
+
+
+# ----------------------------------------------------------------
+def parse_rate(rate: str) -> tuple[float, float]:
+    """
+    Function to parse rate '<capacity>/<seconds>' (bucket of capacity tokens refilled in seconds)
+
+    Returns:
+        - tuple with capacity and refill rate in tokens per second
+    """
+    capacity, seconds = rate.split('/')
+    return float(capacity), float(capacity) / float(seconds)
+
+
+# ----------------------------------------------------------------
+def refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    """
+    Function to get number of tokens in bucket after refill since last update
+    """
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+# ----------------------------------------------------------------
+def shortage(tokens: float, cost: float, capacity: float, rate: float) -> float:
+    """
+    Function to get seconds until bucket has enough tokens for cost (cost above capacity takes the whole bucket)
+    """
+    return max(0.0, (min(cost, capacity) - tokens) / rate)
+
+
+# ----------------------------------------------------------------
+class MemoryBucketStore:
+    """
+    Token buckets in process memory (every worker process keeps its own buckets)
+
+    Attrs:
+        - max_keys: defines number of buckets after which full (idle) buckets are dropped
+    """
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def consume(self, limits: list[Limit], cost: float) -> float:
+        """
+        Method to take cost from every bucket at once (all or nothing)
+
+        Params:
+            - limits: list with keys, capacities and refill rates of buckets
+
+        Returns:
+            - 0 in case of taken tokens, otherwise seconds to wait
+        """
+        now = time.monotonic()
+        with self.lock:
+            levels = [
+                refill(*self.buckets.get(key, (capacity, now))[:2], now, capacity, rate)
+                for key, capacity, rate in limits
+            ]
+            wait = max(
+                shortage(tokens, cost, capacity, rate) for tokens, (_, capacity, rate) in zip(levels, limits)
+            )
+            if wait:
+                return wait
+            for tokens, (key, capacity, rate) in zip(levels, limits):
+                self.buckets[key] = (tokens - min(cost, capacity), now, now + capacity / rate)
+            if len(self.buckets) > self.max_keys:
+                self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+            return 0.0
+
+
+# ----------------------------------------------------------------
+class SQLiteBucketStore:
+    """
+    Token buckets in SQLite file shared by worker processes of one host (every bucket update
+    is one short write transaction)
+
+    Attrs:
+        - path: defines path to SQLite file
+        - idle: defines seconds after which buckets are deleted
+        - prune_every: defines number of writes of one thread between deletions of idle buckets
+    """
+    idle: float = 3600
+    prune_every: int = 1000
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.local = threading.local()
+        self.connection().execute(
+            'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        )
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Method to get connection of current thread
+        """
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self.local.connection.execute('PRAGMA journal_mode=WAL')
+        return self.local.connection
+
+    def consume(self, limits: list[Limit], cost: float) -> float:
+        """
+        Method to take cost from every bucket at once (all or nothing)
+
+        Params:
+            - limits: list with keys, capacities and refill rates of buckets
+
+        Returns:
+            - 0 in case of taken tokens, otherwise seconds to wait
+        """
+        connection, now = self.connection(), time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            keys = [key for key, _, _ in limits]
+            stored = dict(
+                (key, (tokens, updated)) for key, tokens, updated in connection.execute(
+                    f'SELECT key, tokens, updated FROM buckets WHERE key IN ({", ".join("?" * len(keys))})', keys
+                )
+            )
+            levels = [
+                refill(*stored.get(key, (capacity, now)), now, capacity, rate) for key, capacity, rate in limits
+            ]
+            wait = max(
+                shortage(tokens, cost, capacity, rate) for tokens, (_, capacity, rate) in zip(levels, limits)
+            )
+            if not wait:
+                connection.executemany(
+                    'INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                    'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                    [(key, tokens - min(cost, capacity), now) for tokens, (key, capacity, _) in zip(levels, limits)]
+                )
+                self.local.writes = getattr(self.local, 'writes', 0) + 1
+                if self.local.writes % self.prune_every == 0:
+                    connection.execute('DELETE FROM buckets WHERE updated < ?', (now - self.idle,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+
+# ----------------------------------------------------------------
+@cache
+def bucket_store(path: str) -> MemoryBucketStore | SQLiteBucketStore:
+    """
+    Function to get store of buckets: process memory for empty path, SQLite file otherwise
+    """
+    return SQLiteBucketStore(path) if path else MemoryBucketStore()
+
+
+# ----------------------------------------------------------------
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle charging every request by its cost from two token buckets of the client: the bucket
+    of all requests (THROTTLE_USER_RATE, THROTTLE_ANON_RATE for anonymous clients) and the bucket
+    of the endpoint (THROTTLE_ENDPOINT_RATE)
+
+    Cost of request is given by throttle_cost(request) method of view, by throttle_costs dictionary
+    of view by action (by method for views outside REST framework) or is 1. Buckets are kept in store
+    chosen by THROTTLE_STORE setting
+    """
+    def allow_request(self, request: Request, view: Any) -> bool:
+        """
+        Redefined method to take cost of request from buckets of the client (disabled by THROTTLE_ENABLED)
+        """
+        return self.allow_user(request, view, request.user)
+
+    def allow_user(self, request: HttpRequest | Request, view: Any, user: Any) -> bool:
+        """
+        Method to take cost of request from buckets of the client identified by user authenticated
+        by view itself (views outside REST framework)
+
+        Params:
+            - user: defines authenticated user or None for anonymous client
+        """
+        self.delay = 0.0
+        if not getattr(settings, 'THROTTLE_ENABLED', True):
+            return True
+        if user and user.is_authenticated:
+            client, rate = f'user:{user.pk}', getattr(settings, 'THROTTLE_USER_RATE', '600/60')
+        else:
+            client, rate = f'anon:{self.get_ident(request)}', getattr(settings, 'THROTTLE_ANON_RATE', '60/60')
+        endpoint = f'{view.__class__.__name__}.{getattr(view, "action", None) or request.method.lower()}'
+        limits = [
+            (client, *parse_rate(rate)),
+            (f'{client}:{endpoint}', *parse_rate(getattr(settings, 'THROTTLE_ENDPOINT_RATE', '300/60'))),
+        ]
+        self.delay = bucket_store(str(getattr(settings, 'THROTTLE_STORE', ''))).consume(
+            limits, self.request_cost(request, view)
+        )
+        return not self.delay
+
+    def wait(self) -> float | None:
+        return self.delay or None
+
+    @staticmethod
+    def request_cost(request: Request, view: Any) -> int:
+        """
+        Method to get cost of request
+        """
+        if hasattr(view, 'throttle_cost'):
+            return max(1, int(view.throttle_cost(request)))
+        return getattr(view, 'throttle_costs', {}).get(getattr(view, 'action', None) or request.method.lower(), 1)
+
+
+# ----------------------------------------------------------------
+class ConcurrencyLimitMiddleware:
+    """
+    Middleware to shed load with 429 before workers saturate: number of requests served at once
+    by the process is limited by THROTTLE_MAX_CONCURRENT_REQUESTS, number of requests of one client
+    by THROTTLE_MAX_CONCURRENT_PER_CLIENT (client is told by Authorization header, session cookie
+    or address behind THROTTLE_NUM_PROXIES trusted proxies). Streaming responses keep their slots until their bodies are sent. Enabled by
+    THROTTLE_ENABLED setting
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        if not getattr(settings, 'THROTTLE_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.max_requests = getattr(settings, 'THROTTLE_MAX_CONCURRENT_REQUESTS', 64)
+        self.max_per_client = getattr(settings, 'THROTTLE_MAX_CONCURRENT_PER_CLIENT', 8)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.clients = {}
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        client = self.client(request)
+        if not self.enter(client):
+            return self.reject()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self.leave(client)
+            raise
+        return self.release(response, client)
+
+    async def __acall__(self, request: HttpRequest) -> Any:
+        client = self.client(request)
+        if not self.enter(client):
+            return self.reject()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            self.leave(client)
+            raise
+        return self.release(response, client)
+
+    @staticmethod
+    def client(request: HttpRequest) -> str:
+        """
+        Method to identify client without database queries
+        """
+        credentials = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if credentials:
+            return hashlib.md5(credentials.encode()).hexdigest()
+        return BaseThrottle().get_ident(request)
+
+    def enter(self, client: str) -> bool:
+        """
+        Method to admit request if both caps allow it
+        """
+        with self.lock:
+            if self.active >= self.max_requests or self.clients.get(client, 0) >= self.max_per_client:
+                return False
+            self.active += 1
+            self.clients[client] = self.clients.get(client, 0) + 1
+            return True
+
+    def release(self, response: HttpResponseBase, client: str) -> HttpResponseBase:
+        """
+        Method to release slot of request once its response is sent: at once for regular responses,
+        on close of streaming responses (server closes response after the last chunk of body
+        or disconnect of client), so requests streaming their bodies keep their slots
+        """
+        if not response.streaming:
+            self.leave(client)
+            return response
+        close, released = response.close, []
+
+        def close_and_leave() -> None:
+            try:
+                close()
+            finally:
+                if not released:
+                    released.append(True)
+                    self.leave(client)
+
+        response.close = close_and_leave
+        return response
+
+    def leave(self, client: str) -> None:
+        with self.lock:
+            self.active -= 1
+            self.clients[client] -= 1
+            if not self.clients[client]:
+                del self.clients[client]
+
+    @staticmethod
+    def reject() -> JsonResponse:
+        return JsonResponse({'detail': 'Too many concurrent requests.'}, status=429, headers={'Retry-After': '1'})
@@ -6,7 +6,8 @@ from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView
 from rest_framework.routers import SimpleRouter
 
-from chain.views import RetailViewSet
+from chain.views import AsyncRetailDetailView, AsyncRetailListView, DebtResetViewSet, ProductViewSet, RetailViewSet
+from trading_network.views import MetricsView
 
 router = SimpleRouter()
 
@@ -14,12 +15,17 @@ router = SimpleRouter()
 # ----------------------------------------------------------------
 # register router
 router.register('api/retail', RetailViewSet)
+router.register('api/debt-resets', DebtResetViewSet)
+router.register('api/products', ProductViewSet)
 
 
 # ----------------------------------------------------------------
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('core.urls')),
+    path('api/async/retail/', AsyncRetailListView.as_view()),
+    path('api/async/retail/<int:pk>/', AsyncRetailDetailView.as_view()),
+    path('api/metrics/', MetricsView.as_view()),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
 
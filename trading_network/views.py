@@ -0,0 +1,76 @@
+"""
+Project-level views
+"""
+from typing import Any
+
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from trading_network.instrumentation import MetricsRegistry, registry
+
+
+# ----------------------------------------------------------------
+class PrometheusRenderer(BaseRenderer):
+    """
+    Renderer of metrics snapshot in Prometheus text exposition format
+    """
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data: Any, accepted_media_type: str | None = None, renderer_context: Any = None) -> bytes:
+        if data is None:
+            return b''
+        response = (renderer_context or {}).get('response')
+        if response is not None and response.exception:
+            return f'{data}\n'.encode(self.charset)
+        lines = []
+        for name in MetricsRegistry.metrics:
+            metric = f'trading_network_request_{name}'
+            lines.append(f'# TYPE {metric} histogram')
+            for endpoint, histograms in data.items():
+                labels = self.labels(endpoint)
+                histogram = histograms[name]
+                for bound, count in histogram['buckets'].items():
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{metric}_sum{{{labels}}} {histogram["sum"]}')
+                lines.append(f'{metric}_count{{{labels}}} {histogram["count"]}')
+        lines.append('# TYPE trading_network_n_plus_one_total counter')
+        for endpoint, histograms in data.items():
+            for sql, count in histograms.get('n_plus_one', {}).items():
+                statement = sql.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+                lines.append(f'trading_network_n_plus_one_total{{{self.labels(endpoint)},sql="{statement}"}} {count}')
+        return ('\n'.join(lines) + '\n').encode(self.charset)
+
+    @staticmethod
+    def labels(endpoint: str) -> str:
+        method, _, view = endpoint.partition(' ')
+        return f'method="{method}",view="{view}"'
+
+
+# ----------------------------------------------------------------
+class MetricsView(APIView):
+    """
+    Admin-only view of request metrics (JSON or Prometheus text by ?format=prometheus)
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [JSONRenderer, PrometheusRenderer]
+
+    def get(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Method to get histograms of every endpoint
+
+        Returns:
+            - Response: dictionary with histograms and N+1 patterns by endpoint
+        """
+        return Response(registry.snapshot())
+
+    def delete(self, request: Request, *args: tuple, **kwargs: dict) -> Response:
+        """
+        Method to reset collected metrics
+        """
+        registry.reset()
+        return Response(status=204)